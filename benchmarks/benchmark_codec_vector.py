@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: serialización de embeddings como texto vs. codec binario de pgvector.
+
+Mide, por vector de 768 dimensiones:
+  - tiempo de codificación en Python (lo que se paga en cada búsqueda / UPDATE)
+  - tiempo de decodificación (lectura de la columna `embedding`)
+  - bytes enviados por la red
+
+Con --db también mide el round trip `SELECT $1::vector` contra PostgreSQL, que
+incluye el parseo del lado del servidor.
+
+Uso:
+    python benchmarks/benchmark_codec_vector.py --repeticiones 20000
+    python benchmarks/benchmark_codec_vector.py --db
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pgvector_codec import decode_vector, encode_vector  # noqa: E402
+
+
+def encode_text(values) -> str:
+    # Lo que hacían main.py y vector_generator.py antes del codec
+    return "[" + ",".join(map(str, values)) + "]"
+
+
+def decode_text(text: str) -> np.ndarray:
+    return np.array(text[1:-1].split(","), dtype=np.float32)
+
+
+def medir(fn, repeticiones: int) -> float:
+    """Microsegundos por llamada (mejor de 3)."""
+    return min(timeit.repeat(fn, number=repeticiones, repeat=3)) / repeticiones * 1e6
+
+
+def benchmark_cpu(dim: int, repeticiones: int):
+    vector = np.random.default_rng(0).standard_normal(dim).astype(np.float32)
+    lista = vector.tolist()   # así llegan los valores desde la API de Gemini
+    texto = encode_text(lista)
+    binario = encode_vector(vector)
+
+    filas = [
+        ("texto (lista -> str)", medir(lambda: encode_text(lista), repeticiones),
+         medir(lambda: decode_text(texto), repeticiones), len(texto.encode())),
+        ("binario (lista)", medir(lambda: encode_vector(lista), repeticiones),
+         medir(lambda: decode_vector(binario), repeticiones), len(binario)),
+        ("binario (ndarray)", medir(lambda: encode_vector(vector), repeticiones),
+         medir(lambda: decode_vector(binario), repeticiones), len(binario)),
+    ]
+    print(f"dim={dim}, repeticiones={repeticiones}\n")
+    print(f"{'formato':<24}{'encode µs':>12}{'decode µs':>12}{'bytes':>10}")
+    for nombre, enc, dec, size in filas:
+        print(f"{nombre:<24}{enc:>12.2f}{dec:>12.2f}{size:>10}")
+    print(f"\nCodificación {filas[0][1] / filas[1][1]:.0f}x más rápida desde lista, "
+          f"{filas[0][1] / filas[2][1]:.0f}x desde ndarray; bytes: {filas[0][3]} -> {filas[1][3]}")
+
+
+async def benchmark_db(dim: int, repeticiones: int):
+    import db
+
+    vector = np.random.default_rng(0).standard_normal(dim).astype(np.float32)
+    conn_texto = await db.connect(vector=False)
+    conn_binario = await db.connect()
+    try:
+        loop = asyncio.get_running_loop()
+        for nombre, conn, param, sql in (
+            ("texto", conn_texto, encode_text(vector.tolist()), "SELECT ($1::text)::vector IS NOT NULL"),
+            ("binario", conn_binario, vector, "SELECT $1::vector IS NOT NULL"),
+        ):
+            inicio = loop.time()
+            for _ in range(repeticiones):
+                await conn.fetchval(sql, param)
+            por_consulta = (loop.time() - inicio) / repeticiones * 1e6
+            print(f"round trip {nombre:<8}{por_consulta:>10.1f} µs/consulta")
+    finally:
+        await conn_texto.close()
+        await conn_binario.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Texto vs. binario para vectores pgvector.")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--repeticiones", type=int, default=20000)
+    parser.add_argument("--db", action="store_true", help="Medir también el round trip contra PostgreSQL")
+    args = parser.parse_args()
+    benchmark_cpu(args.dim, args.repeticiones)
+    if args.db:
+        print()
+        asyncio.run(benchmark_db(args.dim, max(1, args.repeticiones // 10)))
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de cuantización de embeddings: memoria por 100k propiedades, latencia y
+recall@k frente a la búsqueda exacta actual (float32).
+
+Modo en memoria (por defecto): usa memory_index.MemoryIndex con quantization
+none / int8 / binary sobre un snapshot real (--snapshot snapshots) o, si no se
+indica, sobre vectores sintéticos agrupados (--filas, --dim).
+
+Modo BD (--db): mide en PostgreSQL el tamaño de los índices HNSW de las
+migraciones 001 y 005 (extrapolado a 100k filas) y el recall/latencia de las
+consultas halfvec / binary con re-ranking frente al escaneo exacto.
+
+Uso:
+    python benchmarks/benchmark_cuantizacion.py --filas 100000 --consultas 200
+    python benchmarks/benchmark_cuantizacion.py --snapshot snapshots
+    python benchmarks/benchmark_cuantizacion.py --db --consultas 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memory_index import MemoryIndex  # noqa: E402
+
+FILAS_REFERENCIA = 100_000
+
+
+def datos_sinteticos(filas: int, dim: int, seed: int = 0):
+    """Vectores agrupados alrededor de centros (más parecido a embeddings reales que ruido puro)."""
+    rng = np.random.default_rng(seed)
+    centros = rng.standard_normal((max(1, filas // 200), dim)).astype(np.float32)
+    matriz = centros[rng.integers(0, len(centros), filas)]
+    matriz += 0.6 * rng.standard_normal((filas, dim)).astype(np.float32)
+    matriz /= np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz
+
+
+def bytes_por_fila(quantization: str, dim: int) -> float:
+    return {
+        "float32": dim * 4,
+        "halfvec": dim * 2,
+        "int8": dim + 4,          # + escala float32 por fila
+        "binary": dim / 8,
+    }[quantization]
+
+
+def benchmark_memoria(args):
+    if args.snapshot:
+        base = np.load(os.path.join(args.snapshot, "embeddings.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(args.snapshot, "ids.npy"))
+    else:
+        base = datos_sinteticos(args.filas, args.dim)
+        ids = np.arange(1, len(base) + 1)
+    meta = {int(i): {"titulo": "", "precio": 0.0, "descripcion_ia": ""} for i in ids}
+    dim = base.shape[1]
+
+    rng = np.random.default_rng(1)
+    filas_consulta = rng.choice(len(base), size=min(args.consultas, len(base)), replace=False)
+    consultas = np.asarray(base[np.sort(filas_consulta)]) + 0.05 * rng.standard_normal((len(filas_consulta), dim))
+
+    exacto = MemoryIndex(base, ids, dict(meta), quantization="none")
+    referencia = [{r["id_propiedad"] for r in exacto.search(q, args.k)} for q in consultas]
+
+    print(f"{len(base)} filas, dim={dim}, k={args.k}, re-ranking x{args.rerank}\n")
+    print(f"{'modo':<10}{'MB/100k':>10}{'residente MB':>14}{'recall@k':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for quantization, etiqueta in (("none", "float32"), ("int8", "int8"), ("binary", "binary")):
+        indice = MemoryIndex(base, ids, dict(meta), quantization=quantization, rerank_factor=args.rerank)
+        latencias, recalls = [], []
+        for q, ref in zip(consultas, referencia):
+            inicio = time.perf_counter()
+            encontrados = indice.search(q, args.k)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            recalls.append(len(ref.intersection(r["id_propiedad"] for r in encontrados)) / len(ref))
+        latencias.sort()
+        mb_100k = bytes_por_fila(etiqueta, dim) * FILAS_REFERENCIA / 2**20
+        print(f"{etiqueta:<10}{mb_100k:>10.1f}{indice.resident_bytes() / 2**20:>14.1f}"
+              f"{statistics.mean(recalls):>10.3f}{statistics.median(latencias):>9.2f}"
+              f"{latencias[int(0.95 * (len(latencias) - 1))]:>9.2f}")
+    print(f"{'halfvec':<10}{bytes_por_fila('halfvec', dim) * FILAS_REFERENCIA / 2**20:>10.1f}"
+          f"  (solo en BD, ver --db)")
+
+
+async def benchmark_db(args):
+    import db
+
+    conn = await db.connect()
+    dim = args.dim
+    try:
+        filas = await conn.fetchval("SELECT count(*) FROM Propiedad WHERE embedding IS NOT NULL;")
+        print(f"{filas} filas con embedding\n\nTamaño de índices (extrapolado a 100k filas):")
+        for nombre in ("idx_propiedad_embedding_hnsw", "idx_propiedad_embedding_halfvec",
+                       "idx_propiedad_embedding_bit"):
+            size = await conn.fetchval("SELECT pg_relation_size(to_regclass($1));", nombre)
+            if size is None:
+                print(f"  {nombre:<36} (no existe)")
+                continue
+            por_100k = size / max(1, filas) * FILAS_REFERENCIA / 2**20
+            print(f"  {nombre:<36}{size / 2**20:>10.1f} MB{por_100k:>10.1f} MB/100k")
+
+        consultas = [r["embedding"] for r in await conn.fetch(
+            "SELECT embedding FROM Propiedad WHERE embedding IS NOT NULL ORDER BY random() LIMIT $1;",
+            args.consultas
+        )]
+        sql = {
+            "exacto": "SELECT id_propiedad FROM Propiedad WHERE embedding IS NOT NULL "
+                      "ORDER BY embedding <=> $1 LIMIT $2;",
+            "halfvec": f"SELECT id_propiedad FROM (SELECT id_propiedad, embedding FROM Propiedad "
+                       f"WHERE embedding IS NOT NULL ORDER BY embedding::halfvec({dim}) <=> "
+                       f"$1::vector::halfvec({dim}) LIMIT $2 * {args.rerank}) c "
+                       f"ORDER BY embedding <=> $1 LIMIT $2;",
+            "binary": f"SELECT id_propiedad FROM (SELECT id_propiedad, embedding FROM Propiedad "
+                      f"WHERE embedding IS NOT NULL ORDER BY binary_quantize(embedding)::bit({dim}) <~> "
+                      f"binary_quantize($1::vector) LIMIT $2 * {args.rerank}) c "
+                      f"ORDER BY embedding <=> $1 LIMIT $2;",
+        }
+        referencia = []
+        print(f"\n{'modo':<10}{'recall@k':>10}{'p50 ms':>9}")
+        for modo, consulta in sql.items():
+            latencias, recalls = [], []
+            for i, v in enumerate(consultas):
+                async with conn.transaction():
+                    if modo == "exacto":
+                        await conn.execute("SET LOCAL enable_indexscan = off;")
+                    else:
+                        # Como main.py: ef_search cubre los candidatos del re-ranking
+                        await conn.execute("SELECT set_config('hnsw.ef_search', $1, true);",
+                                           str(min(1000, max(40, args.k * args.rerank))))
+                    inicio = time.perf_counter()
+                    ids = {r["id_propiedad"] for r in await conn.fetch(consulta, v, args.k)}
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                if modo == "exacto":
+                    referencia.append(ids)
+                recalls.append(len(referencia[i] & ids) / max(1, len(referencia[i])))
+            print(f"{modo:<10}{statistics.mean(recalls):>10.3f}{statistics.median(latencias):>9.2f}")
+    finally:
+        await conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memoria, latencia y recall de embeddings cuantizados.")
+    parser.add_argument("--filas", type=int, default=FILAS_REFERENCIA, help="Filas sintéticas")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--snapshot", help="Directorio de snapshot de memory_index.py")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=10, help="Factor de candidatos para re-ranking")
+    parser.add_argument("--db", action="store_true", help="Medir en PostgreSQL en lugar de en memoria")
+    args = parser.parse_args()
+    if args.db:
+        asyncio.run(benchmark_db(args))
+    else:
+        benchmark_memoria(args)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del extractor de avisos: páginas/segundo por backend (bs4, lxml,
+selectolax) sobre las páginas guardadas en scrapping/fixtures/, y verificación
+de que todos los backends devuelven exactamente el mismo ListingRecord que la
+referencia bs4.
+
+Termina con código 1 si algún backend difiere, así sirve también como chequeo
+antes de cambiar EXTRACTOR_BACKEND.
+
+Uso:
+    python benchmarks/benchmark_extractor.py --repeticiones 20
+    python benchmarks/benchmark_extractor.py --dir otra/carpeta/con/html
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "scrapping"))
+from extractor import BACKENDS  # noqa: E402
+
+
+def cargar_paginas(directorio: str) -> dict:
+    paginas = {}
+    for path in sorted(glob.glob(os.path.join(directorio, "orense-*.html"))):
+        with open(path, encoding="utf-8") as f:
+            paginas[os.path.basename(path)] = f.read()
+    return paginas
+
+
+def verificar(paginas: dict) -> bool:
+    """Compara cada backend contra bs4, campo por campo."""
+    iguales = True
+    for nombre, html in paginas.items():
+        referencia = BACKENDS["bs4"](html)
+        for backend, extraer in BACKENDS.items():
+            if backend == "bs4":
+                continue
+            registro = extraer(html)
+            if registro != referencia:
+                iguales = False
+                for campo in referencia.__dataclass_fields__:
+                    esperado, obtenido = getattr(referencia, campo), getattr(registro, campo)
+                    if esperado != obtenido:
+                        print(f"  ❌ {nombre} [{backend}] {campo}: {obtenido!r} != bs4 {esperado!r}")
+    return iguales
+
+
+def medir(paginas: dict, repeticiones: int):
+    htmls = list(paginas.values())
+    total_bytes = sum(len(h.encode("utf-8")) for h in htmls)
+    resultados = {}
+    print(f"{len(htmls)} páginas ({total_bytes / 1024:.0f} KB), {repeticiones} repeticiones\n")
+    print(f"{'backend':<12}{'páginas/s':>12}{'ms/página':>12}{'vs bs4':>10}")
+    for backend, extraer in BACKENDS.items():
+        mejor = float("inf")
+        for _ in range(3):
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                for html in htmls:
+                    extraer(html)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        resultados[backend] = len(htmls) * repeticiones / mejor
+    for backend, por_segundo in resultados.items():
+        print(f"{backend:<12}{por_segundo:>12.0f}{1000 / por_segundo:>12.2f}"
+              f"{por_segundo / resultados['bs4']:>9.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Páginas/s y equivalencia de los backends del extractor.")
+    parser.add_argument("--dir", default=os.path.join(RAIZ, "scrapping", "fixtures"))
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    paginas = cargar_paginas(args.dir)
+    if not paginas:
+        sys.exit(f"No hay páginas orense-*.html en {args.dir}")
+    print(f"Backends disponibles: {', '.join(BACKENDS)}")
+    iguales = verificar(paginas)
+    print("✅ Todos los backends producen el mismo registro.\n" if iguales else "")
+    medir(paginas, args.repeticiones)
+    sys.exit(0 if iguales else 1)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de recall vs. latencia del índice ANN (HNSW / IVFFlat) sobre Propiedad.embedding.
+
+Compara los resultados de la búsqueda indexada contra el escaneo exacto
+(índices deshabilitados) para distintos valores de ef_search / probes.
+
+Uso:
+    python benchmarks/benchmark_indice_ann.py --consultas 50 --k 10
+    python benchmarks/benchmark_indice_ann.py --parametro probes --valores 1,5,10,20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+
+SQL_KNN = """
+    SELECT id_propiedad
+    FROM Propiedad
+    WHERE embedding IS NOT NULL
+    ORDER BY embedding <=> $1::vector
+    LIMIT $2;
+"""
+
+GUC_POR_PARAMETRO = {
+    "ef_search": "hnsw.ef_search",
+    "probes": "ivfflat.probes",
+}
+
+
+async def buscar(conn, vector_str: str, k: int, exacto: bool, guc: str = None, valor: int = None):
+    """Ejecuta una búsqueda k-NN y devuelve (ids, latencia_ms)."""
+    async with conn.transaction():
+        if exacto:
+            # Sin índices el planner recurre al Seq Scan + sort: resultado exacto
+            await conn.execute("SET LOCAL enable_indexscan = off;")
+            await conn.execute("SET LOCAL enable_bitmapscan = off;")
+        elif guc:
+            await conn.execute("SELECT set_config($1, $2, true);", guc, str(valor))
+        inicio = time.perf_counter()
+        rows = await conn.fetch(SQL_KNN, vector_str, k)
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+    return [r['id_propiedad'] for r in rows], latencia_ms
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+
+async def main(args):
+    # Sin codec de pgvector: las consultas usan la representación de texto
+    conn = await db.connect(vector=False)
+    try:
+        # Usamos embeddings existentes como consultas (muestra aleatoria)
+        muestras = await conn.fetch("""
+            SELECT embedding::text AS vector_str
+            FROM Propiedad
+            WHERE embedding IS NOT NULL
+            ORDER BY random()
+            LIMIT $1;
+        """, args.consultas)
+        if not muestras:
+            print("❌ No hay propiedades con embedding para usar como consultas.")
+            return
+        consultas = [m['vector_str'] for m in muestras]
+        print(f"Usando {len(consultas)} consultas, k={args.k}")
+
+        # 1. Verdad de referencia: escaneo exacto
+        exactos, lat_exacto = [], []
+        for v in consultas:
+            ids, ms = await buscar(conn, v, args.k, exacto=True)
+            exactos.append(set(ids))
+            lat_exacto.append(ms)
+        print(f"\n{'modo':<22}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        print(f"{'exacto (seq scan)':<22}{1.0:>10.3f}"
+              f"{statistics.median(lat_exacto):>10.2f}{percentil(lat_exacto, 95):>10.2f}")
+
+        # 2. Búsqueda indexada para cada valor del parámetro
+        guc = GUC_POR_PARAMETRO[args.parametro]
+        for valor in [int(x) for x in args.valores.split(",")]:
+            recalls, latencias = [], []
+            for v, referencia in zip(consultas, exactos):
+                ids, ms = await buscar(conn, v, args.k, exacto=False, guc=guc, valor=valor)
+                recalls.append(len(referencia.intersection(ids)) / max(1, len(referencia)))
+                latencias.append(ms)
+            etiqueta = f"{args.parametro}={valor}"
+            print(f"{etiqueta:<22}{statistics.mean(recalls):>10.3f}"
+                  f"{statistics.median(latencias):>10.2f}{percentil(latencias, 95):>10.2f}")
+    finally:
+        await conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recall vs. latencia del índice ANN de embeddings.")
+    parser.add_argument("--consultas", type=int, default=50, help="Cantidad de consultas de muestra")
+    parser.add_argument("--k", type=int, default=10, help="Vecinos a recuperar por consulta")
+    parser.add_argument("--parametro", choices=sorted(GUC_POR_PARAMETRO), default="ef_search")
+    parser.add_argument("--valores", default="10,20,40,80,160,320",
+                        help="Valores a probar, separados por coma")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Cachés en proceso para la API de búsqueda.
+
+- normalize_query: normaliza el texto de la consulta (mayúsculas, espacios, acentos)
+  para que "Depto  2 dormitorios Céntro" y "depto 2 dormitorios centro" compartan entrada.
+- TTLCache: caché LRU acotada con expiración por tiempo y contadores de aciertos.
+- SemanticCache: caché por similitud de embeddings (paráfrasis de una misma consulta).
+- SingleFlight: agrupa llamadas idénticas concurrentes en una sola llamada real.
+"""
+
+import asyncio
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Minúsculas, sin acentos y con los espacios colapsados."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+class TTLCache:
+    """
+    Caché LRU con tiempo de vida por entrada.
+
+    - maxsize: cantidad máxima de entradas; al superarla se descarta la menos usada.
+    - ttl: segundos que una entrada es válida desde que se guardó.
+    No es thread-safe: está pensada para usarse desde el event loop de FastAPI.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expira_en, valor)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if key in self._data:
+            self._data.move_to_end(key)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SemanticCache:
+    """
+    Caché semántica: devuelve la respuesta de una consulta anterior cuyo embedding
+    tenga similitud de coseno >= threshold con el de la consulta nueva.
+
+    Los embeddings (normalizados) viven en una matriz float32 contigua de
+    capacity x dim, así cada búsqueda es un único producto matriz-vector.
+    Solo se comparan entradas vigentes con los mismos parámetros (params_key),
+    p. ej. el mismo limit; al llenarse se reemplaza la entrada usada hace más tiempo.
+    """
+
+    def __init__(self, dim: int = 768, capacity: int = 1024, threshold: float = 0.95, ttl: float = 600.0):
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._params = np.zeros(capacity, dtype=np.int64)
+        self._expires = np.zeros(capacity, dtype=np.float64)    # 0 = posición libre
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._payloads = [None] * capacity
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    @staticmethod
+    def _params_hash(params_key) -> int:
+        return hash(params_key)
+
+    def lookup(self, vector, params_key=None):
+        """Devuelve (payload, similitud) de la entrada más parecida, o (None, similitud)."""
+        n = self._size
+        if n == 0:
+            self.misses += 1
+            return None, 0.0
+        q = self._normalize(vector)
+        now = time.monotonic()
+        sims = self._matrix[:n] @ q
+        valid = (self._expires[:n] > now) & (self._params[:n] == self._params_hash(params_key))
+        sims = np.where(valid, sims, -np.inf)
+        best = int(np.argmax(sims))
+        similarity = float(sims[best])
+        if similarity < self.threshold:
+            self.misses += 1
+            return None, max(similarity, 0.0)
+        self._last_used[best] = now
+        self.hits += 1
+        return self._payloads[best], similarity
+
+    def store(self, vector, payload, params_key=None):
+        now = time.monotonic()
+        if self._size < self.capacity:
+            slot = self._size
+            self._size += 1
+        else:
+            expired = np.flatnonzero(self._expires <= now)
+            if expired.size:
+                slot = int(expired[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+        self._matrix[slot] = self._normalize(vector)
+        self._params[slot] = self._params_hash(params_key)
+        self._expires[slot] = now + self.ttl
+        self._last_used[slot] = now
+        self._payloads[slot] = payload
+
+    def clear(self):
+        self._expires[:] = 0
+        self._payloads = [None] * self.capacity
+        self._size = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self._expires[:self._size] > time.monotonic()))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas en vuelo: si N corrutinas piden la misma clave a la
+    vez, solo la primera ejecuta factory(); el resto espera ese mismo resultado
+    (o excepción). La llamada compartida se cancela únicamente cuando todos los
+    que la esperaban se fueron (p. ej. por un timeout).
+    """
+
+    def __init__(self):
+        self._inflight = {}  # key -> [task, waiters]
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, factory):
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = [task, 0]
+            self._inflight[key] = entry
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            self.calls += 1
+        else:
+            self.shared += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+    def _forget(self, key, task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # marca la excepción como recuperada
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
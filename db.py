@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Acceso a PostgreSQL compartido por la API, la vectorización, la generación de
+descripciones y los scrapers.
+
+Asíncrono (asyncpg):
+    pool = await db.create_pool(max_size=4)          # codec de pgvector ya registrado
+    conn = await db.connect()                        # conexión suelta (LISTEN, cursores largos)
+    async for row in db.stream(conn, sql, *args):    # cursor del lado del servidor
+        ...
+
+Sincrónico (psycopg2, para scripts y notebooks):
+    with db.sync_connection() as conn:               # sale de un ThreadedConnectionPool
+        ...
+    for row in db.sync_stream(sql, params):          # cursor con nombre (server-side)
+        ...
+
+Timeouts, caché de sentencias y tamaños de pool se configuran en un solo lugar
+(cred.env); cada proceso identifica sus conexiones con application_name.
+"""
+
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+import asyncpg
+from dotenv import load_dotenv
+
+from pgvector_codec import register_vector_codec
+
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:  # pragma: no cover - solo necesario para el acceso sincrónico
+    psycopg2 = None
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cred.env'))
+
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+
+# --- Pool de conexiones ---
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "4"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_MAX_INACTIVE_CONNECTION_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME", "300"))
+
+# --- Timeouts (segundos; 0 = sin límite) ---
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+# statement_timeout del servidor: aplica igual a asyncpg y psycopg2
+DB_STATEMENT_TIMEOUT = float(os.getenv("DB_STATEMENT_TIMEOUT", "0"))
+
+# --- Caché de sentencias preparadas (asyncpg) ---
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_MAX_CACHED_STATEMENT_LIFETIME = float(os.getenv("DB_MAX_CACHED_STATEMENT_LIFETIME", "0"))  # 0 = sin límite
+
+# Filas por viaje al servidor en los cursores de stream()/sync_stream()
+DB_STREAM_FETCH_SIZE = int(os.getenv("DB_STREAM_FETCH_SIZE", "1000"))
+
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "agente_ia_inmobiliaria")
+
+
+def _server_settings(application_name: str, statement_timeout: float) -> dict:
+    settings = {"application_name": application_name}
+    if statement_timeout:
+        settings["statement_timeout"] = str(int(statement_timeout * 1000))
+    return settings
+
+
+def connect_kwargs(application_name: str = DB_APPLICATION_NAME,
+                   statement_timeout: float = DB_STATEMENT_TIMEOUT) -> dict:
+    """Parámetros comunes de asyncpg.connect / asyncpg.create_pool."""
+    return dict(
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        host=DB_HOST,
+        port=int(DB_PORT),
+        timeout=DB_CONNECT_TIMEOUT,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        max_cached_statement_lifetime=DB_MAX_CACHED_STATEMENT_LIFETIME,
+        server_settings=_server_settings(application_name, statement_timeout),
+    )
+
+
+# ----------------------------------------------------
+# Asíncrono (asyncpg)
+# ----------------------------------------------------
+
+async def connect(vector: bool = True, application_name: str = DB_APPLICATION_NAME,
+                  statement_timeout: float = DB_STATEMENT_TIMEOUT) -> asyncpg.Connection:
+    """
+    Conexión individual, para lo que no debe salir de un pool: LISTEN, cursores
+    que duran toda la corrida. vector=True registra el codec binario de pgvector.
+    """
+    conn = await asyncpg.connect(**connect_kwargs(application_name, statement_timeout))
+    if vector:
+        try:
+            await register_vector_codec(conn)
+        except Exception:
+            await conn.close()
+            raise
+    return conn
+
+
+async def create_pool(min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE,
+                      init=None, vector: bool = True, application_name: str = DB_APPLICATION_NAME,
+                      statement_timeout: float = DB_STATEMENT_TIMEOUT) -> asyncpg.Pool:
+    """
+    Pool asyncpg con la configuración común. init (opcional) corre en cada conexión
+    nueva después de registrar el codec de pgvector, p. ej. para preparar sentencias.
+    """
+    async def init_connection(conn):
+        if vector:
+            await register_vector_codec(conn)
+        if init is not None:
+            await init(conn)
+
+    return await asyncpg.create_pool(
+        min_size=min(min_size, max_size),
+        max_size=max_size,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+        init=init_connection,
+        **connect_kwargs(application_name, statement_timeout)
+    )
+
+
+async def stream(conn, query: str, *args, prefetch: int = DB_STREAM_FETCH_SIZE):
+    """
+    Itera el resultado con un cursor del lado del servidor, de a `prefetch` filas,
+    sin materializar la consulta completa. Ocupa la conexión hasta terminar.
+    """
+    async with conn.transaction(readonly=True):
+        async for record in conn.cursor(query, *args, prefetch=prefetch):
+            yield record
+
+
+# ----------------------------------------------------
+# Sincrónico (psycopg2)
+# ----------------------------------------------------
+
+_sync_pool = None
+_sync_pool_lock = threading.Lock()
+
+
+def sync_pool(application_name: str = DB_APPLICATION_NAME):
+    """ThreadedConnectionPool del proceso; se crea en el primer uso."""
+    global _sync_pool
+    if psycopg2 is None:
+        raise RuntimeError("psycopg2 no está instalado: pip install psycopg2-binary")
+    with _sync_pool_lock:
+        if _sync_pool is None:
+            options = f"-c application_name={application_name}"
+            if DB_STATEMENT_TIMEOUT:
+                options += f" -c statement_timeout={int(DB_STATEMENT_TIMEOUT * 1000)}"
+            _sync_pool = ThreadedConnectionPool(
+                1,
+                DB_POOL_MAX_SIZE,
+                dbname=DB_NAME,
+                user=DB_USER,
+                password=DB_PASSWORD,
+                host=DB_HOST,
+                port=DB_PORT,
+                connect_timeout=max(1, int(DB_CONNECT_TIMEOUT)),
+                options=options
+            )
+        return _sync_pool
+
+
+@contextmanager
+def sync_connection():
+    """Conexión del pool sincrónico: commit al salir, rollback si hubo excepción."""
+    pool = sync_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def sync_stream(query: str, params=None, itersize: int = DB_STREAM_FETCH_SIZE):
+    """Versión sincrónica de stream(): cursor con nombre, de a `itersize` filas."""
+    with sync_connection() as conn:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            yield from cur
+
+
+def close_sync_pool():
+    global _sync_pool
+    with _sync_pool_lock:
+        if _sync_pool is not None:
+            _sync_pool.closeall()
+            _sync_pool = None
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Genera descripcion_ia para las propiedades que no la tienen (los scrapers la
+dejan vacía) a partir de descripcion_manual, las amenities y los campos
+estructurados, usando MODEL_GENERATION. Al terminar corre la vectorización.
+
+- Deduplicación: las inmobiliarias reutilizan el mismo texto en varios avisos;
+  las filas con la misma entrada (hash) comparten una sola llamada al modelo.
+- Caché en disco (SQLite) por hash de entrada: re-ejecutar el script o volver a
+  cargar un aviso ya visto no vuelve a llamar a la API.
+- N workers concurrentes bajo el mismo token bucket y reintentos que vector_generator.
+
+Uso:
+    python descripcion_generator.py [--workers 4] [--rpm 60] [--dry-run] [--sin-embeddings]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+import db
+from description_source import source_fields
+from rate_limit import TokenBucket, retry_async
+
+load_dotenv('cred.env')
+
+# --- Configuración de Gemini (la de BD está en db.py) ---
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+MODEL_GENERATION = 'gemini-2.5-flash'
+# Cambiar el prompt invalida la caché: la versión forma parte del hash de entrada
+PROMPT_VERSION = 1
+
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "4"))
+GEMINI_GENERATION_RPM = float(os.getenv("GEMINI_GENERATION_RPM", "60"))
+GENERATION_MAX_RETRIES = int(os.getenv("GENERATION_MAX_RETRIES", "6"))
+DESCRIPCION_CACHE_DB = os.getenv("DESCRIPCION_CACHE_DB", "descripcion_cache.sqlite3")
+
+try:
+    client = genai.Client(api_key=GEMINI_API_KEY)
+    print("✅ Cliente Gemini inicializado.")
+except Exception as e:
+    print(f"❌ Error al inicializar cliente Gemini: {e}")
+    exit()
+
+
+SQL_PENDING_DESCRIPTIONS = """
+    SELECT id_propiedad, tipo_propiedad, ciudad, ambientes, metros_cuadrados,
+           descripcion_manual, amenities
+    FROM Propiedad
+    WHERE descripcion_manual IS NOT NULL
+    AND btrim(descripcion_manual) <> ''
+    AND (descripcion_ia IS NULL OR btrim(descripcion_ia) = '')
+    ORDER BY id_propiedad;
+"""
+
+SYSTEM_INSTRUCTION = (
+    "Eres un redactor inmobiliario. Reescribe la descripción de una propiedad en "
+    "español rioplatense, en un solo párrafo de 80 a 150 palabras, sin markdown. "
+    "Usa solo los datos provistos: no inventes características, precios ni direcciones. "
+    "Menciona el tipo de propiedad, ambientes, superficie, ciudad y las amenities "
+    "relevantes, de forma que una persona que busque algo así la encuentre."
+)
+
+
+def input_hash(fields: dict) -> str:
+    canonical = json.dumps(
+        {"model": MODEL_GENERATION, "prompt": PROMPT_VERSION, "fields": fields},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def build_prompt(fields: dict) -> str:
+    amenities = ", ".join(k.replace("_", " ") for k, v in fields["amenities"].items() if v) or "no informadas"
+    return (
+        f"Tipo: {fields['tipo_propiedad']}\n"
+        f"Ciudad: {fields['ciudad']}\n"
+        f"Ambientes: {fields['ambientes']}\n"
+        f"Superficie: {fields['metros_cuadrados']} m²\n"
+        f"Amenities: {amenities}\n"
+        f"Descripción original:\n{fields['descripcion_manual']}"
+    )
+
+
+class DescriptionCache:
+    """Salidas del modelo por hash de entrada, persistidas en SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS descripciones (
+                input_hash TEXT PRIMARY KEY,
+                modelo TEXT NOT NULL,
+                descripcion TEXT NOT NULL,
+                creado REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def get_many(self, hashes) -> dict:
+        found = {}
+        hashes = list(hashes)
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            for h, text in self._db.execute(
+                f"SELECT input_hash, descripcion FROM descripciones WHERE input_hash IN ({marks})", chunk
+            ):
+                found[h] = text
+        return found
+
+    def set(self, h: str, text: str):
+        self._db.execute(
+            "INSERT OR REPLACE INTO descripciones (input_hash, modelo, descripcion, creado) VALUES (?, ?, ?, ?)",
+            (h, MODEL_GENERATION, text, time.time())
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+async def generate_description(fields: dict) -> str:
+    response = await client.aio.models.generate_content(
+        model=MODEL_GENERATION,
+        contents=[build_prompt(fields)],
+        config=types.GenerateContentConfig(
+            system_instruction=SYSTEM_INSTRUCTION
+        )
+    )
+    text = (response.text or "").strip()
+    if not text:
+        raise ValueError("El modelo devolvió una descripción vacía.")
+    return text
+
+
+async def write_descriptions(conn, ids: list, text: str) -> int:
+    status = await conn.execute("""
+        UPDATE Propiedad
+        SET descripcion_ia = $2
+        WHERE id_propiedad = ANY($1::int[])
+        AND (descripcion_ia IS NULL OR btrim(descripcion_ia) = '');
+    """, ids, text)
+    return int(status.split()[-1])
+
+
+async def generation_worker(name: str, pool, queue: asyncio.Queue, bucket: TokenBucket,
+                            cache: DescriptionCache, stats: dict):
+    def log_retry(attempt, error, delay):
+        stats["retries"] += 1
+        print(f"  ⏳ [{name}] Reintento {attempt} en {delay:.1f}s: {error}")
+
+    async def limited_generate(fields):
+        await bucket.acquire()
+        return await generate_description(fields)
+
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        h, fields, ids = item
+        try:
+            text = await retry_async(
+                lambda: limited_generate(fields),
+                retries=GENERATION_MAX_RETRIES,
+                on_retry=log_retry
+            )
+            cache.set(h, text)
+            stats["generated"] += 1
+            async with pool.acquire() as conn:
+                stats["updated"] += await write_descriptions(conn, ids, text)
+            print(f"  [{name}] {len(ids)} propiedad(es) (IDs {ids[:5]}{'...' if len(ids) > 5 else ''})")
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"  ❌ [{name}] Error al generar la descripción de IDs {ids[:5]}: {e}")
+
+
+async def generate_descriptions(
+    workers: int = GENERATION_WORKERS,
+    requests_per_minute: float = GEMINI_GENERATION_RPM,
+    cache_path: str = DESCRIPCION_CACHE_DB,
+    dry_run: bool = False,
+    embed: bool = True
+):
+    pool = None
+    cache = DescriptionCache(cache_path)
+    try:
+        pool = await db.create_pool(min_size=1, max_size=workers, vector=False,
+                                    application_name="descripcion_generator")
+        print("✅ Conexión a PostgreSQL establecida.")
+
+        # 1. Agrupar filas por entrada idéntica, leyendo con un cursor (solo se
+        #    guardan los campos de entrada y los ids, no las filas completas)
+        groups = {}  # hash -> (fields, [ids])
+        pending = 0
+        async with pool.acquire() as conn:
+            async for row in db.stream(conn, SQL_PENDING_DESCRIPTIONS):
+                fields = source_fields(row)
+                h = input_hash(fields)
+                groups.setdefault(h, (fields, []))[1].append(row['id_propiedad'])
+                pending += 1
+
+        cached = cache.get_many(groups)
+        to_generate = [h for h in groups if h not in cached]
+        print(f"Propiedades sin descripcion_ia: {pending} | entradas únicas: {len(groups)} | "
+              f"en caché: {len(cached)} | llamadas al modelo: {len(to_generate)}")
+
+        if dry_run:
+            print(f"  Duración mínima: {len(to_generate) / requests_per_minute:.1f} min "
+                  f"a {requests_per_minute:g} llamadas/min")
+            return
+
+        stats = {"generated": 0, "updated": 0, "failed": 0, "retries": 0}
+
+        # 2. Las entradas ya generadas se escriben sin llamar a la API
+        async with pool.acquire() as conn:
+            for h, text in cached.items():
+                stats["updated"] += await write_descriptions(conn, groups[h][1], text)
+
+        # 3. El resto, con N workers bajo la cuota de generación
+        if to_generate:
+            queue = asyncio.Queue()
+            for h in to_generate:
+                fields, ids = groups[h]
+                queue.put_nowait((h, fields, ids))
+            for _ in range(workers):
+                queue.put_nowait(None)
+            bucket = TokenBucket.per_minute(requests_per_minute)
+            await asyncio.gather(*[
+                generation_worker(f"w{i}", pool, queue, bucket, cache, stats)
+                for i in range(workers)
+            ])
+
+        print(f"\n--- Descripciones: {stats['updated']} filas actualizadas, {stats['generated']} generadas, "
+              f"{stats['failed']} fallidas ({stats['retries']} reintentos) ---")
+
+    finally:
+        cache.close()
+        if pool:
+            await pool.close()
+
+    # 4. Las descripciones nuevas quedan pendientes de vectorizar (hash distinto)
+    if embed and not dry_run:
+        from vector_generator import generate_and_update_vectors
+        await generate_and_update_vectors()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera descripcion_ia y luego los embeddings.")
+    parser.add_argument("--workers", type=int, default=GENERATION_WORKERS)
+    parser.add_argument("--rpm", type=float, default=GEMINI_GENERATION_RPM, help="Cuota de llamadas por minuto")
+    parser.add_argument("--cache", default=DESCRIPCION_CACHE_DB, help="Archivo SQLite de la caché")
+    parser.add_argument("--dry-run", action="store_true", help="Solo informa filas, duplicados y llamadas")
+    parser.add_argument("--sin-embeddings", action="store_true", help="No correr vector_generator al final")
+    args = parser.parse_args()
+    asyncio.run(generate_descriptions(
+        workers=args.workers,
+        requests_per_minute=args.rpm,
+        cache_path=args.cache,
+        dry_run=args.dry_run,
+        embed=not args.sin_embeddings
+    ))
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Entrada de descripcion_generator.py para una propiedad, sin dependencias de Gemini
+ni de la BD: la usan el generador (hash de la caché) y scrapping/bulk_loader.py
+(decidir si un aviso recargado conserva su descripcion_ia).
+
+El texto del agente se compara con los espacios colapsados: el volcado viejo lo
+guardaba como "$$ texto $$" (con un espacio a cada lado) y el scraper lo recorta,
+pero para el modelo es la misma entrada.
+"""
+
+import json
+
+
+def source_fields(row) -> dict:
+    """
+    Entrada del modelo para una fila. Precio, título y dirección quedan fuera a
+    propósito: ya son columnas propias y, sin ellos, los avisos que comparten el
+    texto de la inmobiliaria producen la misma entrada (y una sola llamada).
+    """
+    amenities = row['amenities']
+    if isinstance(amenities, str):
+        amenities = json.loads(amenities)
+    return {
+        "tipo_propiedad": row['tipo_propiedad'],
+        "ciudad": row['ciudad'],
+        "ambientes": row['ambientes'],
+        "metros_cuadrados": row['metros_cuadrados'],
+        "amenities": amenities or {},
+        "descripcion_manual": " ".join((row['descripcion_manual'] or "").split()),
+    }
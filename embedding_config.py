@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo y dimensión de los embeddings, en un solo lugar (cred.env):
+
+    EMBEDDING_MODEL  -> modelo de Gemini (por defecto 'text-embedding-004')
+    EMBEDDING_DIM    -> output_dimensionality pedida al modelo (por defecto 768)
+
+vector_generator.py vectoriza las propiedades y main.py las consultas: si usaran
+modelos o dimensiones distintos, los vectores de las consultas no serían
+comparables con los guardados. Cambiar cualquiera de los dos exige re-vectorizar
+(vector_generator.py detecta las filas con otro modelo o dimensión) y, para la
+dimensión, cambiar el tipo de la columna (ver migracion_006_embedding_version.sql).
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cred.env'))
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "768"))
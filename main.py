@@ -2,110 +2,410 @@ from fastapi import FastAPI, HTTPException
 import asyncpg
 from dotenv import load_dotenv
 import os
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel # <-- NUEVO
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field # <-- NUEVO
+from typing import Dict, Literal, Optional, Union
+from decimal import Decimal
 import asyncio # <-- NUEVO
 import logging
 from google import genai # <-- NUEVO
 from google.genai import types # <-- NUEVO (Para EmbedContentConfig)
 import logging
 import json
+import base64
+import hashlib
+from datetime import datetime, timezone
+import numpy as np
+from contextlib import asynccontextmanager
+from cache import SemanticCache, SingleFlight, TTLCache, normalize_query
+import db
+from embedding_config import EMBEDDING_DIM, EMBEDDING_MODEL
+from memory_index import MemoryIndex
 
 
 # Cargar variables de entorno
 load_dotenv('cred.env')
 
-EMBEDDING_MODEL = 'text-embedding-004'
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 MODEL_GENERATION = 'gemini-2.5-flash' # Elegimos un modelo rápido y potente
 
 try:
-    # Usamos el Cliente Síncrono estándar, la sintaxis que funcionó en vector_generator.py
+    # Las búsquedas usan la interfaz asíncrona nativa (gemini_client.aio), sin hilos
     gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-    print("✅ Cliente Gemini Síncrono inicializado para búsquedas.")
+    print("✅ Cliente Gemini (asíncrono) inicializado para búsquedas.")
 except Exception as e:
     print(f"❌ Error al inicializar cliente Gemini en main.py: {e}")
+
+# Máximo de llamadas simultáneas a Gemini desde este proceso
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+# Llamadas idénticas en vuelo (mismo embedding / mismo resumen) comparten una sola petición
+gemini_singleflight = SingleFlight()
     
 
-# --- Configuración de la Base de Datos ---
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT") 
+# --- Base de datos ---
+# Credenciales, tamaños de pool, timeouts y caché de sentencias: ver db.py (cred.env).
+# DB_POOL_MIN_SIZE conexiones se abren (y se preparan) al arrancar, antes de aceptar tráfico.
+DB_APPLICATION_NAME = "api_busqueda"
+
+# --- Parámetros del índice vectorial (ver querypostgresql/migracion_001_indice_embedding.sql) ---
+# Valores por defecto para cada búsqueda; SearchQuery puede sobreescribirlos.
+# Vacío = se usa el valor del servidor (hnsw.ef_search=40, ivfflat.probes=1).
+HNSW_EF_SEARCH = os.getenv("HNSW_EF_SEARCH")
+IVFFLAT_PROBES = os.getenv("IVFFLAT_PROBES")
+# pgvector >= 0.8: con filtros, seguir recorriendo el grafo HNSW hasta juntar LIMIT
+# filas que los cumplan. Por defecto 'relaxed_order' (la consulta externa ya reordena
+# por distancia); también 'strict_order'. 'off' lo desactiva (obligatorio con
+# pgvector < 0.8): entonces una búsqueda filtrada que vuelve corta se repite con
+# ef_search = HNSW_MAX_EF_SEARCH.
+HNSW_ITERATIVE_SCAN = os.getenv("HNSW_ITERATIVE_SCAN", "relaxed_order")
+if HNSW_ITERATIVE_SCAN in ("", "off"):
+    HNSW_ITERATIVE_SCAN = None
+
+# --- Cuantización de embeddings (ver querypostgresql/migracion_005_cuantizacion.sql) ---
+# BD: "none" | "halfvec" (float16) | "binary" (1 bit/dim). La pasada gruesa usa el
+# índice HNSW compacto y los limit * QUANTIZATION_RERANK_FACTOR candidatos se
+# reordenan con la distancia exacta sobre la columna float32.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+# Índice en memoria: "none" | "int8" | "binary" (memory_index.py). int8 y binary
+# solo reducen la memoria residente: int8 es más lento que "none" y binary pierde
+# recall (~0.86 @10); ver benchmarks/benchmark_cuantizacion.py
+MEMORY_INDEX_QUANTIZATION = os.getenv("MEMORY_INDEX_QUANTIZATION", "none")
+QUANTIZATION_RERANK_FACTOR = int(os.getenv("QUANTIZATION_RERANK_FACTOR", "10"))
+
+# --- Motor de búsqueda vectorial ---
+# "db": pgvector (por defecto). "memory": snapshot mmap de embeddings en el proceso
+# (memory_index.py), actualizado por LISTEN/NOTIFY; la BD queda como respaldo.
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "db")
+EMBEDDING_SNAPSHOT_DIR = os.getenv("EMBEDDING_SNAPSHOT_DIR", "snapshots")
+
+# --- Búsqueda híbrida (vector + texto completo, fusión RRF) ---
+# Cada rama aporta limit * HYBRID_CANDIDATE_FACTOR candidatos a la fusión.
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "4"))
+
+# --- Paginación por cursor (keyset) ---
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "100"))
+# Filas extra que la búsqueda vectorial lee por encima de LIMIT antes de ordenar por
+# (distancia, id): los empates (avisos con la misma descripción, mismo vector)
+# quedan completos en la página y no se pierden al cruzar el cursor.
+KEYSET_TIE_SLACK = int(os.getenv("KEYSET_TIE_SLACK", "16"))
+# ef_search por defecto de pgvector; ver hnsw_ef_search() y HNSW_ITERATIVE_SCAN
+HNSW_DEFAULT_EF_SEARCH = 40
+HNSW_MAX_EF_SEARCH = 1000
+
+# --- Caché de embeddings de consultas ---
+# Clave: (modelo, texto normalizado). Evita repetir la llamada a embed_content (~100-300 ms).
+query_embedding_cache = TTLCache(
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+)
+
+# --- Caché de resúmenes RAG ---
+# Clave: (consulta normalizada, ids ordenados, modelo, huella del contenido).
+rag_summary_cache = TTLCache(
+    maxsize=int(os.getenv("RAG_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RAG_CACHE_TTL", "3600"))
+)
+
+# --- Caché semántica de búsquedas completas (resultados + resumen RAG) ---
+# Paráfrasis ("depto con pileta" / "departamento con piscina") con similitud de
+# coseno >= SEMANTIC_CACHE_THRESHOLD reutilizan la respuesta sin repetir la búsqueda
+# vectorial ni el LLM. Cada entrada guarda la huella de sus propiedades y un acierto
+# solo vale si coincide con la BD (ver cached_search_is_current).
+semantic_search_cache = SemanticCache(
+    dim=EMBEDDING_DIM,
+    capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "600"))
+)
 
-app = FastAPI(title="MVP Búsqueda Inmobiliaria IA")
+# --- Presupuesto de latencia por búsqueda ---
+# Si el resumen RAG no entra en el presupuesto restante se responde sin él
+# (degraded=true) y la generación sigue en segundo plano para llenar las cachés.
+SEARCH_BUDGET_MS = int(os.getenv("SEARCH_BUDGET_MS", "8000"))
+
+# Referencias a las tareas en segundo plano (evita que el GC las cancele)
+background_tasks = set()
+
+RAG_FALLBACK_MESSAGE = "No fue posible generar el resumen de coincidencia en este momento."
 
 # Variable global para el pool de conexiones (FastAPI la inicializa)
 db_pool = None 
+# Índice vectorial en memoria (solo con SEARCH_ENGINE=memory)
+memory_index = None
 
 
-    
-    
+# ----------------------------------------------------
+# 0. Consultas SQL frecuentes
+# ----------------------------------------------------
+# Se preparan en cada conexión nueva del pool (ver init_db_connection); asyncpg
+# reutiliza la sentencia preparada de su caché mientras el texto sea idéntico.
+
+# Conjuntos de campos ("fields"): "card" alcanza para las tarjetas del listado;
+# "full" agrega los textos largos y las amenities, que solo se leen si se piden.
+FieldSet = Literal["card", "full"]
+
+LISTING_COLUMNS = {
+    "card": [
+        "id_propiedad", "titulo", "direccion", "ciudad", "tipo_propiedad", "ambientes",
+        "metros_cuadrados", "precio_alquiler", "moneda",
+        "ST_X(ubicacion) AS longitud", "ST_Y(ubicacion) AS latitud", "fecha_publicacion",
+    ],
+}
+LISTING_COLUMNS["full"] = LISTING_COLUMNS["card"] + [
+    "descripcion_manual", "descripcion_ia", "amenities", "esta_disponible",
+]
+
+
+def top_properties_sql(fields: str = "card", after: bool = False) -> str:
+    """
+    Listado por fecha de publicación: $1 = LIMIT; con after, $2/$3 = fecha e id de
+    la última fila de la página anterior. La comparación de filas sigue el índice
+    (fecha_publicacion DESC, id_propiedad DESC) de la migración 008, así que cada
+    página cuesta lo mismo que la primera.
+    """
+    keyset = "WHERE (fecha_publicacion, id_propiedad) < ($2, $3)" if after else ""
+    return f"""
+    SELECT 
+        {", ".join(LISTING_COLUMNS[fields])}
+    FROM Propiedad 
+    {keyset}
+    ORDER BY fecha_publicacion DESC, id_propiedad DESC
+    LIMIT $1;
+"""
+
+
+SQL_TOP_PROPERTIES = {
+    (fields, after): top_properties_sql(fields, after)
+    for fields in LISTING_COLUMNS for after in (False, True)
+}
+
+def semantic_search_sql(conditions=(), with_description: bool = True) -> str:
+    """
+    Búsqueda por similitud: $1 = vector de la consulta, $2 = LIMIT, $3... = filtros.
+    'embedding' <=> $1' calcula la distancia de coseno. Cuanto menor el valor, más similar.
+    El ORDER BY sobre la distancia es el que permite usar el índice HNSW/IVFFlat; los
+    filtros van en el WHERE para que el planner pueda partir de los índices B-tree/GIN.
+    La consulta externa desempata por id_propiedad (orden estable para el cursor): el
+    índice solo sabe ordenar por la distancia, así que el desempate va afuera.
+    Con VECTOR_QUANTIZATION el orden grueso usa la expresión del índice cuantizado.
+    Sin with_description no se lee descripcion_ia (tarjetas, páginas siguientes).
+    """
+    where = "\n        AND ".join(["embedding IS NOT NULL", *conditions])
+    columns = "id_propiedad, titulo, precio_alquiler" + (", descripcion_ia" if with_description else "")
+    if VECTOR_QUANTIZATION == "none":
+        return f"""
+    SELECT 
+        {columns},
+        distance
+    FROM (
+        SELECT {columns}, embedding <=> $1 AS distance
+        FROM 
+            Propiedad
+        WHERE 
+            {where}
+        ORDER BY 
+            distance ASC
+        LIMIT $2 + {KEYSET_TIE_SLACK}
+    ) AS candidatos
+    ORDER BY 
+        distance ASC, id_propiedad ASC
+    LIMIT $2;
+"""
+
+    # Cuantizado: candidatos por el índice compacto, re-ranking exacto en la consulta externa
+    coarse_distance = {
+        "halfvec": f"embedding::halfvec({EMBEDDING_DIM}) <=> $1::vector::halfvec({EMBEDDING_DIM})",
+        "binary": f"binary_quantize(embedding)::bit({EMBEDDING_DIM}) <~> binary_quantize($1::vector)",
+    }[VECTOR_QUANTIZATION]
+    return f"""
+    SELECT 
+        {columns},
+        embedding <=> $1 AS distance
+    FROM (
+        SELECT {columns}, embedding
+        FROM Propiedad
+        WHERE 
+            {where}
+        ORDER BY {coarse_distance}
+        LIMIT $2 * {QUANTIZATION_RERANK_FACTOR}
+    ) AS candidatos
+    ORDER BY 
+        distance ASC, id_propiedad ASC
+    LIMIT $2;
+"""
+
+
+SQL_SEMANTIC_SEARCH = semantic_search_sql()
+
+
+def lexical_search_sql(conditions=()) -> str:
+    """
+    Búsqueda de texto completo (configuración 'spanish') sobre la columna generada
+    busqueda_tsv: $1 = vector (solo para informar la distancia), $2 = LIMIT,
+    $3 = texto de la consulta, $4... = filtros. Usa el índice GIN de la migración 004.
+    """
+    where = "\n        AND ".join(["busqueda_tsv @@ q", *conditions])
+    return f"""
+    SELECT 
+        id_propiedad, 
+        titulo, 
+        precio_alquiler, 
+        descripcion_ia,
+        embedding <=> $1 AS distance
+    FROM 
+        Propiedad,
+        websearch_to_tsquery('spanish', $3) AS q
+    WHERE 
+        {where}
+    ORDER BY 
+        ts_rank_cd(busqueda_tsv, q) DESC, id_propiedad
+    LIMIT $2;
+"""
+
+
+SQL_LEXICAL_SEARCH = lexical_search_sql()
+
 
 # ----------------------------------------------------
 # 1. Funciones de Startup/Shutdown de FastAPI
 # ----------------------------------------------------
-# Se ejecuta antes de que Uvicorn acepte solicitudes
-@app.on_event("startup")
+async def init_db_connection(conn):
+    """
+    Hook 'init' del pool: se ejecuta una vez por cada conexión nueva, con el
+    codec binario de pgvector ya registrado por db.create_pool. Deja preparadas
+    (y planificadas) las consultas calientes, para que la primera petición no
+    pague ese costo.
+    """
+    # LIMIT 0: prepara la sentencia en la caché de asyncpg sin leer filas
+    zero_vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    await conn.fetch(SQL_SEMANTIC_SEARCH, zero_vector, 0)
+    await conn.fetch(SQL_LEXICAL_SEARCH, zero_vector, 0, "")
+    await conn.fetch(SQL_TOP_PROPERTIES[("card", False)], 0)
+    await conn.fetch(SQL_TOP_PROPERTIES[("card", True)], 0, datetime.now(timezone.utc), 0)
+
+
 async def startup_db_pool():
     global db_pool
     try:
-        # Crea el pool de conexiones asíncrono
-        db_pool = await asyncpg.create_pool(
-            timeout=5.0,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            host=DB_HOST,
-            port=int(DB_PORT),
-            min_size=1, 
-            max_size=10
-        )
-        print("✅ Pool de conexiones a PostgreSQL (asyncpg) creado.")
+        # Crea el pool de conexiones asíncrono; abre DB_POOL_MIN_SIZE conexiones ya inicializadas
+        db_pool = await db.create_pool(init=init_db_connection, application_name=DB_APPLICATION_NAME)
+        print(f"✅ Pool de conexiones a PostgreSQL (asyncpg) creado ({db.DB_POOL_MIN_SIZE} conexiones precalentadas).")
     except Exception as e:
         print(f"❌ Error al crear el pool de BD: {e}")
         raise RuntimeError("No se pudo iniciar la conexión a la base de datos.")
 
 
-# Se ejecuta cuando Uvicorn se detiene
-@app.on_event("shutdown")
+async def startup_memory_index():
+    """Carga el snapshot de embeddings y se suscribe a los cambios (SEARCH_ENGINE=memory)."""
+    global memory_index
+    try:
+        index = MemoryIndex.load(
+            EMBEDDING_SNAPSHOT_DIR,
+            quantization=MEMORY_INDEX_QUANTIZATION,
+            rerank_factor=QUANTIZATION_RERANK_FACTOR
+        )
+
+        async def connect_listener():
+            return await db.connect(application_name=f"{DB_APPLICATION_NAME}_listener")
+
+        await index.start_listener(connect_listener, db_pool)
+        memory_index = index
+        print(f"✅ Índice vectorial en memoria cargado ({len(index)} propiedades).")
+    except Exception as e:
+        # Sin índice en memoria la búsqueda sigue funcionando contra la BD
+        print(f"⚠️ No se pudo cargar el índice en memoria, se usa la BD: {e}")
+
+
 async def shutdown_db_pool():
     if db_pool:
         await db_pool.close()
         print("🔌 Pool de conexiones a PostgreSQL cerrado.")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Se ejecuta antes de que Uvicorn acepte solicitudes
+    await startup_db_pool()
+    if SEARCH_ENGINE == "memory":
+        await startup_memory_index()
+    yield
+    # Se ejecuta cuando Uvicorn se detiene
+    if memory_index is not None:
+        await memory_index.close()
+    await shutdown_db_pool()
+
+
+app = FastAPI(title="MVP Búsqueda Inmobiliaria IA", lifespan=lifespan)
+
 # ----------------------------------------------------
 # 2. Endpoint de Propiedades (Consulta Real a BD)
 # ----------------------------------------------------
-@app.get("/propiedades/top")
-async def get_top_properties():
+def encode_cursor(payload: dict) -> str:
+    """Cursor opaco para el cliente: JSON compacto en base64 url-safe."""
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Inverso de encode_cursor; un cursor corrupto o ajeno responde 422."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=422, detail="Cursor inválido.")
+    return payload
+
+
+def listing_row_to_dict(row) -> dict:
+    data = dict(row)
+    data['precio_alquiler'] = float(data['precio_alquiler'])
+    if isinstance(data.get('amenities'), str):
+        data['amenities'] = json.loads(data['amenities'])
+    return data
+
+
+@app.get("/propiedades/top", summary="Propiedades más recientes, paginadas por cursor")
+async def get_top_properties(
+    limit: int = Query(default=5, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: FieldSet = "card"
+):
     """
-    Recupera el título, la dirección y las coordenadas geográficas 
-    (obtenidas de PostGIS) de las 5 primeras propiedades.
+    Propiedades ordenadas de la más nueva a la más vieja (fecha_publicacion, id).
+    Para la página siguiente se envía el next_cursor de la respuesta; es null
+    cuando no hay más filas. fields="full" agrega descripciones y amenities.
     """
-    
+    args = [limit + 1]  # una fila de más indica si hay otra página
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        try:
+            args += [datetime.fromisoformat(after["f"]), int(after["id"])]
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=422, detail="Cursor inválido.")
+        if args[1].tzinfo is None:
+            raise HTTPException(status_code=422, detail="Cursor inválido.")
+
     # Adquiere una conexión del pool y la libera al salir del bloque 'async with'
     async with db_pool.acquire() as conn:
         # Ejecuta la consulta SQL, incluyendo las funciones de PostGIS
-        results = await conn.fetch("""
-            SELECT 
-                titulo, 
-                direccion, 
-                ST_X(ubicacion) AS longitud, 
-                ST_Y(ubicacion) AS latitud
-            FROM Propiedad 
-            LIMIT 5;
-        """)
+        results = await conn.fetch(SQL_TOP_PROPERTIES[(fields, cursor is not None)], *args)
 
     # Transforma los resultados (objetos Record) en una lista de diccionarios
-    data = [dict(row) for row in results]
+    data = [listing_row_to_dict(row) for row in results[:limit]]
+    next_cursor = None
+    if len(results) > limit:
+        last = data[-1]
+        next_cursor = encode_cursor({"f": last["fecha_publicacion"].isoformat(), "id": last["id_propiedad"]})
     
     return {
         "status": "success",
         "count": len(data),
-        "data": data
+        "data": data,
+        "next_cursor": next_cursor
     }
 
 
@@ -115,61 +415,534 @@ async def get_top_properties():
 
 
 
-async def search_properties_semantic(pool: asyncpg.Pool, query: str, limit: int = 5):
-    """Genera el embedding de la consulta y ejecuta la búsqueda de similitud en PostgreSQL."""
-    
-    # 1. Generar embedding de la consulta del usuario
-    try:
-        # Usamos asyncio.to_thread para correr la función síncrona en un hilo
-        response = await asyncio.to_thread(
-            gemini_client.models.embed_content,
-            model=EMBEDDING_MODEL,
-            contents=[query], 
-            config=types.EmbedContentConfig( 
-                task_type="RETRIEVAL_QUERY", # Usamos RETRIEVAL_QUERY para la consulta
-            ),
+class GeoRadius(BaseModel):
+    """Punto y radio en metros ("cerca de aquí")."""
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    radio_m: float = Field(gt=0, le=100000)
+
+
+class BoundingBox(BaseModel):
+    """Rectángulo visible del mapa (viewport), en grados WGS84."""
+    min_lat: float = Field(ge=-90, le=90)
+    min_lon: float = Field(ge=-180, le=180)
+    max_lat: float = Field(ge=-90, le=90)
+    max_lon: float = Field(ge=-180, le=180)
+
+
+def geo_point_sql(lon_param: str, lat_param: str) -> str:
+    """Expresión SQL de un punto WGS84 como geography (distancias en metros)."""
+    return f"ST_SetSRID(ST_MakePoint({lon_param}, {lat_param}), 4326)::geography"
+
+
+class SearchFilters(BaseModel):
+    """Filtros estructurados; se aplican en el SQL antes de ordenar por similitud."""
+    precio_min: Optional[float] = Field(default=None, ge=0)
+    precio_max: Optional[float] = Field(default=None, ge=0)
+    ambientes_min: Optional[int] = Field(default=None, ge=0)
+    ambientes_max: Optional[int] = Field(default=None, ge=0)
+    metros_min: Optional[int] = Field(default=None, ge=0)
+    metros_max: Optional[int] = Field(default=None, ge=0)
+    ciudad: Optional[str] = None            # sin distinguir mayúsculas
+    tipo_propiedad: Optional[str] = None    # sin distinguir mayúsculas
+    esta_disponible: Optional[bool] = None
+    # Claves que deben estar en amenities, p. ej. {"pileta": true}
+    amenities: Optional[Dict[str, Union[bool, int, float, str]]] = None
+    # Filtros geográficos (índices GiST de la migración 003)
+    cerca: Optional[GeoRadius] = None
+    viewport: Optional[BoundingBox] = None
+
+
+def build_filter_conditions(filters: Optional[SearchFilters], args: list) -> list:
+    """
+    Traduce SearchFilters a condiciones SQL parametrizadas. Cada valor se agrega a
+    args y se referencia como $n (n = posición en args), así el llamador decide
+    qué parámetros van antes.
+    Índices de apoyo: querypostgresql/migracion_002_indices_filtros.sql
+    """
+    conditions = []
+    if filters is None:
+        return conditions
+
+    def param(value) -> str:
+        args.append(value)
+        return f"${len(args)}"
+
+    if filters.precio_min is not None:
+        conditions.append(f"precio_alquiler >= {param(Decimal(str(filters.precio_min)))}")
+    if filters.precio_max is not None:
+        conditions.append(f"precio_alquiler <= {param(Decimal(str(filters.precio_max)))}")
+    if filters.ambientes_min is not None:
+        conditions.append(f"ambientes >= {param(filters.ambientes_min)}")
+    if filters.ambientes_max is not None:
+        conditions.append(f"ambientes <= {param(filters.ambientes_max)}")
+    if filters.metros_min is not None:
+        conditions.append(f"metros_cuadrados >= {param(filters.metros_min)}")
+    if filters.metros_max is not None:
+        conditions.append(f"metros_cuadrados <= {param(filters.metros_max)}")
+    if filters.ciudad:
+        conditions.append(f"lower(ciudad) = lower({param(filters.ciudad)})")
+    if filters.tipo_propiedad:
+        conditions.append(f"lower(tipo_propiedad) = lower({param(filters.tipo_propiedad)})")
+    if filters.esta_disponible is not None:
+        conditions.append(f"esta_disponible = {param(filters.esta_disponible)}")
+    if filters.amenities:
+        # @> con jsonb_path_ops usa el índice GIN
+        conditions.append(f"amenities @> {param(json.dumps(filters.amenities))}::jsonb")
+    if filters.viewport:
+        # && compara cajas: usa el índice GiST sobre ubicacion (geometry)
+        box = filters.viewport
+        conditions.append(
+            f"ubicacion && ST_MakeEnvelope({param(box.min_lon)}, {param(box.min_lat)}, "
+            f"{param(box.max_lon)}, {param(box.max_lat)}, 4326)"
         )
+    if filters.cerca:
+        # ST_DWithin sobre geography (metros) usa el índice GiST sobre ubicacion::geography
+        near = filters.cerca
+        point = geo_point_sql(param(near.lon), param(near.lat))
+        conditions.append(f"ST_DWithin(ubicacion::geography, {point}, {param(near.radio_m)})")
+    return conditions
+
+
+def ann_settings(
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    filtered: bool = False
+) -> dict:
+    """Parámetros del índice ANN que hay que fijar para la consulta ({} = los del servidor)."""
+    settings = {}
+    ef_search = ef_search or HNSW_EF_SEARCH
+    probes = probes or IVFFLAT_PROBES
+    if ef_search:
+        settings['hnsw.ef_search'] = str(ef_search)
+    if probes:
+        settings['ivfflat.probes'] = str(probes)
+    if filtered and HNSW_ITERATIVE_SCAN:
+        settings['hnsw.iterative_scan'] = HNSW_ITERATIVE_SCAN
+    return settings
+
+
+async def fetch_with_ann_settings(conn, sql: str, args: list, settings: dict) -> list:
+    """
+    Ejecuta sql con los parámetros ANN indicados. Sin parámetros es un fetch suelto,
+    sin BEGIN/COMMIT. Con parámetros abre una transacción y los fija en un único
+    SELECT set_config(..., true) (equivalente a SET LOCAL: el valor no queda pegado
+    a la conexión cuando vuelve al pool).
+    """
+    if not settings:
+        return await conn.fetch(sql, *args)
+    calls = ", ".join(f"set_config(${2 * i + 1}, ${2 * i + 2}, true)" for i in range(len(settings)))
+    values = [v for item in settings.items() for v in item]
+    async with conn.transaction():
+        await conn.execute(f"SELECT {calls};", *values)
+        return await conn.fetch(sql, *args)
+
+
+async def embed_query(query: str) -> np.ndarray:
+    """
+    Devuelve el embedding (RETRIEVAL_QUERY) de la consulta como array float32.
+    Las consultas repetidas se sirven desde query_embedding_cache. La clave usa el
+    texto normalizado, pero al modelo se envía el texto original (quitar acentos
+    cambia el significado de algunas palabras, p. ej. "año").
+    """
+    normalized = normalize_query(query)
+    cache_key = (EMBEDDING_MODEL, normalized)
+    cached = query_embedding_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    async def call_gemini():
+        async with gemini_semaphore:
+            response = await gemini_client.aio.models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=[query.strip()], 
+                config=types.EmbedContentConfig( 
+                    task_type="RETRIEVAL_QUERY", # Usamos RETRIEVAL_QUERY para la consulta
+                    output_dimensionality=EMBEDDING_DIM,  # la misma que los documentos
+                ),
+            )
         # Accedemos al valor de la lista de flotantes (la sintaxis que encontramos)
         embedding_object = response.embeddings[0] 
-        query_vector_list = embedding_object.values # <-- .values (en plural)
-        
-        # Convertimos la lista de Python al formato vector de PostgreSQL
-        query_vector_str = "[" + ",".join(map(str, query_vector_list)) + "]"
+        query_vector = np.asarray(embedding_object.values, dtype=np.float32) # <-- .values (en plural)
+
+        query_embedding_cache.set(cache_key, query_vector)
+        return query_vector
+
+    return await gemini_singleflight.do(("embed",) + cache_key, call_gemini)
+
+
+async def search_properties_semantic(
+    pool: asyncpg.Pool,
+    query: str,
+    limit: int = 5,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    query_vector: Optional[np.ndarray] = None,
+    filters: Optional[SearchFilters] = None,
+    after: Optional[dict] = None,
+    with_description: bool = True
+):
+    """
+    Genera el embedding de la consulta y ejecuta la búsqueda de similitud en PostgreSQL.
+    Si el llamador ya tiene el embedding (query_vector) no se vuelve a calcular.
+    after = {"d", "id", "n"} (cursor decodificado): solo filas posteriores a
+    (distancia, id) = (d, id); n es cuántas filas mostraron las páginas anteriores.
+    """
+    
+    # 1. Generar embedding de la consulta del usuario (o reutilizarlo de la caché)
+    # (el codec registrado en el pool envía el array float32 en formato binario)
+    try:
+        if query_vector is None:
+            query_vector = await embed_query(query)
         
     except Exception as e:
         # Retornamos un diccionario con el error para manejarlo en el endpoint
         return {"error": f"Error al generar embedding de la consulta: {e}"}
 
-    # 2. Ejecutar búsqueda de similitud de coseno
-    # 'embedding' <=> $1' calcula la distancia de coseno. Cuanto menor el valor, más similar.
-    results = await pool.fetch("""
-        SELECT 
-            id_propiedad, 
-            titulo, 
-            precio_alquiler, 
-            descripcion_ia,
-            embedding <=> $1 AS distance
-        FROM 
-            Propiedad
-        ORDER BY 
-            distance ASC
-        LIMIT $2;
-    """, query_vector_str, limit)
+    # 2. Ejecutar búsqueda de similitud de coseno (sin filtros: SQL_SEMANTIC_SEARCH, ya preparada)
+    args = [query_vector, limit]
+    conditions = build_filter_conditions(filters, args)
+    if not conditions and memory_index is not None and memory_index.healthy:
+        # Búsqueda exacta en el índice en memoria, sin ir a la BD. Recorre todo el
+        # snapshot en cada consulta, así que saltear las n filas ya vistas es barato
+        seen = after["n"] if after else 0
+        hits = sorted(memory_index.search(query_vector, seen + limit + KEYSET_TIE_SLACK), key=keyset_key)
+        if after:
+            hits = [h for h in hits if keyset_key(h) > (after["d"], after["id"])]
+        return hits[:limit]
+    if after:
+        conditions.append(f"(embedding <=> $1, id_propiedad) > (${len(args) + 1}::float8, ${len(args) + 2})")
+        args += [after["d"], after["id"]]
+    seen = after["n"] if after else 0
+    ef_search = hnsw_ef_search(ef_search, seen + candidate_rows(limit), filtered=bool(conditions))
+    if conditions or not with_description:
+        sql = semantic_search_sql(conditions, with_description)
+    else:
+        sql = SQL_SEMANTIC_SEARCH
+    async with pool.acquire() as conn:
+        results = await fetch_with_ann_settings(
+            conn, sql, args, ann_settings(ef_search, probes, filtered=bool(conditions))
+        )
+        used_ef_search = int(ef_search or HNSW_EF_SEARCH or HNSW_DEFAULT_EF_SEARCH)
+        if conditions and len(results) < limit and not HNSW_ITERATIVE_SCAN and used_ef_search < HNSW_MAX_EF_SEARCH:
+            # Sin iterative scan el filtro se aplica sobre los ef_search candidatos del
+            # grafo y puede dejar menos de limit filas: reintento con el máximo
+            results = await fetch_with_ann_settings(
+                conn, sql, args, ann_settings(HNSW_MAX_EF_SEARCH, probes, filtered=True)
+            )
+
+    return [property_row_to_dict(r) for r in results]
 
-    return [{
+
+def keyset_key(item: dict) -> tuple:
+    """Orden de la búsqueda vectorial y del cursor: (distancia, id_propiedad)."""
+    return (item['distance'], item['id_propiedad'])
+
+
+def candidate_rows(limit: int) -> int:
+    """
+    Filas que la consulta interna de semantic_search_sql pide al índice: LIMIT más
+    el margen de empates, o con cuantización los limit * QUANTIZATION_RERANK_FACTOR
+    candidatos del re-ranking exacto.
+    """
+    if VECTOR_QUANTIZATION == "none":
+        return limit + KEYSET_TIE_SLACK
+    return limit * QUANTIZATION_RERANK_FACTOR
+
+
+def hnsw_ef_search(ef_search: Optional[int], candidates: int, filtered: bool = False) -> Optional[int]:
+    """
+    HNSW devuelve a lo sumo ef_search filas (40 por defecto): con limit >= 40, con
+    el re-ranking de la cuantización (limit * QUANTIZATION_RERANK_FACTOR candidatos)
+    o en las páginas profundas (el filtro del cursor descarta las ya vistas), la
+    consulta volvería corta. ef_search se sube hasta cubrir los candidatos que lee la consulta
+    interna, con tope en el máximo de pgvector. Si el valor vigente alcanza se deja
+    como está (sin set_config ni transacción). Con filtros e iterative scan el índice
+    sigue recorriendo el grafo y no hace falta.
+    """
+    if filtered and HNSW_ITERATIVE_SCAN:
+        return ef_search
+    if candidates <= int(ef_search or HNSW_EF_SEARCH or HNSW_DEFAULT_EF_SEARCH):
+        return ef_search
+    return min(HNSW_MAX_EF_SEARCH, candidates)
+
+
+def property_row_to_dict(r) -> dict:
+    """Fila de las consultas de búsqueda -> diccionario de la respuesta."""
+    item = {
         'id_propiedad': r['id_propiedad'],
         'titulo': r['titulo'],
         'precio': float(r['precio_alquiler']),
-        'descripcion_ia': r['descripcion_ia'],
-        'distance': r['distance']
-    } for r in results]
+    }
+    if 'descripcion_ia' in r.keys():
+        item['descripcion_ia'] = r['descripcion_ia']
+    item['distance'] = r['distance']
+    return item
+
+
+def project_results(results: list, fields: str) -> list:
+    """Campos de cada resultado según SearchQuery.fields ("card" omite descripcion_ia)."""
+    if fields == "full":
+        return results
+    return [{k: v for k, v in r.items() if k != 'descripcion_ia'} for r in results]
+
+
+async def search_properties_lexical(
+    pool: asyncpg.Pool,
+    query: str,
+    query_vector: np.ndarray,
+    limit: int = 5,
+    filters: Optional[SearchFilters] = None
+) -> list:
+    """Candidatos por texto completo: captura tokens exactos (calles, códigos, barrios)."""
+    args = [query_vector, limit, query]
+    conditions = build_filter_conditions(filters, args)
+    sql = lexical_search_sql(conditions) if conditions else SQL_LEXICAL_SEARCH
+    async with pool.acquire() as conn:
+        results = await conn.fetch(sql, *args)
+    return [property_row_to_dict(r) for r in results]
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """
+    Fusiona listas ordenadas de propiedades con Reciprocal Rank Fusion:
+    score(d) = suma de 1 / (k + rank_i(d)), con rank empezando en 1.
+    No depende de la escala de cada puntaje (distancia de coseno vs. ts_rank).
+    """
+    scores = {}
+    items = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            prop_id = item['id_propiedad']
+            scores[prop_id] = scores.get(prop_id, 0.0) + 1.0 / (k + rank)
+            items.setdefault(prop_id, item)
+    fused = sorted(scores, key=lambda prop_id: (-scores[prop_id], prop_id))
+    return [{**items[prop_id], 'rrf_score': round(scores[prop_id], 6)} for prop_id in fused]
+
+
+async def search_properties_hybrid(
+    pool: asyncpg.Pool,
+    query: str,
+    query_vector: np.ndarray,
+    limit: int = 5,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    rrf_k: int = 60
+) -> list:
+    """
+    Recuperación híbrida: las búsquedas vectorial y de texto completo corren en
+    paralelo (cada una con su conexión del pool) y se combinan con RRF.
+    """
+    candidates = limit * HYBRID_CANDIDATE_FACTOR
+    vector_hits, lexical_hits = await asyncio.gather(
+        search_properties_semantic(
+            pool,
+            query=query,
+            limit=candidates,
+            ef_search=ef_search,
+            probes=probes,
+            query_vector=query_vector,
+            filters=filters
+        ),
+        search_properties_lexical(pool, query, query_vector, limit=candidates, filters=filters)
+    )
+    return reciprocal_rank_fusion([vector_hits, lexical_hits], k=rrf_k)[:limit]
 
 
 class SearchQuery(BaseModel):
     query: str
-    limit: int = 5
+    limit: int = Field(default=5, ge=1, le=PAGE_SIZE_MAX)
+    # Parámetros del índice ANN: más alto = mejor recall, más latencia
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)  # HNSW
+    probes: Optional[int] = Field(default=None, ge=1, le=1000)     # IVFFlat
+    # Presupuesto total de la petición; vacío = SEARCH_BUDGET_MS
+    budget_ms: Optional[int] = Field(default=None, ge=100, le=60000)
+    filters: Optional[SearchFilters] = None
+    # "hybrid": vector + texto completo fusionados con RRF; "vector": solo embeddings
+    mode: Literal["hybrid", "vector"] = "hybrid"
+    rrf_k: int = Field(default=60, ge=1, le=1000)
+    # Página siguiente (solo mode="vector"): el next_cursor de la respuesta anterior
+    cursor: Optional[str] = None
+    # "card" omite descripcion_ia en los resultados; "full" la incluye
+    fields: FieldSet = "full"
 
 
+async def retrieve_properties(
+    pool: asyncpg.Pool,
+    data: SearchQuery,
+    query_vector: np.ndarray,
+    after: Optional[dict] = None
+) -> list:
+    """
+    Etapa de recuperación de la búsqueda según data.mode. En modo vector trae una
+    fila de más para saber si hay otra página (ver paginate_results). La primera
+    página siempre lee descripcion_ia porque el resumen RAG la necesita.
+    """
+    if data.mode == "hybrid":
+        return await search_properties_hybrid(
+            pool,
+            query=data.query,
+            query_vector=query_vector,
+            limit=data.limit,
+            ef_search=data.ef_search,
+            probes=data.probes,
+            filters=data.filters,
+            rrf_k=data.rrf_k
+        )
+    return await search_properties_semantic(
+        pool, 
+        query=data.query, 
+        limit=data.limit + 1,
+        ef_search=data.ef_search,
+        probes=data.probes,
+        query_vector=query_vector,
+        filters=data.filters,
+        after=after,
+        with_description=after is None or data.fields == "full"
+    )
+
+
+def search_fingerprint(data: SearchQuery) -> str:
+    """Huella de lo que fija el orden de las páginas: un cursor solo vale para la misma búsqueda."""
+    filters_key = data.filters.model_dump_json(exclude_none=True) if data.filters else None
+    key = json.dumps([normalize_query(data.query), data.mode, data.ef_search, data.probes, filters_key])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def search_page_cursor(data: SearchQuery) -> Optional[dict]:
+    """data.cursor decodificado y validado; None en la primera página."""
+    if data.cursor is None:
+        return None
+    if data.mode != "vector":
+        raise HTTPException(
+            status_code=422,
+            detail="La paginación por cursor solo está disponible con mode='vector' (la fusión RRF no tiene un orden estable)."
+        )
+    cursor = decode_cursor(data.cursor)
+    try:
+        after = {"q": str(cursor["q"]), "d": float(cursor["d"]), "id": int(cursor["id"]), "n": int(cursor["n"])}
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="Cursor inválido.")
+    if cursor.get("h") != search_fingerprint(data):
+        raise HTTPException(status_code=422, detail="El cursor no corresponde a esta búsqueda (consulta, filtros o parámetros distintos).")
+    return after
+
+
+def paginate_results(data: SearchQuery, results: list, ranking_query: str, seen: int = 0) -> tuple:
+    """
+    (página, next_cursor): corta la fila de más de la búsqueda vectorial. El cursor
+    guarda la consulta cuyo embedding ordena las páginas (ranking_query; en un
+    acierto de la caché semántica, la consulta original) y la última (distancia, id).
+    """
+    if data.mode != "vector" or len(results) <= data.limit:
+        return results, None
+    page = results[:data.limit]
+    if not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor({
+        "q": ranking_query,
+        "d": last["distance"],
+        "id": last["id_propiedad"],
+        "n": seen + len(page),
+        "h": search_fingerprint(data)
+    })
+
+
+async def search_next_page(pool: asyncpg.Pool, data: SearchQuery, after: dict, deadline: float) -> tuple:
+    """
+    Páginas siguientes de una búsqueda vectorial: sin caché semántica ni resumen
+    RAG (el resumen describe la primera página). Devuelve (resultados, next_cursor).
+    """
+    query_vector = await embed_query_within(after["q"], deadline)
+    try:
+        results = await retrieve_properties(pool, data, query_vector, after=after)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
+    if 'error' in results:
+        raise HTTPException(status_code=500, detail=results['error'])
+    results, next_cursor = paginate_results(data, results, after["q"], after["n"])
+    return project_results(results, data.fields), next_cursor
+
+
+def remaining_budget(deadline: float) -> float:
+    """Segundos que quedan hasta el deadline (nunca negativo)."""
+    return max(0.0, deadline - asyncio.get_running_loop().time())
+
+
+def request_deadline(data: SearchQuery) -> float:
+    """Deadline absoluto (reloj del event loop) para la petición."""
+    budget_ms = data.budget_ms or SEARCH_BUDGET_MS
+    return asyncio.get_running_loop().time() + budget_ms / 1000
+
+
+async def embed_query_within(query: str, deadline: float) -> np.ndarray:
+    """embed_query acotado por el deadline; si se agota se cancela y responde 504."""
+    try:
+        return await asyncio.wait_for(embed_query(query), timeout=remaining_budget(deadline))
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Se agotó el tiempo para generar el embedding de la consulta."
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al generar embedding de la consulta: {e}")
+
+
+SQL_RESULTS_FINGERPRINT = """
+    SELECT id_propiedad, titulo, precio_alquiler, md5(coalesce(descripcion_ia, '')) AS descripcion_hash
+    FROM Propiedad
+    WHERE id_propiedad = ANY($1::int[]);
+"""
+
+
+def results_fingerprint(items) -> str:
+    """
+    Huella de (id, título, precio, md5 de descripcion_ia) de un conjunto de
+    propiedades, independiente del orden. Acepta los dicts de la respuesta o las
+    filas de SQL_RESULTS_FINGERPRINT (que ya traen el md5 calculado en la BD).
+    """
+    entries = []
+    for p in items:
+        if 'descripcion_hash' in p.keys():
+            description_hash = p['descripcion_hash']
+            price = float(p['precio_alquiler'])
+        else:
+            description_hash = hashlib.md5((p.get('descripcion_ia') or '').encode("utf-8")).hexdigest()
+            price = p['precio']
+        entries.append([p['id_propiedad'], p['titulo'], price, description_hash])
+    entries.sort(key=lambda e: e[0])
+    return hashlib.sha1(json.dumps(entries, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def cached_search_entry(query: str, results: list, rag_summary: str) -> dict:
+    """Entrada de semantic_search_cache con la huella de sus propiedades."""
+    return {
+        "query": query,
+        "results": results,
+        "rag_summary": rag_summary,
+        "fingerprint": results_fingerprint(results),
+    }
+
+
+async def cached_search_is_current(pool: asyncpg.Pool, cached: dict) -> bool:
+    """
+    Un acierto de la caché semántica solo se usa si sus propiedades no cambiaron
+    en la BD (precio, título o descripcion_ia editados, filas borradas): una
+    consulta por clave primaria en lugar de la búsqueda vectorial y el LLM.
+    """
+    rows = await pool.fetch(SQL_RESULTS_FINGERPRINT, [r['id_propiedad'] for r in cached["results"]])
+    return results_fingerprint(rows) == cached["fingerprint"]
+
+
+def semantic_cache_params(data: SearchQuery) -> tuple:
+    """Parámetros que deben coincidir para reutilizar una respuesta de la caché semántica."""
+    filters_key = data.filters.model_dump_json(exclude_none=True) if data.filters else None
+    return (data.limit, data.ef_search, data.probes, filters_key, data.mode, data.rrf_k)
+
 
 # Función de dependencia de FastAPI
 def get_db_pool():
@@ -197,39 +970,218 @@ async def search_properties(
 ):
     """
     Busca propiedades usando embeddings y genera un resumen inteligente (RAG)
-    explicando la coincidencia.
+    explicando la coincidencia. En mode="vector" la respuesta trae next_cursor
+    para pedir la página siguiente (sin resumen).
     """
+    after = search_page_cursor(data)
+    deadline = request_deadline(data)
     try:
+        if after is not None:
+            results, next_cursor = await search_next_page(pool, data, after, deadline)
+            return {
+                "query": data.query,
+                "rag_summary": None,
+                "results": results,
+                "count": len(results),
+                "semantic_cache_hit": False,
+                "degraded": False,
+                "next_cursor": next_cursor
+            }
+
+        # 0. Embedding de la consulta y caché semántica (paráfrasis de consultas recientes)
+        query_vector = await embed_query_within(data.query, deadline)
+
+        cache_params = semantic_cache_params(data)
+        cached, similarity = semantic_search_cache.lookup(query_vector, cache_params)
+        if cached is not None and not await cached_search_is_current(pool, cached):
+            cached = None
+        if cached is not None:
+            results, next_cursor = paginate_results(data, cached["results"], cached["query"])
+            return {
+                "query": data.query,
+                "rag_summary": cached["rag_summary"],
+                "results": project_results(results, data.fields),
+                "count": len(results),
+                "semantic_cache_hit": True,
+                "degraded": False,
+                "cached_query": cached["query"],
+                "cache_similarity": round(similarity, 4),
+                "next_cursor": next_cursor
+            }
+
         # 1. Ejecutar la búsqueda semántica (Recuperación)
-        results = await search_properties_semantic(
-            pool, 
-            query=data.query, 
-            limit=data.limit
-        )
+        retrieved = await retrieve_properties(pool, data, query_vector)
         
-        if 'error' in results:
-            raise HTTPException(status_code=500, detail=results['error'])
+        if 'error' in retrieved:
+            raise HTTPException(status_code=500, detail=retrieved['error'])
+        results, next_cursor = paginate_results(data, retrieved, data.query)
         
-        # 2. Generar el resumen RAG (Aumento/Generación)
-        rag_summary = await generate_rag_summary(data.query, results)
+        # 2. Generar el resumen RAG (Aumento/Generación) dentro del presupuesto restante
+        def cache_search(task: asyncio.Task):
+            if not task.cancelled() and task.exception() is None and task.result() != RAG_FALLBACK_MESSAGE:
+                semantic_search_cache.store(
+                    query_vector, cached_search_entry(data.query, retrieved, task.result()), cache_params
+                )
+
+        summary_task = asyncio.ensure_future(generate_rag_summary(data.query, results))
+        summary_task.add_done_callback(cache_search)
+        try:
+            # shield: al vencer el plazo dejamos de esperar, pero la generación continúa
+            rag_summary = await asyncio.wait_for(
+                asyncio.shield(summary_task), timeout=remaining_budget(deadline)
+            )
+            degraded = False
+        except asyncio.TimeoutError:
+            background_tasks.add(summary_task)
+            summary_task.add_done_callback(background_tasks.discard)
+            rag_summary = None
+            degraded = True
 
         # 3. Devolver la respuesta enriquecida
         return {
             "query": data.query,
             "rag_summary": rag_summary, # <-- ¡NUEVO CAMPO CON EL RESUMEN DEL LLM!
-            "results": results,
-            "count": len(results)
+            "results": project_results(results, data.fields),
+            "count": len(results),
+            "semantic_cache_hit": False,
+            "degraded": degraded,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
     
 
+def ndjson_line(event: dict) -> bytes:
+    """Serializa un evento como una línea NDJSON."""
+    return (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+@app.post("/propiedades/search/semantic/stream", summary="Búsqueda Semántica con resumen RAG en streaming (NDJSON)")
+async def search_properties_stream(
+    data: SearchQuery,
+    pool: asyncpg.Pool = Depends(get_db_pool)
+):
+    """
+    Igual que /propiedades/search/semantic, pero responde en NDJSON (una línea JSON por evento):
+      {"type": "results", ...}        -> en cuanto termina la búsqueda en la BD
+      {"type": "summary_delta", ...}  -> fragmentos del resumen RAG a medida que se generan
+      {"type": "summary_error", ...}  -> si el LLM falla (los resultados ya se enviaron)
+      {"type": "done", ...}           -> resumen completo
+    El presupuesto (budget_ms) se aplica al embedding; el resumen no se corta porque
+    el cliente ya tiene los resultados y ve el texto a medida que llega.
+    Con cursor (páginas siguientes) solo se envían "results" y "done", sin resumen.
+    """
+    after = search_page_cursor(data)
+    deadline = request_deadline(data)
+    if after is not None:
+        page, next_cursor = await search_next_page(pool, data, after, deadline)
+
+        async def page_stream():
+            yield ndjson_line({
+                "type": "results",
+                "query": data.query,
+                "results": page,
+                "count": len(page),
+                "semantic_cache_hit": False,
+                "next_cursor": next_cursor
+            })
+            yield ndjson_line({"type": "done", "rag_summary": None})
+
+        return StreamingResponse(
+            page_stream(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    query_vector = await embed_query_within(data.query, deadline)
+
+    cache_params = semantic_cache_params(data)
+    cached, similarity = semantic_search_cache.lookup(query_vector, cache_params)
+    try:
+        if cached is not None and not await cached_search_is_current(pool, cached):
+            cached = None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
+
+    if cached is None:
+        try:
+            retrieved = await retrieve_properties(pool, data, query_vector)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
+        if 'error' in retrieved:
+            raise HTTPException(status_code=500, detail=retrieved['error'])
+        results, next_cursor = paginate_results(data, retrieved, data.query)
+    else:
+        retrieved = cached["results"]
+        results, next_cursor = paginate_results(data, retrieved, cached["query"])
+
+    async def event_stream():
+        yield ndjson_line({
+            "type": "results",
+            "query": data.query,
+            "results": project_results(results, data.fields),
+            "count": len(results),
+            "semantic_cache_hit": cached is not None,
+            "next_cursor": next_cursor
+        })
+
+        if cached is not None:
+            rag_summary = cached["rag_summary"]
+            yield ndjson_line({"type": "summary_delta", "text": rag_summary})
+        else:
+            parts = []
+            try:
+                async for text in stream_rag_summary(data.query, results):
+                    parts.append(text)
+                    yield ndjson_line({"type": "summary_delta", "text": text})
+                rag_summary = "".join(parts).strip()
+                if rag_summary:
+                    semantic_search_cache.store(
+                        query_vector, cached_search_entry(data.query, retrieved, rag_summary), cache_params
+                    )
+            except Exception:
+                rag_summary = None
+                yield ndjson_line({"type": "summary_error", "detail": RAG_FALLBACK_MESSAGE})
+
+        yield ndjson_line({"type": "done", "rag_summary": rag_summary})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        # Evita que proxies (nginx) acumulen la respuesta antes de enviarla
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # main.py
 
-async def generate_rag_summary(query: str, properties: list) -> str:
-    """Genera un resumen persuasivo usando el LLM (RAG) basado en la query y las propiedades recuperadas."""
-    
+def rag_summary_cache_key(query: str, properties: list) -> tuple:
+    """
+    Clave de rag_summary_cache.
+    Además de la consulta, los ids (en orden) y el modelo, incluye una huella de los
+    campos que van al prompt (título, precio, descripcion_ia): si alguno cambia en la
+    BD la clave cambia y el resumen viejo deja de usarse (expira por LRU/TTL).
+    """
+    fingerprint = hashlib.sha1()
+    for p in properties:
+        fingerprint.update(json.dumps(
+            [p['id_propiedad'], p['titulo'], p['precio'], p['descripcion_ia']],
+            ensure_ascii=False
+        ).encode("utf-8"))
+    return (
+        normalize_query(query),
+        tuple(p['id_propiedad'] for p in properties),
+        MODEL_GENERATION,
+        fingerprint.hexdigest()
+    )
+
+
+def build_rag_prompt(query: str, properties: list) -> tuple:
+    """Arma (system_instruction, user_prompt) para el resumen RAG."""
+
     # 1. Preparar el Contexto (solo los datos esenciales)
     context_data = [
         {
@@ -253,21 +1205,178 @@ async def generate_rag_summary(query: str, properties: list) -> str:
         f"2. Propiedades Recuperadas:\n{json.dumps(context_data, indent=2)}\n\n"
         f"Genera el resumen de coincidencia (máximo 4-5 frases) en español. Solo el párrafo, sin títulos."
     )
+    return system_instruction, user_prompt
+
 
-    # 3. Llamar al LLM
+async def generate_rag_summary(query: str, properties: list) -> str:
+    """Genera un resumen persuasivo usando el LLM (RAG) basado en la query y las propiedades recuperadas."""
+    
+    # 0. Reutilizar el resumen si la misma consulta devolvió exactamente las mismas propiedades
+    cache_key = rag_summary_cache_key(query, properties)
+    cached = rag_summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    system_instruction, user_prompt = build_rag_prompt(query, properties)
+
+    async def call_gemini():
+        async with gemini_semaphore:
+            response = await gemini_client.aio.models.generate_content(
+                model=MODEL_GENERATION,
+                contents=[user_prompt],
+                config=types.GenerateContentConfig(
+                    system_instruction=system_instruction
+                )
+            )
+        summary = response.text.strip()
+        # Solo se cachean resúmenes reales, nunca el mensaje de error
+        rag_summary_cache.set(cache_key, summary)
+        return summary
+
+    # 3. Llamar al LLM (una sola llamada por clave aunque lleguen N peticiones iguales)
     try:
-        response = await asyncio.to_thread(
-            gemini_client.models.generate_content,
+        return await gemini_singleflight.do(("rag",) + cache_key, call_gemini)
+        
+    except Exception as e:
+        return RAG_FALLBACK_MESSAGE
+
+
+async def stream_rag_summary(query: str, properties: list):
+    """
+    Versión en streaming de generate_rag_summary: produce el texto del resumen a
+    medida que el LLM lo genera. Al terminar guarda el resumen completo en
+    rag_summary_cache. Los errores del LLM se propagan al llamador.
+    """
+    cache_key = rag_summary_cache_key(query, properties)
+    cached = rag_summary_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    system_instruction, user_prompt = build_rag_prompt(query, properties)
+
+    # Cada cliente necesita su propio stream, así que aquí no hay single-flight.
+    # El semáforo se toma solo para abrir el stream y para leer cada fragmento: un
+    # cliente lento que tarda en consumir un yield no retiene un cupo de Gemini.
+    parts = []
+    async with gemini_semaphore:
+        stream = await gemini_client.aio.models.generate_content_stream(
             model=MODEL_GENERATION,
             contents=[user_prompt],
             config=types.GenerateContentConfig(
                 system_instruction=system_instruction
             )
         )
-        return response.text.strip()
-        
-    except Exception as e:
-        return "No fue posible generar el resumen de coincidencia en este momento."
+    chunks = stream.__aiter__()
+    while True:
+        async with gemini_semaphore:
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                break
+        if chunk.text:
+            parts.append(chunk.text)
+            yield chunk.text
+
+    summary = "".join(parts).strip()
+    if summary:
+        rag_summary_cache.set(cache_key, summary)
+
+
+# ----------------------------------------------------
+# 4b. Endpoint de Búsqueda Geográfica (mapa)
+# ----------------------------------------------------
+@app.get("/propiedades/mapa", summary="Propiedades cerca de un punto o dentro del viewport del mapa")
+async def get_properties_on_map(
+    lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    lon: Optional[float] = Query(default=None, ge=-180, le=180),
+    radio_m: float = Query(default=2000, gt=0, le=100000),
+    min_lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(default=None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(default=None, ge=-180, le=180),
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = Query(default=None),
+    pool: asyncpg.Pool = Depends(get_db_pool)
+):
+    """
+    Listado para navegación por mapa:
+      - lat/lon (+ radio_m): propiedades dentro del radio, ordenadas por distancia (KNN).
+      - min_lat/min_lon/max_lat/max_lon: propiedades dentro del rectángulo visible.
+    Ambos criterios se pueden combinar.
+    No se pagina: el mapa pide el viewport nuevo al moverse. Un cursor se rechaza
+    con 422 en lugar de ignorarlo y repetir la primera página.
+    """
+    if cursor is not None:
+        raise HTTPException(
+            status_code=422,
+            detail="/propiedades/mapa no admite cursor: acotar el viewport o subir limit (máx. 500)."
+        )
+    has_point = lat is not None and lon is not None
+    bbox = (min_lat, min_lon, max_lat, max_lon)
+    has_bbox = all(v is not None for v in bbox)
+    if not has_point and not has_bbox:
+        raise HTTPException(
+            status_code=422,
+            detail="Indicar lat/lon o el viewport completo (min_lat, min_lon, max_lat, max_lon)."
+        )
+
+    filters = SearchFilters(
+        cerca=GeoRadius(lat=lat, lon=lon, radio_m=radio_m) if has_point else None,
+        viewport=BoundingBox(min_lat=min_lat, min_lon=min_lon, max_lat=max_lat, max_lon=max_lon) if has_bbox else None
+    )
+    args = [limit]
+    conditions = build_filter_conditions(filters, args)
+    if has_point:
+        args.extend([lon, lat])
+        point = geo_point_sql(f"${len(args) - 1}", f"${len(args)}")
+        distance_select = f", ST_Distance(ubicacion::geography, {point}) AS distancia_m"
+        # <-> sobre geography: orden KNN asistido por el índice GiST
+        order_by = f"ubicacion::geography <-> {point}"
+    else:
+        distance_select = ""
+        order_by = "id_propiedad"
+
+    where = "\n            AND ".join(conditions)
+    async with pool.acquire() as conn:
+        results = await conn.fetch(f"""
+            SELECT 
+                id_propiedad,
+                titulo, 
+                direccion, 
+                precio_alquiler,
+                ST_X(ubicacion) AS longitud, 
+                ST_Y(ubicacion) AS latitud{distance_select}
+            FROM Propiedad 
+            WHERE 
+                {where}
+            ORDER BY {order_by}
+            LIMIT $1;
+        """, *args)
+
+    data = [dict(row) for row in results]
+    for row in data:
+        row['precio_alquiler'] = float(row['precio_alquiler'])
+    
+    return {
+        "status": "success",
+        "count": len(data),
+        "data": data
+    }
+
+
+# ----------------------------------------------------
+# 5. Métricas de Cachés
+# ----------------------------------------------------
+@app.get("/cache/stats", summary="Aciertos, fallos y desalojos de las cachés en proceso")
+def get_cache_stats():
+    return {
+        "query_embedding": query_embedding_cache.stats(),
+        "rag_summary": rag_summary_cache.stats(),
+        "semantic_search": semantic_search_cache.stats(),
+        "gemini_singleflight": gemini_singleflight.stats(),
+        "memory_index": memory_index.stats() if memory_index is not None else None
+    }
 
 
 # ----------------------------------------------------
@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de búsqueda vectorial en memoria (modo opcional de main.py: SEARCH_ENGINE=memory).
+
+Todos los embeddings de Propiedad se guardan en un snapshot:
+    <dir>/embeddings.npy  -> matriz float32 (N x dim) normalizada, contigua
+    <dir>/ids.npy         -> id_propiedad de cada fila
+    <dir>/meta.json       -> titulo / precio / descripcion_ia por id
+    <dir>/snapshot.json   -> fecha (de la BD) en que empezó el volcado
+La matriz se abre con mmap (solo lectura), así varios workers de uvicorn comparten
+las mismas páginas del page cache. El top-k es un producto matriz-vector más
+argpartition, sin ir a la BD.
+
+Los cambios posteriores al snapshot llegan por LISTEN/NOTIFY (canal
+EMBEDDING_CHANNEL, payload = ids separados por coma; lo emiten los triggers de la
+migración 009 ante cualquier escritura en Propiedad) y se aplican en un "overlay"
+en memoria. Lo que cambió entre el volcado y el LISTEN se recupera al arrancar con
+fecha_actualizacion > fecha del snapshot. Si la conexión de LISTEN se cae el índice
+se marca como no saludable y main.py busca en la BD mientras se reconecta; al
+reconectar se aplican los cambios ocurridos desde el LISTEN anterior y el índice
+vuelve a usarse.
+
+Cuantización opcional (quantization), solo para ahorrar memoria:
+    "int8"   -> copia residente int8 con escala por fila (1/4 de la memoria float32)
+    "binary" -> firma de 1 bit por dimensión (1/32) con distancia de Hamming
+La pasada gruesa corre sobre la representación compacta y los mejores
+limit * rerank_factor candidatos se reordenan con los float32 del snapshot (mmap),
+de modo que solo se leen del disco las filas candidatas.
+No es una optimización de velocidad: numpy no tiene producto int8 nativo y la
+pasada int8 convierte cada bloque a float32, así que tarda aproximadamente el doble que
+"none" (benchmarks/benchmark_cuantizacion.py, 100k x 768: p50 ~62 ms contra
+~32 ms, recall 1.0). "binary" es más rápido (~12 ms) pero baja el recall@10 a
+~0.86. Usar "none" salvo que el snapshot float32 no entre en memoria.
+
+Generar / regenerar el snapshot:
+    python memory_index.py --snapshot [--dir snapshots]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+EMBEDDING_CHANNEL = "propiedad_embedding"
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+# Margen de la puesta al día: una transacción que empezó antes del volcado pero
+# confirmó después tiene fecha_actualizacion anterior al snapshot y no está en él
+CATCHUP_MARGIN_SECONDS = 3600
+
+# Filas reservadas al crear el overlay (se duplica al llenarse)
+OVERLAY_INITIAL_ROWS = 1024
+# Espera máxima entre intentos de reconectar el LISTEN (segundos)
+LISTEN_RECONNECT_MAX_DELAY = 60.0
+
+# Filas por bloque en la pasada int8 (acota la memoria temporal del upcast a float32)
+INT8_BLOCK_ROWS = 8192
+
+SQL_SNAPSHOT_ROWS = """
+    SELECT id_propiedad, titulo, precio_alquiler, descripcion_ia, embedding
+    FROM Propiedad
+    WHERE embedding IS NOT NULL
+    ORDER BY id_propiedad;
+"""
+
+SQL_REFRESH_ROWS = """
+    SELECT id_propiedad, titulo, precio_alquiler, descripcion_ia, embedding
+    FROM Propiedad
+    WHERE id_propiedad = ANY($1::int[]);
+"""
+
+SQL_CHANGED_SINCE = """
+    SELECT id_propiedad
+    FROM Propiedad
+    WHERE fecha_actualizacion > $1::timestamptz - make_interval(secs => $2)
+    UNION
+    SELECT t.id_propiedad
+    FROM unnest($3::int[]) AS t(id_propiedad)
+    WHERE NOT EXISTS (SELECT 1 FROM Propiedad p WHERE p.id_propiedad = t.id_propiedad);
+"""
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Índices de los k mayores puntajes, ordenados de mayor a menor."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def quantize_int8(matrix: np.ndarray):
+    """Cuantización escalar simétrica por fila: matrix ~ q8 * scale[:, None]."""
+    q8 = np.empty(matrix.shape, dtype=np.int8)
+    scales = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], INT8_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + INT8_BLOCK_ROWS], dtype=np.float32)
+        scale = np.abs(block).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        q8[start:start + len(block)] = np.round(block / scale[:, None]).astype(np.int8)
+        scales[start:start + len(block)] = scale
+    return q8, scales
+
+
+def binary_signatures(matrix: np.ndarray) -> np.ndarray:
+    """Firma binaria (bit = componente > 0), empaquetada en bytes."""
+    return np.packbits(np.asarray(matrix) > 0, axis=1)
+
+
+def hamming_distances(signatures: np.ndarray, query_signature: np.ndarray) -> np.ndarray:
+    """Distancia de Hamming entre cada firma y la de la consulta."""
+    return np.bitwise_count(signatures ^ query_signature).sum(axis=1, dtype=np.int32)
+
+
+def _row_meta(r) -> dict:
+    return {
+        "titulo": r["titulo"],
+        "precio": float(r["precio_alquiler"]),
+        "descripcion_ia": r["descripcion_ia"],
+    }
+
+
+class MemoryIndex:
+    """Índice exacto por similitud de coseno sobre un snapshot mmap + overlay incremental."""
+
+    def __init__(
+        self,
+        base: np.ndarray,
+        base_ids: np.ndarray,
+        meta: dict,
+        quantization: str = "none",
+        rerank_factor: int = 10,
+        snapshot_time=None
+    ):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization debe ser uno de {QUANTIZATIONS}")
+        self.dim = base.shape[1]
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self._int8 = self._int8_scales = self._signatures = None
+        if quantization == "int8":
+            self._int8, self._int8_scales = quantize_int8(base)
+        elif quantization == "binary":
+            self._signatures = binary_signatures(base)
+        self._base = base                                   # mmap, solo lectura
+        self._base_ids = base_ids
+        self._base_row = {int(i): row for row, i in enumerate(base_ids)}
+        self._base_masked = np.zeros(len(base_ids), dtype=bool)  # filas reemplazadas/borradas
+        self._meta = meta
+        self.snapshot_time = snapshot_time  # datetime del volcado (None: snapshot sin fecha)
+        # Overlay: filas nuevas o actualizadas desde el snapshot. Se reserva con
+        # crecimiento geométrico y las filas borradas solo se marcan (_overlay_live),
+        # así cada cambio cuesta O(1) amortizado y no una copia de todo el overlay
+        self._overlay = np.zeros((OVERLAY_INITIAL_ROWS, self.dim), dtype=np.float32)
+        self._overlay_ids = np.zeros(OVERLAY_INITIAL_ROWS, dtype=np.int64)
+        self._overlay_live = np.zeros(OVERLAY_INITIAL_ROWS, dtype=bool)
+        self._overlay_size = 0
+        self._overlay_row = {}
+        # LISTEN: conexión, fecha (de la BD) desde la que recibimos avisos y reconexión
+        self._connect = None
+        self._pool = None
+        self._listener_conn = None
+        self._listening_since = None
+        self._reconnect_task = None
+        self._pending = set()
+        self._closing = False
+        self.healthy = True
+        self.updates_applied = 0
+        self.reconnects = 0
+
+    # ------------------------------------------------------------
+    # Carga y snapshot
+    # ------------------------------------------------------------
+    @classmethod
+    def load(cls, directory: str, quantization: str = "none", rerank_factor: int = 10) -> "MemoryIndex":
+        base = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        base_ids = np.load(os.path.join(directory, "ids.npy"))
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = {int(k): v for k, v in json.load(f).items()}
+        snapshot_time = None
+        info_path = os.path.join(directory, "snapshot.json")
+        if os.path.exists(info_path):
+            with open(info_path, encoding="utf-8") as f:
+                snapshot_time = datetime.fromisoformat(json.load(f)["created_at"])
+        return cls(base, base_ids, meta, quantization=quantization, rerank_factor=rerank_factor,
+                   snapshot_time=snapshot_time)
+
+    @staticmethod
+    async def build_snapshot(conn, directory: str, dim: int = 768) -> int:
+        """
+        Vuelca los embeddings de la BD al directorio (escritura atómica por archivo).
+        Las filas se leen con un cursor y se escriben directo en el .npy mapeado,
+        sin materializar la tabla completa en memoria.
+        """
+        os.makedirs(directory, exist_ok=True)
+        total = await conn.fetchval("SELECT count(*) FROM Propiedad WHERE embedding IS NOT NULL;")
+        tmp_matrix = os.path.join(directory, "embeddings.npy.tmp")
+        matrix = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32, shape=(total, dim))
+        ids = np.zeros(total, dtype=np.int64)
+        meta = {}
+        row = 0
+        async with conn.transaction():
+            # Fecha de inicio de la transacción: todo lo confirmado antes está en el volcado
+            created_at = await conn.fetchval("SELECT CURRENT_TIMESTAMP;")
+            async for r in conn.cursor(SQL_SNAPSHOT_ROWS, prefetch=1000):
+                if row >= total:
+                    break  # filas vectorizadas mientras corría el volcado: llegarán por NOTIFY
+                vector = np.asarray(r["embedding"], dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                matrix[row] = vector / norm if norm > 0 else vector
+                ids[row] = r["id_propiedad"]
+                meta[r["id_propiedad"]] = _row_meta(r)
+                row += 1
+        matrix.flush()
+        del matrix
+        if row < total:
+            # Filas borradas durante el volcado: recortamos el snapshot
+            tmp_trimmed = tmp_matrix + ".trim"
+            with open(tmp_trimmed, "wb") as f:
+                np.save(f, np.load(tmp_matrix, mmap_mode="r")[:row])
+            os.replace(tmp_trimmed, tmp_matrix)
+            ids = ids[:row]
+
+        tmp_ids = os.path.join(directory, "ids.npy.tmp")
+        with open(tmp_ids, "wb") as f:
+            np.save(f, ids)
+        tmp_meta = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        tmp_info = os.path.join(directory, "snapshot.json.tmp")
+        with open(tmp_info, "w", encoding="utf-8") as f:
+            json.dump({"created_at": created_at.isoformat(), "rows": row}, f)
+        os.replace(tmp_matrix, os.path.join(directory, "embeddings.npy"))
+        os.replace(tmp_ids, os.path.join(directory, "ids.npy"))
+        os.replace(tmp_meta, os.path.join(directory, "meta.json"))
+        os.replace(tmp_info, os.path.join(directory, "snapshot.json"))
+        return row
+
+    # ------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------
+    def __len__(self):
+        return int(len(self._base_ids) - self._base_masked.sum() + len(self._overlay_row))
+
+    def resident_bytes(self) -> int:
+        """Memoria que la búsqueda necesita residente para la pasada sobre el snapshot."""
+        if self.quantization == "int8":
+            return self._int8.nbytes + self._int8_scales.nbytes
+        if self.quantization == "binary":
+            return self._signatures.nbytes
+        return int(self._base.size * self._base.itemsize)
+
+    def _int8_scores(self, q: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(self._base_ids), dtype=np.float32)
+        for start in range(0, len(scores), INT8_BLOCK_ROWS):
+            block = self._int8[start:start + INT8_BLOCK_ROWS]
+            scores[start:start + len(block)] = (block @ q) * self._int8_scales[start:start + len(block)]
+        return scores
+
+    def _base_candidates(self, q: np.ndarray, k: int):
+        """(filas, puntajes exactos) de las mejores filas vigentes del snapshot."""
+        if len(self._base_ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if self.quantization == "none":
+            scores = self._base @ q
+            scores[self._base_masked] = -np.inf
+            rows = _top_k(scores, k)
+            return rows, scores[rows]
+
+        # 1. Pasada gruesa sobre la representación compacta
+        if self.quantization == "int8":
+            coarse = self._int8_scores(q)
+        else:
+            query_signature = binary_signatures(q[None, :])[0]
+            coarse = -hamming_distances(self._signatures, query_signature).astype(np.float32)
+        coarse[self._base_masked] = -np.inf
+        # 2. Re-ranking exacto de los candidatos con los float32 del snapshot
+        rows = np.sort(_top_k(coarse, k * self.rerank_factor))  # lectura secuencial del mmap
+        rows = rows[~self._base_masked[rows]]
+        exact = np.asarray(self._base[rows]) @ q
+        best = _top_k(exact, k)
+        return rows[best], exact[best]
+
+    def search(self, query_vector, limit: int = 5) -> list:
+        """Top-k por similitud de coseno. Devuelve dicts con la forma de la búsqueda en BD."""
+        q = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm > 0:
+            q = q / norm
+        base_rows, base_scores = self._base_candidates(q, limit)
+        n = self._overlay_size
+        overlay_scores = self._overlay[:n] @ q
+        overlay_scores[~self._overlay_live[:n]] = -np.inf
+        scores = np.concatenate([base_scores, overlay_scores])
+        ids = np.concatenate([self._base_ids[base_rows], self._overlay_ids[:n]])
+        valid = np.isfinite(scores)  # descarta filas enmascaradas
+        scores, ids = scores[valid], ids[valid]
+
+        results = []
+        for i in _top_k(scores, limit):
+            prop_id = int(ids[i])
+            results.append({
+                "id_propiedad": prop_id,
+                **self._meta[prop_id],
+                "distance": float(1.0 - scores[i]),
+            })
+        return results
+
+    # ------------------------------------------------------------
+    # Actualizaciones incrementales
+    # ------------------------------------------------------------
+    def upsert(self, prop_id: int, vector, meta: dict):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        base_row = self._base_row.get(prop_id)
+        if base_row is not None:
+            self._base_masked[base_row] = True
+        row = self._overlay_row.get(prop_id)
+        if row is None:
+            if self._overlay_size == len(self._overlay_ids):
+                self._grow_overlay()
+            row = self._overlay_size
+            self._overlay_size += 1
+            self._overlay_ids[row] = prop_id
+            self._overlay_live[row] = True
+            self._overlay_row[prop_id] = row
+        self._overlay[row] = vector
+        self._meta[prop_id] = meta
+        self.updates_applied += 1
+
+    def _grow_overlay(self):
+        """Compacta las filas borradas y, si sigue lleno, duplica la capacidad."""
+        live = np.flatnonzero(self._overlay_live[:self._overlay_size])
+        capacity = len(self._overlay_ids)
+        if len(live) * 2 > capacity:
+            capacity *= 2
+        overlay = np.zeros((capacity, self.dim), dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        overlay[:len(live)] = self._overlay[live]
+        ids[:len(live)] = self._overlay_ids[live]
+        self._overlay, self._overlay_ids = overlay, ids
+        self._overlay_live = np.zeros(capacity, dtype=bool)
+        self._overlay_live[:len(live)] = True
+        self._overlay_size = len(live)
+        self._overlay_row = {int(i): r for r, i in enumerate(ids[:len(live)])}
+
+    def remove(self, prop_id: int):
+        base_row = self._base_row.get(prop_id)
+        if base_row is not None:
+            self._base_masked[base_row] = True
+        row = self._overlay_row.pop(prop_id, None)
+        if row is not None:
+            self._overlay_live[row] = False
+        self._meta.pop(prop_id, None)
+        self.updates_applied += 1
+
+    async def refresh(self, pool, prop_ids: list):
+        """Relee de la BD las filas indicadas y las aplica al overlay."""
+        rows = await pool.fetch(SQL_REFRESH_ROWS, prop_ids)
+        found = set()
+        for r in rows:
+            found.add(r["id_propiedad"])
+            if r["embedding"] is None:
+                self.remove(r["id_propiedad"])
+            else:
+                self.upsert(r["id_propiedad"], r["embedding"], _row_meta(r))
+        for prop_id in set(prop_ids) - found:
+            self.remove(prop_id)
+
+    async def start_listener(self, connect, pool):
+        """
+        Abre una conexión dedicada (connect: corrutina que la crea) y escucha
+        EMBEDDING_CHANNEL. Cada notificación refresca esos ids usando el pool.
+        Con el LISTEN ya activo se aplican los cambios posteriores al snapshot, así
+        no se pierde nada de lo ocurrido entre el volcado y el arranque. Si la
+        conexión se cae, el índice queda no saludable hasta reconectar y ponerse al día.
+        """
+        self._connect = connect
+        self._pool = pool
+        await self._listen()
+        await self.catch_up(pool, self.snapshot_time)
+
+    async def _listen(self):
+        conn = await self._connect()
+        try:
+            conn.add_termination_listener(self._on_terminate)
+            await conn.add_listener(EMBEDDING_CHANNEL, self._on_notify)
+            # Todo lo confirmado desde acá llega por NOTIFY mientras la conexión viva
+            listening_since = await conn.fetchval("SELECT CURRENT_TIMESTAMP;")
+        except Exception:
+            conn.remove_termination_listener(self._on_terminate)
+            await conn.close()
+            raise
+        self._listener_conn = conn
+        self._listening_since = listening_since
+
+    def _on_notify(self, conn, pid, channel, payload):
+        prop_ids = [int(x) for x in payload.split(",") if x.strip()]
+        task = asyncio.get_running_loop().create_task(self.refresh(self._pool, prop_ids))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _on_terminate(self, conn):
+        if self._closing or conn is not self._listener_conn:
+            return
+        # Sin LISTEN no sabemos qué cambió: main.py vuelve a la BD hasta reconectar
+        self.healthy = False
+        print("⚠️ Conexión LISTEN del índice en memoria cerrada; se usa la BD como respaldo.")
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        """Reabre el LISTEN y aplica lo que cambió desde que empezó el anterior."""
+        since = self._listening_since
+        delay = 1.0
+        while not self._closing:
+            try:
+                await self._listen()
+                await self.catch_up(self._pool, since)
+            except Exception as e:
+                if self._listener_conn is not None and not self._listener_conn.is_closed():
+                    self._listener_conn.remove_termination_listener(self._on_terminate)
+                    await self._listener_conn.close()
+                print(f"⚠️ No se pudo reconectar el LISTEN del índice en memoria ({e}); "
+                      f"reintento en {delay:.0f} s.")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LISTEN_RECONNECT_MAX_DELAY)
+                continue
+            self.reconnects += 1
+            self.healthy = True
+            print("✅ LISTEN del índice en memoria restablecido; se vuelve a buscar en memoria.")
+            return
+
+    async def catch_up(self, pool, since=None) -> int:
+        """Refresca las filas modificadas desde since (o borradas). Devuelve cuántas."""
+        # Snapshot sin fecha (generado antes de la migración 009): se revisa todo
+        since = since or datetime.min.replace(tzinfo=timezone.utc)
+        known_ids = [int(i) for i in self._base_ids] + list(self._overlay_row)
+        rows = await pool.fetch(SQL_CHANGED_SINCE, since, float(CATCHUP_MARGIN_SECONDS), known_ids)
+        prop_ids = [r["id_propiedad"] for r in rows]
+        if prop_ids:
+            await self.refresh(pool, prop_ids)
+        return len(prop_ids)
+
+    async def close(self):
+        self._closing = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._listener_conn is not None and not self._listener_conn.is_closed():
+            await self._listener_conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "rows": len(self),
+            "snapshot_rows": int(len(self._base_ids)),
+            "overlay_rows": len(self._overlay_row),
+            "quantization": self.quantization,
+            "snapshot_time": self.snapshot_time.isoformat() if self.snapshot_time else None,
+            "resident_bytes": self.resident_bytes(),
+            "updates_applied": self.updates_applied,
+            "healthy": self.healthy,
+            "reconnects": self.reconnects,
+        }
+
+
+if __name__ == '__main__':
+    import db
+    from embedding_config import EMBEDDING_DIM
+
+    parser = argparse.ArgumentParser(description="Snapshot del índice vectorial en memoria.")
+    parser.add_argument("--snapshot", action="store_true", help="Generar el snapshot desde la BD")
+    parser.add_argument("--dir", default=os.getenv("EMBEDDING_SNAPSHOT_DIR", "snapshots"))
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    args = parser.parse_args()
+
+    async def run():
+        conn = await db.connect(application_name="memory_index_snapshot")
+        try:
+            rows = await MemoryIndex.build_snapshot(conn, args.dir, dim=args.dim)
+            print(f"✅ Snapshot generado en '{args.dir}' ({rows} propiedades).")
+        finally:
+            await conn.close()
+
+    if args.snapshot:
+        asyncio.run(run())
+    else:
+        parser.print_help()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Codec binario de asyncpg para el tipo `vector` de pgvector.
+
+Sin codec, los embeddings viajan como texto ("[0.0123,-0.0456,...]"): Python
+formatea 768 floats y Postgres los vuelve a parsear en cada búsqueda y escritura.
+En formato binario un vector es:
+
+    uint16 dim | uint16 reservado (0) | dim x float32 big-endian
+
+Se registra una vez por conexión (init del pool o tras asyncpg.connect):
+
+    pool = await asyncpg.create_pool(..., init=register_vector_codec)
+
+y a partir de ahí los parámetros `vector` aceptan arrays NumPy (o listas) y las
+columnas `vector` se leen como np.ndarray float32.
+"""
+
+import struct
+
+import numpy as np
+
+_HEADER = struct.Struct(">HH")
+_BIG_ENDIAN_F4 = np.dtype(">f4")
+
+
+def encode_vector(value) -> bytes:
+    """Serializa un array/lista de floats al formato binario de `vector`."""
+    arr = np.asarray(value, dtype=_BIG_ENDIAN_F4)
+    if arr.ndim != 1:
+        raise ValueError(f"Se esperaba un vector 1-D, se recibió shape {arr.shape}")
+    return _HEADER.pack(arr.shape[0], 0) + arr.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """Convierte el formato binario de `vector` en un np.ndarray float32 (nativo)."""
+    dim, _ = _HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=_BIG_ENDIAN_F4, count=dim, offset=_HEADER.size).astype(np.float32)
+
+
+def vector_to_text(value) -> str:
+    """Formato de texto de `vector` (solo para SQL literal / depuración)."""
+    return "[" + ",".join(map(str, np.asarray(value, dtype=np.float32).tolist())) + "]"
+
+
+async def register_vector_codec(conn):
+    """Registra el codec binario de `vector` en una conexión asyncpg."""
+    schema = await conn.fetchval("""
+        SELECT n.nspname
+        FROM pg_type t
+        JOIN pg_namespace n ON n.oid = t.typnamespace
+        WHERE t.typname = 'vector'
+        LIMIT 1;
+    """)
+    if schema is None:
+        raise RuntimeError("El tipo 'vector' no existe: ejecutar CREATE EXTENSION vector;")
+    await conn.set_type_codec(
+        "vector",
+        schema=schema,
+        encoder=encode_vector,
+        decoder=decode_vector,
+        format="binary"
+    )
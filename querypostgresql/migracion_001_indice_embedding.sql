@@ -0,0 +1,30 @@
+-- Migración 001: índice de vecinos aproximados (ANN) sobre Propiedad.embedding
+--
+-- Sin índice, `ORDER BY embedding <=> $1` recorre toda la tabla en cada búsqueda.
+-- HNSW es la opción por defecto (mejor recall/latencia, no requiere datos previos).
+-- IVFFlat queda como alternativa para tablas muy grandes con memoria acotada:
+-- se construye más rápido, pero debe crearse DESPUÉS de cargar los datos.
+--
+-- Parámetros de consulta (se fijan por transacción desde main.py / SearchQuery):
+--   hnsw.ef_search  -> tamaño de la lista de candidatos de HNSW (default 40)
+--   ivfflat.probes  -> cantidad de listas IVFFlat visitadas (default 1)
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- text-embedding-004 devuelve vectores de 768 dimensiones
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS embedding vector(768);
+
+-- **Opción A (por defecto): HNSW con distancia de coseno**
+-- m / ef_construction: valores recomendados por pgvector para ~1M de filas.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_embedding_hnsw
+    ON Propiedad USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- **Opción B: IVFFlat** (descomentar y eliminar el índice HNSW si se prefiere)
+-- lists ~ filas / 1000 hasta 1M de filas; sqrt(filas) por encima.
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_propiedad_embedding_hnsw;
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_embedding_ivfflat
+--     ON Propiedad USING ivfflat (embedding vector_cosine_ops)
+--     WITH (lists = 100);
+
+ANALYZE Propiedad;
@@ -0,0 +1,31 @@
+-- Migración 002: índices para los filtros estructurados de la búsqueda semántica
+--
+-- main.py (build_filter_conditions) agrega estos filtros al WHERE antes de ordenar
+-- por similitud. Con filtros selectivos el planner parte de estos índices y solo
+-- calcula la distancia sobre el subconjunto candidato, en lugar de toda la tabla.
+-- Las expresiones deben coincidir con las del SQL generado (lower(ciudad), etc.).
+
+-- Rango de precio / ambientes / superficie
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_precio
+    ON Propiedad (precio_alquiler);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_ambientes
+    ON Propiedad (ambientes);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_metros
+    ON Propiedad (metros_cuadrados);
+
+-- Igualdad sin distinguir mayúsculas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_ciudad
+    ON Propiedad (lower(ciudad));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_tipo
+    ON Propiedad (lower(tipo_propiedad), precio_alquiler);
+
+-- Disponibilidad: casi todas las filas son TRUE, así que indexamos solo las no disponibles
+-- (el filtro esta_disponible = false es el selectivo)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_no_disponible
+    ON Propiedad (id_propiedad) WHERE esta_disponible = FALSE;
+
+-- Amenities: jsonb_path_ops soporta @> (contención) y es más compacto que jsonb_ops
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_amenities
+    ON Propiedad USING GIN (amenities jsonb_path_ops);
+
+ANALYZE Propiedad;
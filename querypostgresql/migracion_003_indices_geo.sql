@@ -0,0 +1,15 @@
+-- Migración 003: índices espaciales (PostGIS) para búsquedas por mapa
+--
+-- main.py usa dos formas de filtro geográfico:
+--   viewport: ubicacion && ST_MakeEnvelope(...)          -> GiST sobre geometry
+--   cerca:    ST_DWithin(ubicacion::geography, p, radio)  -> GiST sobre la expresión geography
+-- y ordena por cercanía con ubicacion::geography <-> p (KNN asistido por el mismo índice).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_ubicacion
+    ON Propiedad USING GIST (ubicacion);
+
+-- La expresión debe coincidir exactamente con la del SQL (ubicacion::geography)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_ubicacion_geog
+    ON Propiedad USING GIST ((ubicacion::geography));
+
+ANALYZE Propiedad;
@@ -0,0 +1,21 @@
+-- Migración 004: búsqueda de texto completo para la recuperación híbrida
+--
+-- La búsqueda por embeddings no garantiza encontrar tokens exactos que escribe el
+-- usuario (calles como "Sargento Cabral", barrios, códigos de aviso). main.py corre
+-- en paralelo esta búsqueda léxica y la vectorial y las fusiona con RRF.
+--
+-- Columna generada: se recalcula sola en cada INSERT/UPDATE, sin triggers.
+-- Pesos: A = título y dirección, B = descripción del agente, C = descripción IA.
+
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS busqueda_tsv tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(titulo, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(direccion, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(descripcion_manual, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(descripcion_ia, '')), 'C')
+    ) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_busqueda_tsv
+    ON Propiedad USING GIN (busqueda_tsv);
+
+ANALYZE Propiedad;
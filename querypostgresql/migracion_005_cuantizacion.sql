@@ -0,0 +1,26 @@
+-- Migración 005: índices HNSW cuantizados para Propiedad.embedding (pgvector >= 0.7)
+--
+-- El embedding de 768 dimensiones (3 KB por fila en float32) es lo más pesado de la
+-- tabla y del índice HNSW, que debe caber en memoria para ser rápido. Estos índices
+-- se construyen sobre expresiones, sin columnas nuevas: la columna float32 se
+-- mantiene para el re-ranking exacto de los candidatos.
+--
+--   halfvec: float16, ~1/2 del tamaño, pérdida de recall despreciable.
+--   binary:  1 bit por dimensión, ~1/32 del tamaño; necesita re-ranking (factor 10+).
+--
+-- main.py elige la expresión con VECTOR_QUANTIZATION=halfvec|binary; las expresiones
+-- deben coincidir exactamente con las de semantic_search_sql().
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_embedding_halfvec
+    ON Propiedad USING hnsw ((embedding::halfvec(768)) halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_embedding_bit
+    ON Propiedad USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- Una vez elegido el modo cuantizado, el índice float32 de la migración 001 ya no
+-- se usa y puede eliminarse para liberar memoria:
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_propiedad_embedding_hnsw;
+
+ANALYZE Propiedad;
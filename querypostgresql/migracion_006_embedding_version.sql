@@ -0,0 +1,27 @@
+-- Migración 006: versión del embedding por fila (re-vectorización incremental)
+--
+-- Hasta ahora una fila se vectorizaba solo si embedding IS NULL: una descripción
+-- editada conservaba el vector viejo y cambiar EMBEDDING_MODEL obligaba a borrar
+-- todo a mano. Cada fila guarda ahora qué se vectorizó y con qué modelo:
+--
+--   embedding_hash:  md5(descripcion_ia) del texto que generó el vector
+--   embedding_model: modelo de Gemini usado (p. ej. 'text-embedding-004')
+--   embedding_dim:   dimensión del vector generado
+--
+-- vector_generator.py re-vectoriza solo las filas cuyo texto, modelo o dimensión
+-- no coinciden con la configuración actual.
+-- Nota: cambiar la dimensión también exige cambiar el tipo de la columna
+-- (vector(768)) y recrear los índices de las migraciones 001 y 005.
+
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS embedding_hash CHAR(32);
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(100);
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS embedding_dim INT;
+
+-- Los vectores existentes se generaron con text-embedding-004 a partir del texto
+-- actual (no había otra forma de escribirlos), así que no hace falta recalcularlos.
+UPDATE Propiedad
+SET embedding_hash = md5(descripcion_ia),
+    embedding_model = 'text-embedding-004',
+    embedding_dim = vector_dims(embedding)
+WHERE embedding IS NOT NULL
+  AND embedding_hash IS NULL;
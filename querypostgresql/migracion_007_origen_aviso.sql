@@ -0,0 +1,22 @@
+-- Migración 007: origen de cada aviso para la carga idempotente de los scrapers
+--
+-- scrapping/bulk_loader.py carga los avisos con COPY a una tabla de staging y un
+-- único INSERT ... ON CONFLICT (url_origen): volver a correr el scraper actualiza
+-- los avisos que cambiaron y deja intactos los demás.
+--
+--   url_origen:     URL del aviso en el sitio de la inmobiliaria (clave natural)
+--   codigo_aviso:   código del aviso en el sitio (p. ej. 'orense-302')
+--   contenido_hash: md5 de los campos scrapeados; si no cambió, no se escribe la fila
+
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS url_origen TEXT;
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS codigo_aviso VARCHAR(50);
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS contenido_hash CHAR(32);
+
+-- Índice único (no parcial) para que ON CONFLICT (url_origen) lo pueda usar.
+-- Las filas cargadas a mano antes de esta migración quedan con url_origen NULL;
+-- el loader las adopta por (titulo, direccion) la primera vez que ve su URL.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_url_origen
+    ON Propiedad (url_origen);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_codigo_aviso
+    ON Propiedad (codigo_aviso);
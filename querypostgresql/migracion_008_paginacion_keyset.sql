@@ -0,0 +1,19 @@
+-- Migración 008: orden estable para el listado paginado por cursor (keyset)
+--
+-- GET /propiedades/top ordena por (fecha_publicacion DESC, id_propiedad DESC) y
+-- cada página continúa desde la última fila de la anterior:
+--
+--   WHERE (fecha_publicacion, id_propiedad) < ($cursor_fecha, $cursor_id)
+--
+-- Con el índice compuesto en el mismo orden, la página 100 lee las mismas filas
+-- que la primera (no hay OFFSET que recorrer y descartar). id_propiedad desempata
+-- los avisos cargados en la misma transacción (misma fecha_publicacion).
+--
+-- La comparación de filas necesita fecha_publicacion sin NULL: las filas viejas
+-- sin fecha toman la fecha de la migración.
+
+UPDATE Propiedad SET fecha_publicacion = CURRENT_TIMESTAMP WHERE fecha_publicacion IS NULL;
+ALTER TABLE Propiedad ALTER COLUMN fecha_publicacion SET NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_publicacion
+    ON Propiedad (fecha_publicacion DESC, id_propiedad DESC);
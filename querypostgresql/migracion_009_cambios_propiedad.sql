@@ -0,0 +1,88 @@
+-- Migración 009: aviso de cambios en Propiedad para el índice en memoria
+--
+-- El índice en memoria de main.py (SEARCH_ENGINE=memory) guarda embedding, título,
+-- precio y descripcion_ia de cada fila. Hasta ahora solo vector_generator.py
+-- avisaba por NOTIFY, así que las cargas de bulk_loader.py (precio, título,
+-- descripción borrada) dejaban el índice desactualizado.
+--
+-- Con estos triggers cualquier escritura que toque esas columnas:
+--   * actualiza fecha_actualizacion (para ponerse al día después de cargar un
+--     snapshot: WHERE fecha_actualizacion > <fecha del snapshot>)
+--   * publica los ids en el canal propiedad_embedding (payload = ids separados
+--     por coma, en trozos de menos de 8000 bytes), una vez por sentencia.
+
+ALTER TABLE Propiedad ADD COLUMN IF NOT EXISTS fecha_actualizacion TIMESTAMP WITH TIME ZONE
+    NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_propiedad_actualizacion
+    ON Propiedad (fecha_actualizacion);
+
+-- Fecha de la última modificación de las columnas que usa el índice en memoria
+CREATE OR REPLACE FUNCTION propiedad_marcar_actualizacion() RETURNS trigger AS $$
+BEGIN
+    IF (NEW.titulo, NEW.precio_alquiler, NEW.descripcion_ia, NEW.embedding)
+       IS DISTINCT FROM (OLD.titulo, OLD.precio_alquiler, OLD.descripcion_ia, OLD.embedding) THEN
+        NEW.fecha_actualizacion := CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS propiedad_actualizacion ON Propiedad;
+CREATE TRIGGER propiedad_actualizacion
+    BEFORE UPDATE ON Propiedad
+    FOR EACH ROW EXECUTE FUNCTION propiedad_marcar_actualizacion();
+
+-- NOTIFY por sentencia con los ids afectados (tablas de transición "filas"/"anteriores")
+CREATE OR REPLACE FUNCTION propiedad_notificar_cambios() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+    payload TEXT := '';
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        FOR r IN
+            SELECT n.id_propiedad
+            FROM filas n
+            JOIN anteriores o USING (id_propiedad)
+            WHERE (n.titulo, n.precio_alquiler, n.descripcion_ia, n.embedding)
+                  IS DISTINCT FROM (o.titulo, o.precio_alquiler, o.descripcion_ia, o.embedding)
+        LOOP
+            IF length(payload) > 7000 THEN
+                PERFORM pg_notify('propiedad_embedding', payload);
+                payload := '';
+            END IF;
+            payload := payload || CASE WHEN payload = '' THEN '' ELSE ',' END || r.id_propiedad;
+        END LOOP;
+    ELSE
+        FOR r IN SELECT id_propiedad FROM filas LOOP
+            IF length(payload) > 7000 THEN
+                PERFORM pg_notify('propiedad_embedding', payload);
+                payload := '';
+            END IF;
+            payload := payload || CASE WHEN payload = '' THEN '' ELSE ',' END || r.id_propiedad;
+        END LOOP;
+    END IF;
+    IF payload <> '' THEN
+        PERFORM pg_notify('propiedad_embedding', payload);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS propiedad_notificar_insert ON Propiedad;
+CREATE TRIGGER propiedad_notificar_insert
+    AFTER INSERT ON Propiedad
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION propiedad_notificar_cambios();
+
+DROP TRIGGER IF EXISTS propiedad_notificar_update ON Propiedad;
+CREATE TRIGGER propiedad_notificar_update
+    AFTER UPDATE ON Propiedad
+    REFERENCING OLD TABLE AS anteriores NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION propiedad_notificar_cambios();
+
+DROP TRIGGER IF EXISTS propiedad_notificar_delete ON Propiedad;
+CREATE TRIGGER propiedad_notificar_delete
+    AFTER DELETE ON Propiedad
+    REFERENCING OLD TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION propiedad_notificar_cambios();
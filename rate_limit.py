@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Control de tasa y reintentos para llamadas a APIs externas (Gemini).
+
+- TokenBucket: limita las llamadas por segundo según la cuota contratada.
+- retry_async: reintenta con backoff exponencial y jitter los errores transitorios.
+- is_retryable_gemini_error: 429 (cuota) y 5xx son transitorios; 4xx no.
+"""
+
+import asyncio
+import random
+import time
+
+from google.genai.errors import APIError
+
+
+class TokenBucket:
+    """
+    Cubeta de tokens asíncrona: rate tokens por segundo, hasta capacity acumulados
+    (ráfaga máxima). acquire() espera lo justo para no superar la tasa; los que
+    esperan se atienden en orden de llegada.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: float = None) -> "TokenBucket":
+        return cls(requests_per_minute / 60.0, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+def is_retryable_gemini_error(error: Exception) -> bool:
+    """Errores de la API de Gemini que vale la pena reintentar."""
+    if isinstance(error, APIError):
+        return error.code == 429 or (error.code or 0) >= 500
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+
+async def retry_async(
+    factory,
+    *,
+    retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    is_retryable=is_retryable_gemini_error,
+    on_retry=None
+):
+    """
+    Ejecuta await factory() y lo reintenta ante errores transitorios con backoff
+    exponencial y "full jitter": espera aleatoria en [0, min(max_delay, base * 2^n)].
+    on_retry(intento, error, espera) permite registrar cada reintento.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await factory()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            attempt += 1
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            await asyncio.sleep(delay)
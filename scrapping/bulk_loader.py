@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Carga directa de avisos scrapeados en Propiedad (ver migracion_007_origen_aviso.sql).
+
+En lugar de generar INSERTs con f-strings en un .txt para correrlos a mano
+(una sentencia por aviso, y las comillas de los títulos las rompen), los avisos
+van con parámetros:
+
+    1. COPY binario a una tabla temporal de staging.
+    2. Adopción de filas cargadas a mano antes de tener url_origen (por titulo + direccion).
+    3. Un único INSERT ... ON CONFLICT (url_origen) DO UPDATE que solo reescribe
+       las filas cuyo contenido_hash cambió.
+
+load_listings() devuelve cuántos avisos se insertaron, actualizaron, quedaron
+sin cambios u omitieron (sin coordenadas: ubicacion es NOT NULL).
+
+Backfill del volcado existente:
+    python bulk_loader.py inserts_propiedades.txt
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+from decimal import Decimal
+from typing import Optional
+
+# db.py (acceso a PostgreSQL compartido) está en la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+from description_source import source_fields  # noqa: E402
+
+# Campos de un aviso, en el orden de la tabla de staging
+LISTING_FIELDS = [
+    "url_origen", "codigo_aviso", "agente_nombre", "titulo", "direccion", "ciudad",
+    "lon", "lat", "tipo_propiedad", "ambientes", "metros_cuadrados", "precio_alquiler",
+    "moneda", "descripcion_manual", "descripcion_ia", "amenities",
+]
+
+_CODIGO_RE = re.compile(r"/([a-z]+-\d+)/?$")
+
+SQL_CREATE_STAGING = """
+    CREATE TEMP TABLE staging_propiedad (
+        url_origen TEXT PRIMARY KEY,
+        codigo_aviso VARCHAR(50),
+        agente_nombre VARCHAR(100),
+        titulo VARCHAR(255),
+        direccion VARCHAR(255),
+        ciudad VARCHAR(100),
+        lon DOUBLE PRECISION,
+        lat DOUBLE PRECISION,
+        tipo_propiedad VARCHAR(50),
+        ambientes INT,
+        metros_cuadrados INT,
+        precio_alquiler DECIMAL(10, 2),
+        moneda VARCHAR(3),
+        descripcion_manual TEXT,
+        descripcion_ia TEXT,
+        amenities JSONB,
+        contenido_hash CHAR(32)
+    ) ON COMMIT DROP;
+"""
+
+# Filas anteriores a la migración 007 (url_origen NULL) que corresponden a un aviso scrapeado.
+# El emparejamiento es uno a uno: varios avisos pueden compartir titulo + direccion (p. ej.
+# tres departamentos iguales en el mismo edificio), así que se numeran las filas de cada
+# grupo en ambos lados y se empareja la n-ésima URL con la n-ésima fila existente.
+SQL_ADOPT_EXISTING = """
+    UPDATE Propiedad AS p
+    SET url_origen = a.url_origen, codigo_aviso = a.codigo_aviso
+    FROM (
+        SELECT s.url_origen, s.codigo_aviso, q.id_propiedad
+        FROM (
+            SELECT url_origen, codigo_aviso, titulo, direccion,
+                   row_number() OVER (PARTITION BY titulo, direccion ORDER BY url_origen) AS n
+            FROM staging_propiedad AS s
+            WHERE NOT EXISTS (SELECT 1 FROM Propiedad AS r WHERE r.url_origen = s.url_origen)
+        ) AS s
+        JOIN (
+            SELECT id_propiedad, titulo, direccion,
+                   row_number() OVER (PARTITION BY titulo, direccion ORDER BY id_propiedad) AS n
+            FROM Propiedad
+            WHERE url_origen IS NULL
+            AND (titulo, direccion) IN (SELECT titulo, direccion FROM staging_propiedad)
+        ) AS q
+          ON q.titulo = s.titulo AND q.direccion = s.direccion AND q.n = s.n
+    ) AS a
+    WHERE p.id_propiedad = a.id_propiedad;
+"""
+
+# Entrada actual del generador de las filas ya cargadas (incluidas las recién adoptadas)
+SQL_EXISTING_SOURCES = """
+    SELECT p.url_origen, p.tipo_propiedad, p.ciudad, p.ambientes, p.metros_cuadrados,
+           p.descripcion_manual, p.amenities
+    FROM Propiedad AS p
+    JOIN staging_propiedad AS s USING (url_origen);
+"""
+
+# descripcion_ia solo se pisa en los avisos de $1: los que cambiaron alguno de los datos
+# con los que la genera descripcion_generator.py (ver sources_changed).
+# Las filas sin cambios no cumplen el WHERE y no aparecen en RETURNING.
+SQL_UPSERT = """
+    INSERT INTO Propiedad (
+        url_origen, codigo_aviso, agente_nombre, titulo, direccion, ciudad, ubicacion,
+        tipo_propiedad, ambientes, metros_cuadrados, precio_alquiler, moneda,
+        descripcion_manual, descripcion_ia, amenities, contenido_hash
+    )
+    SELECT
+        url_origen, codigo_aviso, agente_nombre, titulo, direccion, ciudad,
+        ST_SetSRID(ST_MakePoint(lon, lat), 4326),
+        tipo_propiedad, ambientes, metros_cuadrados, precio_alquiler, moneda,
+        descripcion_manual, descripcion_ia, amenities, contenido_hash
+    FROM staging_propiedad
+    ON CONFLICT (url_origen) DO UPDATE SET
+        codigo_aviso = EXCLUDED.codigo_aviso,
+        agente_nombre = EXCLUDED.agente_nombre,
+        titulo = EXCLUDED.titulo,
+        direccion = EXCLUDED.direccion,
+        ciudad = EXCLUDED.ciudad,
+        ubicacion = EXCLUDED.ubicacion,
+        tipo_propiedad = EXCLUDED.tipo_propiedad,
+        ambientes = EXCLUDED.ambientes,
+        metros_cuadrados = EXCLUDED.metros_cuadrados,
+        precio_alquiler = EXCLUDED.precio_alquiler,
+        moneda = EXCLUDED.moneda,
+        descripcion_ia = CASE
+            WHEN EXCLUDED.url_origen = ANY($1::text[])
+            THEN EXCLUDED.descripcion_ia
+            ELSE Propiedad.descripcion_ia
+        END,
+        descripcion_manual = EXCLUDED.descripcion_manual,
+        amenities = EXCLUDED.amenities,
+        contenido_hash = EXCLUDED.contenido_hash,
+        esta_disponible = TRUE
+    WHERE Propiedad.contenido_hash IS DISTINCT FROM EXCLUDED.contenido_hash
+    RETURNING (xmax = 0) AS inserted;
+"""
+
+
+def codigo_from_url(url: str) -> Optional[str]:
+    match = _CODIGO_RE.search(url)
+    return match.group(1) if match else None
+
+
+def _normalized(listing: dict) -> dict:
+    """Tipos canónicos: el mismo aviso da el mismo hash venga del scraper o del volcado."""
+    values = {field: listing.get(field) for field in LISTING_FIELDS}
+    for field in ("lat", "lon"):
+        if values[field] is not None:
+            values[field] = float(values[field])
+    if values["precio_alquiler"] is not None:
+        values["precio_alquiler"] = Decimal(str(values["precio_alquiler"])).quantize(Decimal("0.01"))
+    for field in ("descripcion_manual", "descripcion_ia"):
+        values[field] = (values[field] or "").strip() or None
+    values["amenities"] = values["amenities"] or {}
+    return values
+
+
+def content_hash(values: dict) -> str:
+    """md5 de los campos scrapeados (sin url ni descripcion_ia) en forma canónica."""
+    content = {k: v for k, v in values.items() if k not in ("url_origen", "descripcion_ia")}
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.md5(canonical.encode("utf-8")).hexdigest()
+
+
+def sources_changed(existing_rows, listings: dict) -> list:
+    """
+    url_origen de las filas existentes cuya entrada para descripcion_generator.py
+    (source_fields, con el texto del agente normalizado) difiere de la del aviso
+    cargado. Las filas del volcado viejo guardan " texto " y el aviso trae "texto":
+    es la misma entrada y conservan su descripcion_ia.
+    """
+    return [
+        row['url_origen'] for row in existing_rows
+        if source_fields(row) != source_fields(_normalized(listings[row['url_origen']]))
+    ]
+
+
+def _staging_record(listing: dict) -> tuple:
+    values = _normalized(listing)
+    record = [values[field] for field in LISTING_FIELDS]
+    record[LISTING_FIELDS.index("amenities")] = json.dumps(values["amenities"])
+    return tuple(record) + (content_hash(values),)
+
+
+async def connect():
+    """Conexión para pasar a load_listings / set_availability y reutilizarla en toda la corrida."""
+    return await db.connect(vector=False, application_name="scrapers")
+
+
+async def load_listings(listings: list, conn=None) -> dict:
+    """
+    Inserta o actualiza los avisos (dicts con LISTING_FIELDS) de forma idempotente.
+    Devuelve {"inserted", "updated", "unchanged", "skipped", "skipped_urls", "loaded_urls"}.
+    """
+    by_url = {}
+    skipped_urls = []
+    for listing in listings:
+        listing.setdefault("codigo_aviso", codigo_from_url(listing["url_origen"]))
+        if listing.get("lat") is None or listing.get("lon") is None:
+            skipped_urls.append(listing["url_origen"])
+            continue
+        by_url[listing["url_origen"]] = listing  # un mismo aviso dos veces: gana el último
+
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": len(skipped_urls),
+             "skipped_urls": skipped_urls, "loaded_urls": list(by_url)}
+    if not by_url:
+        return stats
+
+    own_conn = conn is None
+    if own_conn:
+        conn = await connect()
+    try:
+        async with conn.transaction():
+            await conn.execute(SQL_CREATE_STAGING)
+            await conn.copy_records_to_table(
+                'staging_propiedad',
+                records=[_staging_record(l) for l in by_url.values()],
+                columns=LISTING_FIELDS + ["contenido_hash"]
+            )
+            await conn.execute(SQL_ADOPT_EXISTING)
+            existing = await conn.fetch(SQL_EXISTING_SOURCES)
+            rows = await conn.fetch(SQL_UPSERT, sources_changed(existing, by_url))
+    finally:
+        if own_conn:
+            await conn.close()
+
+    stats["inserted"] = sum(1 for r in rows if r["inserted"])
+    stats["updated"] = len(rows) - stats["inserted"]
+    stats["unchanged"] = len(by_url) - len(rows)
+    return stats
+
+
+async def set_availability(urls: list, disponible: bool, conn=None) -> int:
+    """Marca esta_disponible en los avisos dados por url_origen; devuelve las filas cambiadas."""
+    if not urls:
+        return 0
+    own_conn = conn is None
+    if own_conn:
+        conn = await connect()
+    try:
+        status = await conn.execute("""
+            UPDATE Propiedad
+            SET esta_disponible = $2
+            WHERE url_origen = ANY($1::text[])
+            AND esta_disponible IS DISTINCT FROM $2;
+        """, list(urls), disponible)
+    finally:
+        if own_conn:
+            await conn.close()
+    return int(status.split()[-1])
+
+
+def print_load_stats(stats: dict):
+    print(f"Carga en Propiedad: {stats['inserted']} insertadas | {stats['updated']} actualizadas | "
+          f"{stats['unchanged']} sin cambios | {stats['skipped']} omitidas (sin coordenadas)")
+    for url in stats["skipped_urls"]:
+        print(f"  - sin coordenadas: {url}")
+
+
+# --- Backfill desde inserts_propiedades.txt ---
+
+_DUMP_BLOCK_RE = re.compile(r"----- QUERY PARA URL: (\S+) -----\n(.*?)----- FIN QUERY -----", re.S)
+# Cada valor va en su propia línea: se ancla en "',\n" para tolerar comillas dentro del texto
+_DUMP_VALUES_RE = re.compile(
+    r"VALUES \(\s*\n"
+    r"\s*'(?P<agente_nombre>.*?)',\s*\n"
+    r"\s*'(?P<titulo>.*?)',\s*\n"
+    r"\s*'(?P<direccion>.*?)',\s*\n"
+    r"\s*'(?P<ciudad>.*?)',\s*\n"
+    r"\s*ST_SetSRID\(ST_MakePoint\((?P<lon>[^,]+),\s*(?P<lat>[^)]+)\),\s*4326\),\s*\n"
+    r"\s*'(?P<tipo_propiedad>.*?)',\s*\n"
+    r"\s*(?P<ambientes>-?\d+),\s*\n"
+    r"\s*(?P<metros_cuadrados>-?\d+),\s*\n"
+    r"\s*(?P<precio_alquiler>[0-9.]+),\s*\n"
+    r"\s*'(?P<moneda>.*?)',\s*\n"
+    r"\s*\$\$ (?P<descripcion_manual>.*?) \$\$,\s*\n"
+    r"\s*\$\$ (?P<descripcion_ia>.*?) \$\$,\s*\n"
+    r"\s*'(?P<amenities>.*?)'\s*\n\);",
+    re.S
+)
+
+
+def _coordinate(text: str) -> Optional[float]:
+    text = text.strip()
+    return None if text == "None" else float(text)
+
+
+def parse_inserts_dump(path: str) -> list:
+    """Lee el volcado generado por la versión anterior de scrapping_insaertSqlBatch.py."""
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    listings = []
+    for url, block in _DUMP_BLOCK_RE.findall(content):
+        match = _DUMP_VALUES_RE.search(block)
+        if not match:
+            print(f"  ⚠️ No se pudo interpretar el bloque de {url}")
+            continue
+        values = match.groupdict()
+        listings.append({
+            "url_origen": url,
+            "agente_nombre": values["agente_nombre"],
+            "titulo": values["titulo"],
+            "direccion": values["direccion"],
+            "ciudad": values["ciudad"],
+            "lon": _coordinate(values["lon"]),
+            "lat": _coordinate(values["lat"]),
+            "tipo_propiedad": values["tipo_propiedad"],
+            "ambientes": int(values["ambientes"]),
+            "metros_cuadrados": int(values["metros_cuadrados"]),
+            "precio_alquiler": values["precio_alquiler"],
+            "moneda": values["moneda"],
+            "descripcion_manual": values["descripcion_manual"],
+            "descripcion_ia": values["descripcion_ia"],
+            "amenities": json.loads(values["amenities"]),
+        })
+    return listings
+
+
+if __name__ == "__main__":
+    dump = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "inserts_propiedades.txt"
+    )
+    avisos = parse_inserts_dump(dump)
+    print(f"Avisos leídos de {dump}: {len(avisos)}")
+    print_load_stats(asyncio.run(load_listings(avisos)))
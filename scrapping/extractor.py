@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción de un aviso de orensepropiedades.com, compartida por los scrapers.
+
+extract_listing(html) devuelve un ListingRecord con los mismos valores que
+producía el código BeautifulSoup copiado en cada script:
+
+    titulo           h6.fw-bold                                  (.text.strip())
+    direccion        <p> siguiente al h3 "Ubicación"             (get_text(strip=True))
+    caracteristicas  title de los div de características         (dormitorios / superficie)
+    precio           h2 de precio                                (get_text(" ", strip=True) + regex)
+    descripcion      p.p-0.m-0 exacto                            (get_text("\\n").strip())
+    zona             p "text-muted p-0 m-0 zone"                 (.text.strip())
+
+Backends:
+    bs4         referencia (html.parser), siempre disponible
+    lxml        XPath precompilados
+    selectolax  parser lexbor, el más rápido
+
+Los backends rápidos replican la semántica de bs4: class_ con un token busca el
+token y class_ con espacios compara el atributo completo; string= exige que el
+tag tenga un único texto (.string); find_next recorre el documento en orden a
+partir del tag. Con HTML mal formado los árboles de html.parser y de los parsers
+HTML5 pueden diferir: benchmarks/benchmark_extractor.py verifica que los tres
+den el mismo resultado sobre scrapping/fixtures/.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError:  # pragma: no cover - dependencia opcional
+    etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # pragma: no cover - dependencia opcional
+    LexborHTMLParser = None
+
+SIN_TITULO = "Sin título"
+UBICACION = "Ubicación"
+TITLE_CLASS = "fw-bold"
+SECTION_CLASS = "mb-4 fw-bold section-title"
+FEATURE_CLASS = "mb-3 item d-inline-flex align-items-center col-md-3 col-6"
+PRICE_CLASS = "d-inline-block fw-bold mb-0 p-0 price"
+DESCRIPTION_CLASS = "p-0 m-0"
+ZONE_CLASS = "text-muted p-0 m-0 zone"
+
+_NON_DIGITS_RE = re.compile(r'\D')
+_PRICE_RE = re.compile(r'([0-9][0-9\.,]*)')
+_ASCII_SPACES = str.maketrans("", "", "\x20\x0a\x09\x0c\x0d")
+
+
+@dataclass(frozen=True)
+class ListingRecord:
+    titulo: str
+    direccion: Optional[str]
+    ambientes: int
+    metros_cuadrados: int
+    precio: float
+    precio_texto: Optional[str]
+    descripcion_manual: str
+    descripcion_corta: Optional[str]
+    caracteristicas: Tuple[str, ...]
+
+
+def _bs4_whitespace(strings):
+    """
+    BeautifulSoup reduce cada texto formado solo por espacios ASCII a "\n" (si
+    tenía un salto de línea) o a " "; lxml y lexbor lo conservan tal cual.
+    """
+    for s in strings:
+        if s and not s.translate(_ASCII_SPACES):
+            yield "\n" if "\n" in s else " "
+        else:
+            yield s
+
+
+def _join_text(strings, separator: str = "", strip: bool = False) -> str:
+    """Equivalente a Tag.get_text(separator, strip) sobre los textos del tag."""
+    if strip:
+        return separator.join(s.strip() for s in strings if s.strip())
+    return separator.join(strings)
+
+
+def _build_record(titulo, direccion, caracteristicas, precio_texto, descripcion, zona) -> ListingRecord:
+    ambientes = 0
+    metros_cuadrados = 0
+    for title in caracteristicas:
+        title = title.lower()
+        digits = _NON_DIGITS_RE.sub('', title)
+        if not digits:
+            continue  # p. ej. "Dormitorio en suite": sin número no cambia el valor
+        if "dormitorio" in title:
+            ambientes = int(digits)
+        if "sup. total" in title or "sup. cubierta" in title:
+            metros_cuadrados = int(digits)
+
+    precio = 0
+    if precio_texto:
+        match = _PRICE_RE.search(precio_texto)
+        if match:
+            try:
+                precio = float(match.group(1).replace('.', '').replace(',', '.'))
+            except ValueError:
+                precio = 0
+
+    return ListingRecord(
+        titulo=titulo.strip() if titulo is not None else SIN_TITULO,
+        direccion=direccion or None,
+        ambientes=ambientes,
+        metros_cuadrados=metros_cuadrados,
+        precio=precio,
+        precio_texto=precio_texto,
+        descripcion_manual=descripcion.strip() if descripcion is not None else "",
+        descripcion_corta=zona.strip() if zona is not None else None,
+        caracteristicas=tuple(caracteristicas),
+    )
+
+
+# --- bs4 (referencia) ---
+
+def _extract_bs4(html: str) -> ListingRecord:
+    soup = BeautifulSoup(html, 'html.parser')
+
+    titulo_tag = soup.find('h6', class_=TITLE_CLASS)
+    direccion = None
+    ubicacion_section = soup.find('h3', class_=SECTION_CLASS, string=UBICACION)
+    if ubicacion_section:
+        direccion_tag = ubicacion_section.find_next('p')
+        if direccion_tag:
+            direccion = direccion_tag.get_text(strip=True)
+    precio_tag = soup.find('h2', class_=PRICE_CLASS)
+    descripcion_tag = soup.find('p', class_=DESCRIPTION_CLASS)
+    zona_tag = soup.find('p', class_=ZONE_CLASS)
+
+    return _build_record(
+        titulo_tag.text if titulo_tag else None,
+        direccion,
+        [prop.get('title', '') for prop in soup.find_all('div', class_=FEATURE_CLASS)],
+        precio_tag.get_text(separator=" ", strip=True) if precio_tag else None,
+        descripcion_tag.get_text(separator="\n") if descripcion_tag else None,
+        zona_tag.text if zona_tag else None,
+    )
+
+
+# --- lxml ---
+
+if etree is not None:
+    _LX_TITLE = etree.XPath(
+        "//h6[contains(concat(' ', normalize-space(@class), ' '), $token)]"
+    )
+    _LX_BY_CLASS = {
+        (tag, cls): etree.XPath(f"//{tag}[normalize-space(@class) = '{cls}']")
+        for tag, cls in (("h3", SECTION_CLASS), ("div", FEATURE_CLASS), ("h2", PRICE_CLASS),
+                         ("p", DESCRIPTION_CLASS), ("p", ZONE_CLASS))
+    }
+    _LX_NEXT_P = etree.XPath("(descendant::p | following::p)[1]")
+
+
+def _lxml_string(el) -> Optional[str]:
+    """Tag.string: el texto si el tag tiene un único hijo de texto (recursivo)."""
+    children = list(el)
+    if not children:
+        return el.text
+    if len(children) == 1 and not el.text and not children[0].tail and isinstance(children[0].tag, str):
+        return _lxml_string(children[0])
+    return None
+
+
+def _extract_lxml(html: str) -> ListingRecord:
+    root = lxml.html.fromstring(html)
+
+    def first(tag, cls):
+        found = _LX_BY_CLASS[(tag, cls)](root)
+        return found[0] if found else None
+
+    def text(el, separator="", strip=False):
+        return _join_text(_bs4_whitespace(el.itertext()), separator, strip) if el is not None else None
+
+    titulos = _LX_TITLE(root, token=f" {TITLE_CLASS} ")
+    direccion = None
+    for h3 in _LX_BY_CLASS[("h3", SECTION_CLASS)](root):
+        if _lxml_string(h3) == UBICACION:
+            siguiente = _LX_NEXT_P(h3)
+            if siguiente:
+                direccion = text(siguiente[0], strip=True)
+            break
+
+    return _build_record(
+        text(titulos[0]) if titulos else None,
+        direccion,
+        [prop.get('title', '') for prop in _LX_BY_CLASS[("div", FEATURE_CLASS)](root)],
+        text(first("h2", PRICE_CLASS), " ", strip=True),
+        text(first("p", DESCRIPTION_CLASS), "\n"),
+        text(first("p", ZONE_CLASS)),
+    )
+
+
+# --- selectolax (lexbor) ---
+
+def _lexbor_class(node) -> str:
+    return " ".join((node.attributes.get('class') or "").split())
+
+
+def _lexbor_texts(node):
+    return [n.text_content for n in node.traverse(include_text=True) if n.is_text_node]
+
+
+def _lexbor_string(node) -> Optional[str]:
+    children = list(node.iter(include_text=True))
+    if len(children) != 1:
+        return None
+    child = children[0]
+    if child.is_text_node:
+        return child.text_content
+    if child.is_element_node:
+        return _lexbor_string(child)
+    return None
+
+
+def _extract_selectolax(html: str) -> ListingRecord:
+    tree = LexborHTMLParser(html)
+
+    def first(tag, cls):
+        for node in tree.css(tag):
+            if _lexbor_class(node) == cls:
+                return node
+        return None
+
+    def text(node, separator="", strip=False):
+        return _join_text(_bs4_whitespace(_lexbor_texts(node)), separator, strip) if node is not None else None
+
+    titulo = None
+    for node in tree.css("h6"):
+        if TITLE_CLASS in (node.attributes.get('class') or "").split():
+            titulo = text(node)
+            break
+
+    direccion = None
+    for h3 in tree.css("h3"):
+        if _lexbor_class(h3) == SECTION_CLASS and _lexbor_string(h3) == UBICACION:
+            passed = False
+            for node in tree.root.traverse():
+                if passed and node.tag == "p":
+                    direccion = text(node, strip=True)
+                    break
+                if node.mem_id == h3.mem_id:
+                    passed = True
+            break
+
+    return _build_record(
+        titulo,
+        direccion,
+        [prop.attributes.get('title') or '' for prop in tree.css("div") if _lexbor_class(prop) == FEATURE_CLASS],
+        text(first("h2", PRICE_CLASS), " ", strip=True),
+        text(first("p", DESCRIPTION_CLASS), "\n"),
+        text(first("p", ZONE_CLASS)),
+    )
+
+
+BACKENDS = {"bs4": _extract_bs4}
+if etree is not None:
+    BACKENDS["lxml"] = _extract_lxml
+if LexborHTMLParser is not None:
+    BACKENDS["selectolax"] = _extract_selectolax
+
+# El más rápido disponible, salvo que EXTRACTOR_BACKEND indique otro
+DEFAULT_BACKEND = os.getenv("EXTRACTOR_BACKEND") or next(
+    name for name in ("selectolax", "lxml", "bs4") if name in BACKENDS
+)
+
+
+def extract_listing(html: str, backend: str = None) -> ListingRecord:
+    return BACKENDS[backend or DEFAULT_BACKEND](html)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP local que imita al sitio de la inmobiliaria para probar los
+scrapers sin red: /orense-302 -> fixtures/orense-302.html.
+
+Responde ETag / Last-Modified y devuelve 304 ante If-None-Match o
+If-Modified-Since vigentes. --fail-rate inyecta 503 aleatorios para ejercitar
+los reintentos.
+
+Uso:
+    python fixture_server.py [--port 8765] [--dir fixtures] [--fail-rate 0.2]
+    ORENSE_BASE_URL=http://127.0.0.1:8765 python scrapping_insaertSqlBatch.py
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def make_handler(directory: str, fail_rate: float = 0.0):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if fail_rate and random.random() < fail_rate:
+                self.send_error(503, "Falla inyectada")
+                return
+
+            name = self.path.split("?", 1)[0].strip("/") or "index"
+            path = os.path.join(directory, os.path.basename(name) + ".html")
+            if not os.path.isfile(path):
+                self.send_error(404)
+                return
+
+            with open(path, "rb") as f:
+                body = f.read()
+            mtime = int(os.path.getmtime(path))
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            last_modified = formatdate(mtime, usegmt=True)
+
+            if self.headers.get("If-None-Match") == etag or self._not_modified_since(mtime):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _not_modified_since(self, mtime: int) -> bool:
+            if self.headers.get("If-None-Match"):
+                return False  # If-None-Match tiene prioridad (RFC 9110)
+            since = self.headers.get("If-Modified-Since")
+            if not since:
+                return False
+            try:
+                return mtime <= parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def serve(directory: str = FIXTURES_DIR, port: int = 0, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Levanta el servidor en un hilo; server.server_address[1] es el puerto real."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(directory, fail_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sirve las páginas guardadas de scrapping/fixtures/.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dir", default=FIXTURES_DIR)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.dir, args.fail_rate))
+    print(f"Sirviendo {args.dir} en http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Frontera de crawl incremental para los avisos de la inmobiliaria.
+
+En lugar de una lista fija de URLs orense-NNN, cada corrida:
+
+    1. Descubre los avisos recorriendo las páginas índice (INDEX_URLS, con
+       paginación {page}) y extrayendo los enlaces que cumplen LISTING_PATH_RE.
+    2. Registra en SQLite, por URL: first_seen, last_seen, last_fetched,
+       last_changed, content_hash y status (activo / desaparecido).
+    3. Visita solo los avisos nuevos o "vencidos" (last_fetched más viejo que
+       STALE_AFTER); el resto no se descarga.
+    4. Los avisos activos que ya no aparecen en los índices (o que devuelven
+       404/410) pasan a desaparecido: el scraper los marca esta_disponible = false.
+
+content_hash se calcula sobre el ListingRecord extraído, no sobre el HTML crudo
+(que cambia con banners, tokens, etc.): last_changed refleja cambios reales.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+FRONTIER_DB = os.getenv(
+    "FRONTIER_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontier.sqlite3")
+)
+# Un aviso se vuelve a visitar si su última descarga tiene más de esto (segundos)
+STALE_AFTER = float(os.getenv("FRONTIER_STALE_AFTER", str(7 * 24 * 3600)))
+LISTING_PATH_RE = re.compile(os.getenv("FRONTIER_LISTING_PATTERN", r"^/orense-\d+/?$"))
+MAX_INDEX_PAGES = int(os.getenv("FRONTIER_MAX_INDEX_PAGES", "200"))
+# Si un crawl descubre menos que esta fracción de los activos, se asume un índice
+# roto y no se marca ningún aviso como desaparecido
+MIN_DISCOVERY_RATIO = 0.5
+
+_HREF_RE = re.compile(r'href\s*=\s*["\']([^"\']+)["\']', re.I)
+
+ACTIVO = "activo"
+DESAPARECIDO = "desaparecido"
+
+
+def listing_links(html: str, base_url: str) -> set:
+    """URLs absolutas (sin query ni fragmento) de los avisos enlazados en una página índice."""
+    links = set()
+    for href in _HREF_RE.findall(html):
+        parts = urlsplit(urljoin(base_url, href))
+        if LISTING_PATH_RE.match(parts.path):
+            links.add(urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip("/"), "", "")))
+    return links
+
+
+def listing_hash(record) -> str:
+    """md5 del ListingRecord en forma canónica."""
+    canonical = json.dumps(dataclasses.asdict(record), sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(canonical.encode("utf-8")).hexdigest()
+
+
+async def discover_listing_urls(engine, index_urls, max_pages: int = MAX_INDEX_PAGES):
+    """
+    Recorre cada página índice; las URLs con {page} se paginan hasta que una
+    página no aporte avisos nuevos. Devuelve (urls, completo); completo es False
+    si alguna página índice falló, y entonces no se debe marcar nada como desaparecido.
+    """
+    found = set()
+    complete = True
+    for template in index_urls:
+        pages = range(1, max_pages + 1) if "{page}" in template else [None]
+        for page in pages:
+            url = template.format(page=page) if page is not None else template
+            result = await engine.fetch(url, conditional=False)
+            if not result.ok:
+                print(f"  ❌ Índice {url}: {result.error}")
+                complete = False
+                break
+            new_links = listing_links(result.text, url) - found
+            if not new_links:
+                break
+            found |= new_links
+    return found, complete
+
+
+class Frontier:
+    def __init__(self, path: str = FRONTIER_DB):
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS frontera (
+                url TEXT PRIMARY KEY,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                last_fetched REAL,
+                last_changed REAL,
+                content_hash TEXT,
+                status TEXT NOT NULL DEFAULT 'activo'
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_frontera_status ON frontera (status, last_fetched)")
+        self._db.commit()
+
+    def __len__(self):
+        return self._db.execute("SELECT count(*) FROM frontera").fetchone()[0]
+
+    def discovered(self, urls, now: float):
+        """
+        Registra las URLs vistas en los índices. Devuelve (nuevas, reaparecidas):
+        reaparecidas son avisos marcados como desaparecidos que volvieron a publicarse.
+        Las reaparecidas quedan vencidas: seguir en el índice no alcanza (puede ser un
+        enlace viejo que da 404), el aviso vuelve a estar disponible recién cuando
+        una descarga lo confirma.
+        """
+        urls = list(urls)
+        known = {}
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            known.update(self._db.execute(
+                f"SELECT url, status FROM frontera WHERE url IN ({marks})", chunk
+            ).fetchall())
+        new = [u for u in urls if u not in known]
+        reappeared = [u for u in urls if known.get(u) == DESAPARECIDO]
+        self._db.executemany(
+            "INSERT INTO frontera (url, first_seen, last_seen, status) VALUES (?, ?, ?, 'activo') "
+            "ON CONFLICT (url) DO UPDATE SET last_seen = excluded.last_seen, status = 'activo', "
+            "last_fetched = CASE WHEN frontera.status = 'desaparecido' THEN NULL ELSE frontera.last_fetched END",
+            [(u, now, now) for u in urls]
+        )
+        self._db.commit()
+        return new, reappeared
+
+    def due(self, now: float, stale_after: float = STALE_AFTER) -> list:
+        """Avisos activos nunca descargados o con la descarga vencida."""
+        rows = self._db.execute(
+            "SELECT url FROM frontera WHERE status = 'activo' "
+            "AND (last_fetched IS NULL OR last_fetched < ?) ORDER BY last_fetched IS NOT NULL, last_fetched",
+            (now - stale_after,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def fetched(self, url: str, content_hash: str, now: float) -> bool:
+        """Registra una descarga; devuelve True si el contenido cambió (o es nuevo)."""
+        row = self._db.execute("SELECT content_hash FROM frontera WHERE url = ?", (url,)).fetchone()
+        changed = row is None or row[0] != content_hash
+        self._db.execute(
+            "UPDATE frontera SET last_fetched = ?, content_hash = ?, "
+            "last_changed = CASE WHEN ? THEN ? ELSE last_changed END WHERE url = ?",
+            (now, content_hash, changed, now, url)
+        )
+        self._db.commit()
+        return changed
+
+    def not_modified(self, url: str, now: float):
+        self._db.execute("UPDATE frontera SET last_fetched = ? WHERE url = ?", (now, url))
+        self._db.commit()
+
+    def forget_hash(self, url: str):
+        """Fuerza que la próxima descarga cuente como cambio (p. ej. si falló la carga)."""
+        self._db.execute("UPDATE frontera SET content_hash = NULL, last_fetched = NULL WHERE url = ?", (url,))
+        self._db.commit()
+
+    def vanished(self, crawl_started: float) -> list:
+        """Activos que no se vieron en los índices de esta corrida."""
+        rows = self._db.execute(
+            "SELECT url FROM frontera WHERE status = 'activo' AND last_seen < ?", (crawl_started,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def active_count(self) -> int:
+        return self._db.execute("SELECT count(*) FROM frontera WHERE status = 'activo'").fetchone()[0]
+
+    def mark_gone(self, urls):
+        self._db.executemany("UPDATE frontera SET status = 'desaparecido' WHERE url = ?", [(u,) for u in urls])
+        self._db.commit()
+
+    def stats(self) -> dict:
+        rows = self._db.execute("SELECT status, count(*) FROM frontera GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Geocodificación compartida por los scrapers.
+
+- Caché persistente en SQLite con clave = dirección + ciudad normalizadas
+  (minúsculas, sin acentos ni puntuación): un re-crawl no vuelve a llamar al
+  servicio por direcciones ya conocidas. Las direcciones sin resultado también
+  se guardan y se reintentan recién pasado MISS_TTL.
+- Limitador global: como máximo 1 pedido por segundo a cada backend (política
+  de uso de Nominatim), compartido por todos los hilos y todas las instancias
+  de Geocoder del proceso.
+- geocode_many() deduplica las direcciones de un crawl antes de consultar.
+- Backend intercambiable: NominatimBackend o StubBackend (coordenadas fijas,
+  para probar sin red). GEOCODER_BACKEND=stub elige el stub en default_geocoder().
+  Cada backend tiene sus propias entradas en la caché.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Optional, Tuple
+
+import requests
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+DEFAULT_USER_AGENT = 'MiAppWebScraping/1.0 (tu_email@dominio.com)'
+GEOCODING_CACHE_DB = os.getenv(
+    "GEOCODING_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocoding_cache.sqlite3")
+)
+MISS_TTL = 30 * 24 * 3600  # segundos antes de reintentar una dirección sin resultado
+SIN_DIRECCION = "Sin dirección"
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+# Limitador del proceso: backend.name -> instante (monotonic) del último pedido
+_throttle_lock = threading.Lock()
+_last_call = {}
+
+
+def _throttle(backend_name: str, min_interval: float):
+    """Espera hasta que pase min_interval desde el último pedido a ese backend en el proceso."""
+    with _throttle_lock:
+        wait = _last_call.get(backend_name, 0.0) + min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_call[backend_name] = time.monotonic()
+
+
+def normalize_address(text: Optional[str]) -> str:
+    """'Av. Mitre  2345' y 'av mitre 2345' comparten clave."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _PUNCTUATION_RE.sub(" ", text.casefold())
+    return " ".join(text.split())
+
+
+def cache_key(direccion: str, ciudad: Optional[str] = None) -> str:
+    return f"{normalize_address(direccion)}|{normalize_address(ciudad)}"
+
+
+class NominatimBackend:
+    name = "nominatim"
+
+    def __init__(self, url: str = NOMINATIM_URL, user_agent: str = DEFAULT_USER_AGENT, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+
+    def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        response = self.session.get(
+            self.url, params={'q': query, 'format': 'json', 'limit': 1}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            return None
+        return float(data[0]['lat']), float(data[0]['lon'])
+
+
+class StubBackend:
+    """Backend local: coordenadas por consulta normalizada, o default para el resto."""
+    name = "stub"
+
+    def __init__(self, coords: dict = None, default: Optional[Tuple[float, float]] = None):
+        self.coords = {normalize_address(k): v for k, v in (coords or {}).items()}
+        self.default = default
+        self.calls = 0
+
+    def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        self.calls += 1
+        return self.coords.get(normalize_address(query), self.default)
+
+
+class Geocoder:
+    def __init__(self, backend=None, cache_path: str = GEOCODING_CACHE_DB, min_interval: float = 1.0):
+        self.backend = backend or NominatimBackend()
+        self.min_interval = min_interval
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS geocodificaciones (
+                clave TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                consulta TEXT NOT NULL,
+                lat REAL,
+                lon REAL,
+                creado REAL NOT NULL,
+                PRIMARY KEY (clave, backend)
+            )
+        """)
+        self._db.commit()
+        self._lock = threading.Lock()  # conexión SQLite compartida entre hilos
+        self.hits = 0
+        self.calls = 0
+        self.errors = 0
+
+    def _cached(self, key: str):
+        """(True, coords|None) si la clave está en caché y vigente; (False, None) si no."""
+        row = self._db.execute(
+            "SELECT lat, lon, creado FROM geocodificaciones WHERE clave = ? AND backend = ?",
+            (key, self.backend.name)
+        ).fetchone()
+        if row is None:
+            return False, None
+        lat, lon, creado = row
+        if lat is None:
+            if time.time() - creado > MISS_TTL:
+                return False, None
+            return True, None
+        return True, (lat, lon)
+
+    def geocode(self, direccion: str, ciudad: Optional[str] = None) -> Optional[Tuple[float, float]]:
+        """(lat, lon) de la dirección, o None si no se encontró."""
+        if not direccion or direccion == SIN_DIRECCION:
+            return None
+        key = cache_key(direccion, ciudad)
+        with self._lock:
+            found, coords = self._cached(key)
+            if found:
+                self.hits += 1
+                return coords
+            query = f"{direccion}, {ciudad}" if ciudad else direccion
+            _throttle(self.backend.name, self.min_interval)
+            self.calls += 1
+            try:
+                coords = self.backend.geocode(query)
+            except Exception as e:
+                # Un error de red no se cachea: se reintenta en la próxima corrida
+                self.errors += 1
+                print(f"  ⚠️ Error de geocodificación para '{query}': {e}")
+                return None
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocodificaciones (clave, consulta, lat, lon, backend, creado) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, query, coords[0] if coords else None, coords[1] if coords else None,
+                 self.backend.name, time.time())
+            )
+            self._db.commit()
+            return coords
+
+    def geocode_many(self, direcciones) -> dict:
+        """
+        Geocodifica pares (direccion, ciudad) de un crawl consultando una sola vez
+        cada dirección distinta. Devuelve {cache_key: (lat, lon) | None}.
+        """
+        results = {}
+        for direccion, ciudad in direcciones:
+            key = cache_key(direccion, ciudad)
+            if key not in results:
+                results[key] = self.geocode(direccion, ciudad)
+        return results
+
+    def stats(self) -> dict:
+        return {"cache_hits": self.hits, "calls": self.calls, "errors": self.errors}
+
+    def close(self):
+        self._db.close()
+
+
+def default_geocoder(cache_path: str = GEOCODING_CACHE_DB) -> Geocoder:
+    """Geocoder según GEOCODER_BACKEND (nominatim por defecto, stub para pruebas)."""
+    if os.getenv("GEOCODER_BACKEND", "nominatim") == "stub":
+        return Geocoder(StubBackend(default=(-27.3671, -55.8961)), cache_path, min_interval=0.0)
+    return Geocoder(NominatimBackend(), cache_path)
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de scraping asíncrono para los scripts de scrapping/.
+
+- Un único httpx.AsyncClient con pool de conexiones (keep-alive) para todo el crawl.
+- Límite de concurrencia por host y un intervalo mínimo entre pedidos al mismo
+  host (cortesía con el sitio de la inmobiliaria).
+- Reintentos con backoff exponencial y jitter ante 429/5xx y errores de red;
+  si el servidor manda Retry-After, se respeta.
+- GET condicional: ETag / Last-Modified de cada URL se guardan en SQLite y se
+  envían como If-None-Match / If-Modified-Since; un 304 se informa como
+  not_modified y el aviso no se vuelve a procesar.
+
+Los validadores se guardan solo cuando el handler procesó la página sin errores,
+así una falla de parseo no deja la URL marcada como "sin cambios".
+
+Para probarlo sin red: python fixture_server.py (sirve scrapping/fixtures/).
+"""
+
+import asyncio
+import random
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+DEFAULT_USER_AGENT = 'MiAppWebScraping/1.0 (tu_email@dominio.com)'
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int = 0
+    text: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and self.text is not None
+
+
+class ValidatorStore:
+    """ETag y Last-Modified por URL, persistidos en SQLite."""
+
+    def __init__(self, path: str = "scraper_validadores.sqlite3"):
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS validadores (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                actualizado REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def get(self, url: str):
+        row = self._db.execute(
+            "SELECT etag, last_modified FROM validadores WHERE url = ?", (url,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def set(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        if not etag and not last_modified:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO validadores (url, etag, last_modified, actualizado) VALUES (?, ?, ?, ?)",
+            (url, etag, last_modified, time.time())
+        )
+        self._db.commit()
+
+    def forget(self, url: str):
+        self._db.execute("DELETE FROM validadores WHERE url = ?", (url,))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+class _HostSlot:
+    """Semáforo + intervalo mínimo entre inicios de pedidos a un mismo host."""
+
+    def __init__(self, concurrency: int, min_interval: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.min_interval = min_interval
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait_turn(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.min_interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class ScraperEngine:
+    """
+    Uso:
+        async with ScraperEngine(validators=ValidatorStore()) as engine:
+            stats = await engine.crawl(urls, handler)
+
+    handler(result) recibe cada FetchResult con status 200 (puede ser async).
+    """
+
+    def __init__(
+        self,
+        validators: Optional[ValidatorStore] = None,
+        max_connections: int = 20,
+        per_host: int = 4,
+        min_interval: float = 0.5,
+        retries: int = 3,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        timeout: float = 15.0,
+        user_agent: str = DEFAULT_USER_AGENT
+    ):
+        self.validators = validators
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._timeout = httpx.Timeout(timeout)
+        self._headers = {"User-Agent": user_agent}
+        self._hosts = {}
+        self.client = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            limits=self._limits,
+            timeout=self._timeout,
+            headers=self._headers,
+            follow_redirects=True
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        self.client = None
+
+    def _slot(self, url: str) -> _HostSlot:
+        host = urlsplit(url).netloc
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = _HostSlot(self.per_host, self.min_interval)
+        return slot
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(self.max_backoff, float(retry_after))
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def fetch(self, url: str, conditional: bool = True) -> FetchResult:
+        headers = {}
+        if conditional and self.validators is not None:
+            etag, last_modified = self.validators.get(url)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        slot = self._slot(url)
+        attempt = 0
+        while True:
+            response = None
+            async with slot.semaphore:
+                await slot.wait_turn()
+                try:
+                    response = await self.client.get(url, headers=headers)
+                    error = None
+                except httpx.TransportError as e:
+                    error = f"{type(e).__name__}: {e}"
+
+            if response is not None and response.status_code not in RETRYABLE_STATUS:
+                break
+            if attempt >= self.retries:
+                break
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+        if response is None:
+            return FetchResult(url, error=error)
+        if response.status_code == 304:
+            return FetchResult(url, status=304)
+        if response.status_code != 200:
+            return FetchResult(url, status=response.status_code, error=f"HTTP {response.status_code}")
+        return FetchResult(
+            url,
+            status=200,
+            text=response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified")
+        )
+
+    def remember(self, result: FetchResult):
+        """Guarda los validadores de una página ya procesada."""
+        if self.validators is not None and result.ok:
+            self.validators.set(result.url, result.etag, result.last_modified)
+
+    async def crawl(self, urls, handler, conditional: bool = True, remember: bool = True) -> dict:
+        """
+        Descarga todas las URLs en paralelo y llama a handler con cada página nueva o
+        modificada. Con remember=False los validadores no se guardan: el llamador usa
+        remember(result) cuando la página quedó persistida (p. ej. cargada en la BD).
+        """
+        stats = {"fetched": 0, "not_modified": 0, "errors": 0}
+
+        async def visit(url):
+            result = await self.fetch(url, conditional=conditional)
+            if result.not_modified:
+                stats["not_modified"] += 1
+                return
+            if not result.ok:
+                stats["errors"] += 1
+                print(f"  ❌ {url}: {result.error}")
+                return
+            try:
+                outcome = handler(result)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+            except Exception as e:
+                stats["errors"] += 1
+                print(f"  ❌ Error al procesar {url}: {e}")
+                return
+            stats["fetched"] += 1
+            if remember:
+                self.remember(result)
+
+        await asyncio.gather(*(visit(url) for url in urls))
+        return stats
@@ -1,135 +1,148 @@
-import requests
-from bs4 import BeautifulSoup
-import json
-import re
+import asyncio
+import os
+import time
+from extractor import extract_listing
+from scraper_engine import ScraperEngine, ValidatorStore
+from geocoding import default_geocoder, cache_key
+import bulk_loader
+from bulk_loader import load_listings, print_load_stats, set_availability
+from frontier import Frontier, MIN_DISCOVERY_RATIO, discover_listing_urls, listing_hash
 
-urls = [
-   "https://www.orensepropiedades.com/orense-302",
-       "https://www.orensepropiedades.com/orense-301",
-       "https://www.orensepropiedades.com/orense-300",
-       "https://www.orensepropiedades.com/orense-298",
-       "https://www.orensepropiedades.com/orense-297",
-       "https://www.orensepropiedades.com/orense-296",
-       "https://www.orensepropiedades.com/orense-295",
-       "https://www.orensepropiedades.com/orense-294",
-       "https://www.orensepropiedades.com/orense-293",
-       "https://www.orensepropiedades.com/orense-292",
-       "https://www.orensepropiedades.com/orense-291",
-       "https://www.orensepropiedades.com/orense-289",
-       "https://www.orensepropiedades.com/orense-284",
-       "https://www.orensepropiedades.com/orense-279",
-       "https://www.orensepropiedades.com/orense-278",
-       "https://www.orensepropiedades.com/orense-276",
-       "https://www.orensepropiedades.com/orense-246",
-       "https://www.orensepropiedades.com/orense-244",
-       "https://www.orensepropiedades.com/orense-110",
-       "https://www.orensepropiedades.com/orense-100",
-       "https://www.orensepropiedades.com/orense-303",
-       "https://www.orensepropiedades.com/orense-257",
-       "https://www.orensepropiedades.com/orense-112",
-       "https://www.orensepropiedades.com/orense-274",
-       "https://www.orensepropiedades.com/orense-245",
-       "https://www.orensepropiedades.com/orense-225",
-       "https://www.orensepropiedades.com/orense-224",
-       "https://www.orensepropiedades.com/orense-222",
-       "https://www.orensepropiedades.com/orense-221",
-       "https://www.orensepropiedades.com/orense-220",
-       "https://www.orensepropiedades.com/orense-219",
-       "https://www.orensepropiedades.com/orense-218",
-       "https://www.orensepropiedades.com/orense-217",
-       "https://www.orensepropiedades.com/orense-216",
-       "https://www.orensepropiedades.com/orense-215",
-       "https://www.orensepropiedades.com/orense-214",
-       "https://www.orensepropiedades.com/orense-213",
-       "https://www.orensepropiedades.com/orense-206"
-]
+# Sitio real por defecto; ORENSE_BASE_URL=http://127.0.0.1:8765 apunta a fixture_server.py
+BASE_URL = os.getenv("ORENSE_BASE_URL", "https://www.orensepropiedades.com")
+# Páginas índice de donde se descubren los avisos ({page} = paginación), separadas por coma
+INDEX_URLS = os.getenv("ORENSE_INDEX_URLS", f"{BASE_URL}/propiedades?operacion=alquiler&page={{page}}").split(",")
+# Segundos entre pedidos al mismo host (cortesía); con 4 en paralelo por host
+SCRAPER_MIN_INTERVAL = float(os.getenv("SCRAPER_MIN_INTERVAL", "0.5"))
+VALIDADORES_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraper_validadores.sqlite3")
+ciudad = "Posadas"
 
-output_file = "inserts_propiedades.txt"
-with open(output_file, "w", encoding="utf-8") as f:
-    for url in urls:
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
 
-        agente_nombre = "Orense Propiedades"
-        titulo_tag = soup.find('h6', class_='fw-bold')
-        titulo = titulo_tag.text.strip() if titulo_tag else "Sin título"
+def direccion_de(registro):
+    return registro.direccion or "Sin dirección"
 
-        direccion = None
-        ciudad = "Posadas"
-        ubicacion_section = soup.find('h3', class_='mb-4 fw-bold section-title', string="Ubicación")
-        if ubicacion_section:
-            direccion_tag = ubicacion_section.find_next('p')
-            if direccion_tag:
-                direccion = direccion_tag.get_text(strip=True)
-        if not direccion:
-            direccion = "Sin dirección"
 
-        lat, lon = None, None
-        if direccion:
-            url_nominatim = "https://nominatim.openstreetmap.org/search"
-            params = {'q': direccion + ", " + ciudad, 'format': 'json', 'limit': 1}
-            headers = {'User-Agent': 'MiAppWebScraping/1.0 (tu_email@dominio.com)'}
-            response_geo = requests.get(url_nominatim, params=params, headers=headers)
-            data = response_geo.json()
-            if data:
-                lat = data[0]['lat']
-                lon = data[0]['lon']
+def construir_avisos(registros):
+    """Filas para bulk_loader a partir de los ListingRecord, con geocodificación en lote."""
+    # Cada dirección distinta se consulta una sola vez y las ya conocidas salen
+    # de la caché (1 pedido/s como máximo a Nominatim)
+    geocoder = default_geocoder()
+    coordenadas = geocoder.geocode_many((direccion_de(r), ciudad) for r in registros.values())
+    print(f"Geocodificación: {geocoder.stats()}")
+    geocoder.close()
 
-        tipo_propiedad = "Departamento"
-        ambientes = 0
-        metros_cuadrados = 0
-        for prop in soup.find_all('div', class_='mb-3 item d-inline-flex align-items-center col-md-3 col-6'):
-            titulo_prop = prop.get('title', '').lower()
-            if "dormitorio" in titulo_prop:
-                ambientes = int(re.sub(r'\D', '', titulo_prop))
-            if "sup. total" in titulo_prop or "sup. cubierta" in titulo_prop:
-                metros_cuadrados = int(re.sub(r'\D', '', titulo_prop))
+    avisos = []
+    for url, registro in registros.items():
+        direccion = direccion_de(registro)
+        lat, lon = coordenadas.get(cache_key(direccion, ciudad)) or (None, None)
+        avisos.append({
+            "url_origen": url,
+            "agente_nombre": "Orense Propiedades",
+            "titulo": registro.titulo,
+            "direccion": direccion,
+            "ciudad": ciudad,
+            "lat": lat,
+            "lon": lon,
+            "tipo_propiedad": "Departamento",
+            "ambientes": registro.ambientes,
+            "metros_cuadrados": registro.metros_cuadrados,
+            "precio_alquiler": registro.precio,
+            "moneda": "ARS",
+            "descripcion_manual": registro.descripcion_manual,
+            "descripcion_ia": "",
+            "amenities": {
+                "pileta": False,
+                "mascotas_permitidas": True,
+                "seguridad_24h": False
+            },
+        })
+    return avisos
 
-        precio = 0
-        precio_tag = soup.find('h2', class_='d-inline-block fw-bold mb-0 p-0 price')
-        if precio_tag:
-            precio_texto = precio_tag.get_text(separator=" ", strip=True)
-            match = re.search(r'([0-9][0-9\.,]*)', precio_texto)
-            if match:
-                precio_limpio = match.group(1).replace('.', '').replace(',', '.')
+
+async def crawl():
+    """
+    Crawl incremental (ver frontier.py): descubre los avisos en los índices,
+    descarga solo los nuevos o vencidos, carga los que cambiaron y marca como
+    no disponibles los que desaparecieron.
+    """
+    inicio = time.time()
+    frontier = Frontier()
+    validadores = ValidatorStore(VALIDADORES_DB)
+    try:
+        async with ScraperEngine(validators=validadores, min_interval=SCRAPER_MIN_INTERVAL) as engine:
+            activos_antes = frontier.active_count()
+            encontrados, completo = await discover_listing_urls(engine, INDEX_URLS)
+            nuevos, reaparecidos = frontier.discovered(encontrados, inicio)
+            pendientes = frontier.due(inicio)
+            print(f"Índices: {len(encontrados)} avisos ({len(nuevos)} nuevos, {len(reaparecidos)} reaparecidos) | "
+                  f"a visitar: {len(pendientes)} de {frontier.active_count()} activos")
+            resultados = await asyncio.gather(*(engine.fetch(url) for url in pendientes))
+
+        # 1. Clasificar las descargas
+        registros, paginas, eliminados = {}, {}, []
+        confirmados = set()  # descargas exitosas (200 o 304): el aviso sigue publicado
+        sin_cambios = errores = 0
+        for result in resultados:
+            if result.not_modified:
+                frontier.not_modified(result.url, inicio)
+                confirmados.add(result.url)
+                sin_cambios += 1
+            elif result.status in (404, 410):
+                eliminados.append(result.url)
+            elif result.ok:
+                confirmados.add(result.url)
+                registro = extract_listing(result.text)
+                if frontier.fetched(result.url, listing_hash(registro), inicio):
+                    registros[result.url] = registro
+                    paginas[result.url] = result
+                else:
+                    validadores.set(result.url, result.etag, result.last_modified)
+                    sin_cambios += 1
+            else:
+                errores += 1  # sin last_fetched nuevo: se reintenta en la próxima corrida
+                print(f"  ❌ {result.url}: {result.error}")
+        print(f"Avisos modificados: {len(registros)} | sin cambios: {sin_cambios} | "
+              f"eliminados (404): {len(eliminados)} | errores: {errores}")
+
+        # 2. Carga directa en Propiedad: COPY a staging + upsert por url_origen (idempotente).
+        #    Una sola conexión para la carga y la disponibilidad
+        conn = await bulk_loader.connect()
+        try:
+            if registros:
                 try:
-                    precio = float(precio_limpio)
-                except:
-                    precio = 0
+                    resultado = await load_listings(construir_avisos(registros), conn)
+                except Exception:
+                    for url in registros:
+                        frontier.forget_hash(url)
+                    raise
+                print_load_stats(resultado)
+                for url in resultado["loaded_urls"]:
+                    validadores.set(url, paginas[url].etag, paginas[url].last_modified)
+                for url in resultado["skipped_urls"]:
+                    frontier.forget_hash(url)
 
-        moneda = "ARS"
-        descripcion_manual = ""
-        descripcion_completa = soup.find('p', class_='p-0 m-0')
-        if descripcion_completa:
-            descripcion_manual = descripcion_completa.get_text(separator="\n").strip()
-        descripcion_ia = ""
-        amenities = {
-            "pileta": False,
-            "mascotas_permitidas": True,
-            "seguridad_24h": False
-        }
+            # 3. Disponibilidad: los que ya no están en los índices (si el descubrimiento
+            #    fue completo y plausible) y los que volvieron a publicarse. Un reaparecido
+            #    solo vuelve a estar disponible si su descarga salió bien; si falló (o dio
+            #    404) sigue desaparecido y se reintenta en la próxima corrida
+            reconfirmados = [url for url in reaparecidos if url in confirmados]
+            sin_confirmar = [url for url in reaparecidos if url not in confirmados]
+            desaparecidos = list(eliminados)
+            if completo and len(encontrados) >= MIN_DISCOVERY_RATIO * activos_antes:
+                desaparecidos += frontier.vanished(inicio)
+            else:
+                print("⚠️ Descubrimiento incompleto: no se marcan avisos como desaparecidos en esta corrida.")
+            frontier.mark_gone(desaparecidos + sin_confirmar)
+            no_disponibles = await set_availability(desaparecidos, False, conn)
+            disponibles = await set_availability(reconfirmados, True, conn)
+            print(f"Disponibilidad: {no_disponibles} marcados no disponibles, {disponibles} nuevamente disponibles")
+        finally:
+            await conn.close()
+        print(f"Frontera: {frontier.stats()} | {time.time() - inicio:.1f} s")
+    finally:
+        validadores.close()
+        frontier.close()
 
-        insert_sql = f"""----- QUERY PARA URL: {url} -----
-INSERT INTO Propiedad (
-    agente_nombre, titulo, direccion, ciudad, ubicacion, tipo_propiedad, ambientes, metros_cuadrados,
-    precio_alquiler, moneda, descripcion_manual, descripcion_ia, amenities
-) VALUES (
-    '{agente_nombre}',
-    '{titulo}',
-    '{direccion}',
-    '{ciudad}',
-    ST_SetSRID(ST_MakePoint({lon}, {lat}), 4326),
-    '{tipo_propiedad}',
-    {ambientes},
-    {metros_cuadrados},
-    {precio},
-    '{moneda}',
-    $$ {descripcion_manual} $$,
-    $$ {descripcion_ia} $$,
-    '{json.dumps(amenities)}'
-);
------ FIN QUERY -----
 
-"""
-        f.write(insert_sql)
-print(f"Todas las queries fueron exportadas a {output_file}")
\ No newline at end of file
+if __name__ == '__main__':
+    asyncio.run(crawl())
@@ -1,71 +1,32 @@
+import asyncio
 import requests
-from bs4 import BeautifulSoup
-import json
-import re
+from extractor import extract_listing
+from geocoding import default_geocoder
+from bulk_loader import load_listings, print_load_stats
 
 # URL de la página a scrapear
 url = "https://www.orensepropiedades.com/orense-304"
 response = requests.get(url)
-soup = BeautifulSoup(response.text, 'html.parser')
 
-# --- Extracción de datos ---
-agente_nombre = "Orense Propiedades"
-
-titulo_tag = soup.find('h6', class_='fw-bold')
-titulo = titulo_tag.text.strip() if titulo_tag else "Sin título"
+# --- Extracción de datos (ver extractor.py) ---
+registro = extract_listing(response.text)
 
-direccion = None
+agente_nombre = "Orense Propiedades"
+titulo = registro.titulo
+direccion = registro.direccion or "Sin dirección"
 ciudad = "Posadas"
-ubicacion_section = soup.find('h3', class_='mb-4 fw-bold section-title', string="Ubicación")
-if ubicacion_section:
-    direccion_tag = ubicacion_section.find_next('p')
-    if direccion_tag:
-        direccion = direccion_tag.get_text(strip=True)
-if not direccion:
-    direccion = "Sin dirección"
 
-lat, lon = None, None
-if direccion:
-    url_nominatim = "https://nominatim.openstreetmap.org/search"
-    params = {'q': direccion + ", " + ciudad, 'format': 'json', 'limit': 1}
-    headers = {'User-Agent': 'MiAppWebScraping/1.0 (tu_email@dominio.com)'}
-    response_geo = requests.get(url_nominatim, params=params, headers=headers)
-    data = response_geo.json()
-    if data:
-        lat = data[0]['lat']
-        lon = data[0]['lon']
+# Geocodificación con caché persistente (no vuelve a consultar direcciones conocidas)
+geocoder = default_geocoder()
+lat, lon = geocoder.geocode(direccion, ciudad) or (None, None)
+geocoder.close()
 
 tipo_propiedad = "Departamento"
-
-ambientes = 0
-metros_cuadrados = 0
-for prop in soup.find_all('div', class_='mb-3 item d-inline-flex align-items-center col-md-3 col-6'):
-    titulo_prop = prop.get('title', '').lower()
-    if "dormitorio" in titulo_prop:
-        ambientes = int(re.sub(r'\D', '', titulo_prop))
-    if "sup. total" in titulo_prop or "sup. cubierta" in titulo_prop:
-        metros_cuadrados = int(re.sub(r'\D', '', titulo_prop))
-
-# Extracción robusta del precio
-precio = 0
-precio_tag = soup.find('h2', class_='d-inline-block fw-bold mb-0 p-0 price')
-if precio_tag:
-    precio_texto = precio_tag.get_text(separator=" ", strip=True)
-    match = re.search(r'([0-9][0-9\.,]*)', precio_texto)
-    if match:
-        precio_limpio = match.group(1).replace('.', '').replace(',', '.')
-        try:
-            precio = float(precio_limpio)
-        except:
-            precio = 0
-
+ambientes = registro.ambientes
+metros_cuadrados = registro.metros_cuadrados
+precio = registro.precio
 moneda = "ARS"
-
-descripcion_manual = ""
-descripcion_completa = soup.find('p', class_='p-0 m-0')
-if descripcion_completa:
-    descripcion_manual = descripcion_completa.get_text(separator="\n").strip()
-
+descripcion_manual = registro.descripcion_manual
 descripcion_ia = ""
 
 amenities = {
@@ -74,25 +35,23 @@ amenities = {
     "seguridad_24h": False
 }
 
-insert_sql = f"""
-INSERT INTO Propiedad (
-    agente_nombre, titulo, direccion, ciudad, ubicacion, tipo_propiedad, ambientes, metros_cuadrados,
-    precio_alquiler, moneda, descripcion_manual, descripcion_ia, amenities
-) VALUES (
-    '{agente_nombre}',
-    '{titulo}',
-    '{direccion}',
-    '{ciudad}',
-    ST_SetSRID(ST_MakePoint({lon}, {lat}), 4326),
-    '{tipo_propiedad}',
-    {ambientes},
-    {metros_cuadrados},
-    {precio},
-    '{moneda}',
-    $$ {descripcion_manual} $$,
-    $$ {descripcion_ia} $$,
-    '{json.dumps(amenities)}'
-);
-"""
+aviso = {
+    "url_origen": url,
+    "agente_nombre": agente_nombre,
+    "titulo": titulo,
+    "direccion": direccion,
+    "ciudad": ciudad,
+    "lat": lat,
+    "lon": lon,
+    "tipo_propiedad": tipo_propiedad,
+    "ambientes": ambientes,
+    "metros_cuadrados": metros_cuadrados,
+    "precio_alquiler": precio,
+    "moneda": moneda,
+    "descripcion_manual": descripcion_manual,
+    "descripcion_ia": descripcion_ia,
+    "amenities": amenities,
+}
 
-print(insert_sql)
\ No newline at end of file
+# Carga con parámetros (sin f-strings): las comillas del título ya no rompen el INSERT
+print_load_stats(asyncio.run(load_listings([aviso])))
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de bulk_loader.py sin BD: lectura del volcado inserts_propiedades.txt y
+decisión de conservar descripcion_ia al adoptar o recargar un aviso.
+
+    python -m pytest scrapping/tests
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bulk_loader  # noqa: E402
+
+DUMP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "inserts_propiedades.txt")
+
+
+def stored_row(listing: dict, **changes) -> dict:
+    """Fila como la cargó el volcado viejo: "$$ texto $$" y amenities como texto JSON."""
+    row = {
+        "url_origen": listing["url_origen"],
+        "tipo_propiedad": listing["tipo_propiedad"],
+        "ciudad": listing["ciudad"],
+        "ambientes": listing["ambientes"],
+        "metros_cuadrados": listing["metros_cuadrados"],
+        "descripcion_manual": f" {listing['descripcion_manual']} ",
+        "amenities": json.dumps(listing["amenities"]),
+    }
+    row.update(changes)
+    return row
+
+
+def scraped_listing(**changes) -> dict:
+    listing = {
+        "url_origen": "https://inmobiliaria.test/orense-302",
+        "agente_nombre": "Orense",
+        "titulo": "Departamento céntrico",
+        "direccion": "Av. Mitre 2345",
+        "ciudad": "Posadas",
+        "lon": -55.8961,
+        "lat": -27.3671,
+        "tipo_propiedad": "Departamento",
+        "ambientes": 2,
+        "metros_cuadrados": 45,
+        "precio_alquiler": "350000",
+        "moneda": "ARS",
+        "descripcion_manual": "texto",
+        "descripcion_ia": None,
+        "amenities": {"balcon": True},
+    }
+    listing.update(changes)
+    return listing
+
+
+class FakeConn:
+    """Registra las sentencias de load_listings; SQL_EXISTING_SOURCES devuelve existing."""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.upsert_args = None
+
+    @contextlib.asynccontextmanager
+    async def _transaction(self):
+        yield
+
+    def transaction(self):
+        return self._transaction()
+
+    async def execute(self, sql, *args):
+        return "OK"
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.records = records
+
+    async def fetch(self, sql, *args):
+        if sql == bulk_loader.SQL_EXISTING_SOURCES:
+            return self.existing
+        assert sql == bulk_loader.SQL_UPSERT
+        self.upsert_args = args
+        return [{"inserted": False}]
+
+
+def test_volcado_completo():
+    listings = bulk_loader.parse_inserts_dump(DUMP)
+    with open(DUMP, encoding="utf-8") as f:
+        assert len(listings) == f.read().count("----- QUERY PARA URL:")
+    assert all(l["descripcion_manual"] == l["descripcion_manual"].strip() for l in listings)
+
+
+def test_backfill_del_volcado_conserva_descripcion_ia():
+    listings = bulk_loader.parse_inserts_dump(DUMP)
+    existing = [stored_row(l) for l in listings]
+    assert bulk_loader.sources_changed(existing, {l["url_origen"]: l for l in listings}) == []
+
+
+def test_adopcion_con_espacios_conserva_descripcion_ia():
+    listing = scraped_listing()
+    conn = FakeConn([stored_row(listing, descripcion_manual=" texto ")])
+    stats = asyncio.run(bulk_loader.load_listings([listing], conn))
+    assert conn.upsert_args == ([],)
+    assert stats["updated"] == 1
+
+
+def test_cambio_de_entrada_del_generador_borra_descripcion_ia():
+    listing = scraped_listing()
+    cambios = [
+        {"descripcion_manual": " otro texto "},
+        {"metros_cuadrados": 50},
+        {"ambientes": 3},
+        {"ciudad": "Oberá"},
+        {"tipo_propiedad": "Casa"},
+        {"amenities": json.dumps({"balcon": True, "pileta": True})},
+    ]
+    for cambio in cambios:
+        existing = [stored_row(listing, **cambio)]
+        assert bulk_loader.sources_changed(existing, {listing["url_origen"]: listing}) == [listing["url_origen"]], cambio
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas del motor de scraping contra fixture_server.py (sin red):
+GET condicional con 304, reintento ante un 503 inyectado, 404 de un aviso dado
+de baja y descubrimiento completo de los avisos del índice.
+
+    python -m pytest scrapping/tests
+"""
+
+import asyncio
+import os
+import sys
+import types
+
+import pytest
+
+# Los módulos de scrapping/ se importan como scripts sueltos (ver scrapping_insaertSqlBatch.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fixture_server  # noqa: E402
+from frontier import discover_listing_urls  # noqa: E402
+from scraper_engine import ScraperEngine, ValidatorStore  # noqa: E402
+
+AVISOS_FIXTURES = sorted(
+    name[:-len(".html")] for name in os.listdir(fixture_server.FIXTURES_DIR) if name.startswith("orense-")
+)
+
+
+@pytest.fixture
+def base_url():
+    server = fixture_server.serve()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def validators(tmp_path):
+    store = ValidatorStore(str(tmp_path / "validadores.sqlite3"))
+    yield store
+    store.close()
+
+
+def engine(validators=None, retries: int = 3) -> ScraperEngine:
+    return ScraperEngine(validators=validators, min_interval=0, retries=retries, backoff=0.01)
+
+
+def test_revalidacion_devuelve_304(base_url, validators):
+    url = f"{base_url}/orense-302"
+
+    async def run():
+        async with engine(validators) as e:
+            first = await e.fetch(url)
+            e.remember(first)
+            return first, await e.fetch(url)
+
+    first, second = asyncio.run(run())
+    assert first.ok and first.etag
+    assert second.not_modified
+    assert second.text is None
+
+
+def test_reintenta_tras_503_inyectado(monkeypatch):
+    # El primer pedido cae en la falla inyectada, el siguiente pasa
+    draws = iter([0.0, 0.99, 0.99])
+    calls = []
+
+    def fake_random():
+        calls.append(1)
+        return next(draws)
+
+    monkeypatch.setattr(fixture_server, "random", types.SimpleNamespace(random=fake_random))
+    server = fixture_server.serve(fail_rate=0.5)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/orense-302"
+
+        async def run():
+            async with engine() as e:
+                return await e.fetch(url)
+
+        result = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result.ok
+    assert len(calls) == 2
+
+
+def test_503_persistente_agota_reintentos():
+    server = fixture_server.serve(fail_rate=1.0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/orense-302"
+
+        async def run():
+            async with engine(retries=2) as e:
+                return await e.fetch(url)
+
+        result = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result.status == 503
+    assert not result.ok and not result.not_modified
+
+
+def test_aviso_dado_de_baja_es_404(base_url, validators):
+    async def run():
+        async with engine(validators) as e:
+            return await e.fetch(f"{base_url}/orense-999")
+
+    result = asyncio.run(run())
+    # scrapping_insaertSqlBatch.crawl() clasifica 404/410 como eliminado (no como error)
+    assert result.status == 404
+    assert not result.ok and not result.not_modified
+    assert result.error == "HTTP 404"
+
+
+def test_descubrimiento_completo(base_url):
+    async def run():
+        async with engine() as e:
+            return await discover_listing_urls(e, [f"{base_url}/propiedades"])
+
+    found, complete = asyncio.run(run())
+    assert complete
+    assert sorted(url.rsplit("/", 1)[1] for url in found) == AVISOS_FIXTURES
+    assert all("?" not in url for url in found)
+
+
+def test_descubrimiento_incompleto_si_falla_el_indice(base_url):
+    async def run():
+        async with engine(retries=0) as e:
+            return await discover_listing_urls(e, [f"{base_url}/propiedades", f"{base_url}/no-existe"])
+
+    found, complete = asyncio.run(run())
+    assert not complete
+    assert len(found) == len(AVISOS_FIXTURES)
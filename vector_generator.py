@@ -5,7 +5,6 @@ Created on Sat Nov 1 17:34:09 2025
 @author: agutierrez752
 """
 
-import asyncpg
 from dotenv import load_dotenv
 import os
 from google import genai
@@ -13,104 +12,294 @@ from google.genai import types
 from google.genai.errors import APIError
 import numpy as np
 import asyncio 
+import argparse
+import json
+import db
+from embedding_config import EMBEDDING_DIM, EMBEDDING_MODEL
+from rate_limit import TokenBucket, is_retryable_gemini_error, retry_async
 
 # Cargar variables de entorno (usamos 'cred.env' como en main.py)
 load_dotenv('cred.env')
 
-# --- Configuración de BD y Gemini ---
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
+# --- Configuración de Gemini (la de BD está en db.py) ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Modelo de embeddings de Google con 768 dimensiones
-EMBEDDING_MODEL = 'text-embedding-004'
-
 # --- Inicialización del Cliente Gemini ---
 try:
-    # Usamos el Cliente Síncrono estándar
+    # Las llamadas concurrentes usan la superficie asíncrona (client.aio)
     client = genai.Client(api_key=GEMINI_API_KEY)
-    print("✅ Cliente Gemini Síncrono inicializado.")
+    print("✅ Cliente Gemini inicializado.")
 except Exception as e:
     print(f"❌ Error al inicializar cliente Gemini: {e}")
     exit()
 
+# --- Parámetros de lote ---
+# La API acepta una lista de textos en 'contents' (hasta 100 por llamada)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+
+# --- Concurrencia y cuota ---
+# Reanudar no necesita estado propio: lo ya escrito deja de cumplir
+# SQL_PENDING_CONDITION y una corrida interrumpida sigue con lo que falta.
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+# Cuota de la API de embeddings en llamadas por minuto (cada lote es una llamada)
+GEMINI_EMBED_RPM = float(os.getenv("GEMINI_EMBED_RPM", "300"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
+
+async def embed_batch(texts: list) -> list:
+    """Genera los embeddings (RETRIEVAL_DOCUMENT) de un lote de textos en una sola llamada."""
+    response = await client.aio.models.embed_content(
+        model=EMBEDDING_MODEL,
+        contents=texts, 
+        config=types.EmbedContentConfig( 
+            task_type="RETRIEVAL_DOCUMENT",
+            output_dimensionality=EMBEDDING_DIM,
+        ),
+    )
+    # Un objeto Embedding por texto, en el mismo orden; los floats están en '.values'
+    return [np.asarray(e.values, dtype=np.float32) for e in response.embeddings]
+
+
+async def write_embeddings(conn, records: list) -> int:
+    """
+    Escribe un lote de (id_propiedad, embedding, embedding_hash) con COPY binario
+    a una tabla temporal y un único UPDATE ... FROM, en lugar de un UPDATE por fila.
+    embedding_hash es el md5 del texto que se vectorizó (leído junto con el texto),
+    así una edición concurrente vuelve a quedar pendiente en la próxima corrida.
+    """
+    async with conn.transaction():
+        await conn.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS tmp_embeddings (
+                id_propiedad INT PRIMARY KEY,
+                embedding vector({EMBEDDING_DIM}),
+                embedding_hash CHAR(32)
+            ) ON COMMIT DELETE ROWS;
+        """)
+        await conn.copy_records_to_table(
+            'tmp_embeddings',
+            records=records,
+            columns=['id_propiedad', 'embedding', 'embedding_hash']
+        )
+        status = await conn.execute("""
+            UPDATE Propiedad AS p
+            SET embedding = t.embedding,
+                embedding_hash = t.embedding_hash,
+                embedding_model = $1,
+                embedding_dim = $2
+            FROM tmp_embeddings AS t
+            WHERE p.id_propiedad = t.id_propiedad;
+        """, EMBEDDING_MODEL, EMBEDDING_DIM)
+    # status = "UPDATE <n>"
+    return int(status.split()[-1])
+
+
+# --- Selección incremental (ver querypostgresql/migracion_006_embedding_version.sql) ---
+# Pendiente = sin vector, o vectorizada con otro texto, otro modelo u otra dimensión.
+# $1 = EMBEDDING_MODEL, $2 = EMBEDDING_DIM
+SQL_PENDING_CONDITION = """
+    descripcion_ia IS NOT NULL
+    AND btrim(descripcion_ia) <> ''
+    AND (
+        embedding IS NULL
+        OR embedding_hash IS DISTINCT FROM md5(descripcion_ia)
+        OR embedding_model IS DISTINCT FROM $1
+        OR embedding_dim IS DISTINCT FROM $2
+    )
+"""
+
+# Filas cuya descripción se vació: su vector ya no representa nada y se borra
+SQL_CLEAR_STALE = """
+    UPDATE Propiedad
+    SET embedding = NULL, embedding_hash = NULL, embedding_model = NULL, embedding_dim = NULL
+    WHERE (descripcion_ia IS NULL OR btrim(descripcion_ia) = '')
+      AND embedding IS NOT NULL
+    RETURNING id_propiedad;
+"""
+
+SQL_PENDING_SUMMARY = f"""
+    SELECT
+        count(*) AS filas,
+        count(*) FILTER (WHERE embedding IS NULL) AS nuevas,
+        count(*) FILTER (WHERE embedding IS NOT NULL
+                         AND embedding_hash IS DISTINCT FROM md5(descripcion_ia)) AS texto_cambiado,
+        count(*) FILTER (WHERE embedding IS NOT NULL
+                         AND embedding_hash IS NOT DISTINCT FROM md5(descripcion_ia)) AS modelo_cambiado,
+        coalesce(sum(length(descripcion_ia)), 0) AS caracteres
+    FROM Propiedad
+    WHERE {SQL_PENDING_CONDITION};
+"""
+
+
+async def produce_batches(conn, queue: asyncio.Queue, batch_size: int, workers: int):
+    """
+    Lee las filas pendientes con un cursor del lado del servidor (sin traer toda
+    la tabla a memoria) y encola lotes; la cola acotada frena la lectura si los
+    workers van más lentos.
+    """
+    total = 0
+    batch = []
+    rows = db.stream(conn, f"""
+        SELECT id_propiedad, descripcion_ia, md5(descripcion_ia) AS content_hash
+        FROM Propiedad
+        WHERE {SQL_PENDING_CONDITION}
+        ORDER BY id_propiedad;
+    """, EMBEDDING_MODEL, EMBEDDING_DIM, prefetch=batch_size)
+    async for record in rows:
+        batch.append(record)
+        if len(batch) == batch_size:
+            await queue.put(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        await queue.put(batch)
+        total += len(batch)
+    for _ in range(workers):
+        await queue.put(None)
+    return total
+
+
+async def embed_worker(name: str, pool, queue: asyncio.Queue, bucket: TokenBucket, stats: dict):
+    loop = asyncio.get_running_loop()
+
+    def log_retry(attempt, error, delay):
+        stats["retries"] += 1
+        print(f"  ⏳ [{name}] Reintento {attempt} en {delay:.1f}s: {error}")
+
+    async def limited_embed(texts):
+        await bucket.acquire()
+        return await embed_batch(texts)
+
+    async def embed_rows(rows: list) -> list:
+        """
+        (fila, vector) de las filas que se pudieron vectorizar. Ante un error no
+        transitorio (p. ej. un 400 por un texto inválido) el lote se parte en
+        mitades, así una fila rechazada no se lleva a las otras 99.
+        """
+        try:
+            vectors = await retry_async(
+                lambda: limited_embed([r['descripcion_ia'] for r in rows]),
+                retries=EMBED_MAX_RETRIES,
+                on_retry=log_retry
+            )
+            return list(zip(rows, vectors))
+        except Exception as e:
+            if len(rows) > 1 and not is_retryable_gemini_error(e):
+                middle = len(rows) // 2
+                return await embed_rows(rows[:middle]) + await embed_rows(rows[middle:])
+            stats["failed_ids"].extend(r['id_propiedad'] for r in rows)
+            kind = "Error de API" if isinstance(e, APIError) else "Error desconocido"
+            print(f"  ❌ [{name}] {kind} en IDs {rows[0]['id_propiedad']}-{rows[-1]['id_propiedad']}: {e}")
+            return []
+
+    while True:
+        batch = await queue.get()
+        if batch is None:
+            return
+        t0 = loop.time()
+        embedded = await embed_rows(batch)
+        if not embedded:
+            continue
+        t1 = loop.time()
+        batch_ids = [r['id_propiedad'] for r, _ in embedded]
+        try:
+            async with pool.acquire() as conn:
+                # El índice en memoria se entera por el trigger de la migración 009 (NOTIFY)
+                updated = await write_embeddings(
+                    conn, [(r['id_propiedad'], v, r['content_hash']) for r, v in embedded]
+                )
+        except Exception as e:
+            stats["failed_ids"].extend(batch_ids)
+            print(f"  ❌ [{name}] Error al escribir los IDs {batch_ids[0]}-{batch_ids[-1]}: {e}")
+            continue
+        t2 = loop.time()
+
+        stats["processed"] += updated
+        print(f"  [{name}] [IDs {batch_ids[0]}-{batch_ids[-1]}] {updated} vectores (Dim: {len(embedded[0][1])}) | "
+              f"embedding {1000 * (t1 - t0):.0f} ms, escritura {1000 * (t2 - t1):.0f} ms")
+
+
+async def report_pending(conn, batch_size: int, requests_per_minute: float):
+    """Dry-run: cuántas filas se re-vectorizarían y cuántas llamadas a la API implica."""
+    summary = await conn.fetchrow(SQL_PENDING_SUMMARY, EMBEDDING_MODEL, EMBEDDING_DIM)
+    stale = await conn.fetchval(
+        "SELECT count(*) FROM Propiedad WHERE (descripcion_ia IS NULL OR btrim(descripcion_ia) = '') "
+        "AND embedding IS NOT NULL;"
+    )
+    rows = summary['filas']
+    calls = -(-rows // batch_size)
+    print(f"🔎 Dry-run ({EMBEDDING_MODEL}, dim {EMBEDDING_DIM}):")
+    print(f"  Filas a vectorizar:     {rows}")
+    print(f"    nuevas:               {summary['nuevas']}")
+    print(f"    texto cambiado:       {summary['texto_cambiado']}")
+    print(f"    modelo/dim cambiado:  {summary['modelo_cambiado']}")
+    print(f"  Caracteres a enviar:    {summary['caracteres']}")
+    print(f"  Llamadas estimadas:     {calls} (lotes de {batch_size})")
+    print(f"  Duración mínima:        {calls / requests_per_minute:.1f} min a {requests_per_minute:g} llamadas/min")
+    print(f"  Vectores a borrar:      {stale} (descripción vacía)")
+
+
 # --- Función Principal de Procesamiento ---
-async def generate_and_update_vectors():
+async def generate_and_update_vectors(
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = EMBED_WORKERS,
+    requests_per_minute: float = GEMINI_EMBED_RPM,
+    dry_run: bool = False
+):
+    """
+    Pipeline productor/consumidor: un cursor lee los pendientes y N workers
+    generan los embeddings respetando la cuota (token bucket) y los escriben.
+    Si la corrida se interrumpe, la siguiente sigue con lo que quedó pendiente;
+    las filas que la API rechaza se informan y se reintentan en la próxima corrida.
+    Con dry_run solo se informa cuántas filas y llamadas costaría la corrida.
+    """
     conn = None
+    pool = None
     try:
-        # Conexión directa (no usamos pool porque es un script de una sola corrida)
-        conn = await asyncpg.connect(
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            host=DB_HOST,
-            port=int(DB_PORT)
-        )
+        # Una conexión para el cursor de lectura y un pool chico para las escrituras
+        conn = await db.connect(vector=False, application_name="vector_generator")
+        pool = await db.create_pool(min_size=1, max_size=workers, application_name="vector_generator")
         print("✅ Conexión a PostgreSQL establecida.")
 
-        # 1. Seleccionar propiedades pendientes:
-        properties_to_process = await conn.fetch("""
-            SELECT id_propiedad, descripcion_ia
-            FROM Propiedad
-            WHERE descripcion_ia IS NOT NULL 
-            AND embedding IS NULL;
-        """)
-        
-        if not properties_to_process:
-            print("✅ No hay propiedades pendientes de vectorización. Tarea completa.")
+        if dry_run:
+            await report_pending(conn, batch_size, requests_per_minute)
             return
 
-        print(f"Encontradas {len(properties_to_process)} propiedades para vectorizar...")
-        
-        # 2. Generar y actualizar vector por vector:
-        processed_count = 0
-        
-        for record in properties_to_process:
-            prop_id = record['id_propiedad']
-            desc_ia = record['descripcion_ia']
-            
-            try:
-                # Llamada a la API (todos los argumentos han sido corregidos)
-                response = await asyncio.to_thread(
-                    client.models.embed_content,
-                    model=EMBEDDING_MODEL,
-                    contents=[desc_ia], 
-                    config=types.EmbedContentConfig( 
-                        task_type="RETRIEVAL_DOCUMENT",
-                    ),
-                )
-                
-                # CORRECCIÓN FINAL: Acceder al atributo .values (plural)
-                # 1. Obtenemos el objeto Embedding (el primero y único)
-                embedding_object = response.embeddings[0] 
-                # 2. Extraemos la lista de flotantes del atributo '.values'
-                embedding_vector_list = embedding_object.values # <--- CORRECCIÓN CLAVE: .values
-                
-                vector_str = "[" + ",".join(map(str, embedding_vector_list)) + "]"
-                
-                # 3. Actualizar la base de datos
-                await conn.execute("""
-                    UPDATE Propiedad
-                    SET embedding = $1
-                    WHERE id_propiedad = $2;
-                """, vector_str, prop_id)
-                
-                processed_count += 1
-                print(f"  [ID {prop_id}] Vector generado y actualizado (Dim: {len(embedding_vector_list)}).")
-                
-            except APIError as e:
-                print(f"  ❌ Error de API en ID {prop_id}: {e}")
-            except Exception as e:
-                print(f"  ❌ Error desconocido al procesar ID {prop_id}: {e}")
-
-        print(f"\n--- Proceso finalizado. Total de propiedades vectorizadas: {processed_count} ---")
+        cleared = await conn.fetch(SQL_CLEAR_STALE)
+        if cleared:
+            print(f"🧹 {len(cleared)} vectores borrados por descripciones vacías.")
+
+        print(f"Vectorizando pendientes con {workers} workers, lotes de {batch_size} "
+              f"y un máximo de {requests_per_minute:g} llamadas/min...")
+
+        queue = asyncio.Queue(maxsize=workers * 2)
+        bucket = TokenBucket.per_minute(requests_per_minute)
+        stats = {"processed": 0, "failed_ids": [], "retries": 0}
+        consumers = [
+            asyncio.create_task(embed_worker(f"w{i}", pool, queue, bucket, stats))
+            for i in range(workers)
+        ]
+        try:
+            total = await produce_batches(conn, queue, batch_size, workers)
+            await asyncio.gather(*consumers)
+        finally:
+            for task in consumers:
+                task.cancel()
+
+        if total == 0:
+            print("✅ No hay propiedades pendientes de vectorización. Tarea completa.")
+        failed = sorted(stats["failed_ids"])
+        if failed:
+            print(f"⚠️ {len(failed)} propiedades no se pudieron vectorizar (IDs {failed[:20]}"
+                  f"{'...' if len(failed) > 20 else ''}); siguen pendientes para la próxima corrida.")
+
+        print(f"\n--- Proceso finalizado. Total de propiedades vectorizadas: {stats['processed']} "
+              f"({stats['retries']} reintentos) ---")
 
     except Exception as e:
         print(f"❌ Error fatal en el script: {e}")
     finally:
+        if pool:
+            await pool.close()
         if conn:
             await conn.close()
             print("🔌 Conexión a PostgreSQL cerrada.")
@@ -119,14 +308,26 @@ async def generate_and_update_vectors():
 # Ejecución del script asíncrono
 if __name__ == '__main__':
     import asyncio
+    parser = argparse.ArgumentParser(description="Genera los embeddings pendientes de Propiedad.")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--rpm", type=float, default=GEMINI_EMBED_RPM, help="Cuota de llamadas por minuto")
+    parser.add_argument("--dry-run", action="store_true", help="Solo informa filas y llamadas estimadas")
+    args = parser.parse_args()
+    run = lambda: generate_and_update_vectors(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        requests_per_minute=args.rpm,
+        dry_run=args.dry_run
+    )
     try:
         # Intenta la ejecución estándar
-        asyncio.run(generate_and_update_vectors())
+        asyncio.run(run())
     except RuntimeError as e:
         # Si el loop ya está corriendo (típico en entornos IDE/notebook), usa el loop existente
         if "loop is already running" in str(e) or "cannot be called from a running event loop" in str(e):
             loop = asyncio.get_event_loop()
             print("⚠️ Advertencia: Loop existente detectado. Ejecutando en loop actual.")
-            loop.run_until_complete(generate_and_update_vectors())
+            loop.run_until_complete(run())
         else:
             raise e
\ No newline at end of file